@@ -1,3 +1,5 @@
+import click
+import threading
 from flask import Flask
 from flask_cors import CORS
 from config.settings import Config
@@ -15,17 +17,57 @@ def create_app():
     from routes.auth_routes import auth_bp
     from routes.emotion_routes import emotion_bp
     from routes.analytics_routes import analytics_bp
+    from routes.health_routes import health_bp
 
     app.register_blueprint(auth_bp, url_prefix='/api')
     app.register_blueprint(emotion_bp, url_prefix='/api')
     app.register_blueprint(analytics_bp, url_prefix='/api')
+    app.register_blueprint(health_bp, url_prefix='/api')
 
     # Create tables
     with app.app_context():
         db.create_all()
 
+    from routes.emotion_routes import emotion_detector, inference_backend
+    if Config.MODEL_PRELOAD and inference_backend is None:
+        # Pre-fork server: load the weights here if the backend allows it; workers warm up in after_fork().
+        # Nothing is warmed up in the master, which must not start TensorFlow before forking
+        emotion_detector.preload()
+    elif Config.MODEL_WARMUP:
+        # Warm up in the background so liveness checks are answered meanwhile
+        threading.Thread(target=(inference_backend or emotion_detector).warmup, name='model-warmup', daemon=True).start()
+
+    @app.cli.command('sync-catalog')
+    def sync_catalog_command():
+        """Download changed emotion playlists into the local track catalog"""
+        from routes.emotion_routes import spotify_service
+        summary = spotify_service.sync_catalog()
+        print(f"Catalog sync: {summary['synced']} synced, {summary['unchanged']} unchanged, {summary['failed']} failed")
+
+    @app.cli.command('refresh-track-metadata')
+    @click.option('--restart', is_flag=True, help='Ignore the checkpoint and start from the first track')
+    def refresh_track_metadata_command(restart):
+        """Re-fetch preview URLs and album images of stored emotion tracks"""
+        from routes.emotion_routes import spotify_service
+        from services.track_metadata import TrackMetadataRefresher
+        refresher = TrackMetadataRefresher(spotify_service, Config.TRACK_METADATA_CHECKPOINT_PATH)
+        summary = refresher.run(restart=restart)
+        if summary['resumed_from'] is not None:
+            print(f"Resumed after track {summary['resumed_from']}")
+        print(f"Track metadata: {summary['tracks']} tracks checked, {summary['updated']} rows updated, {summary['missing']} no longer on Spotify")
+
     return app
 
+def after_fork(app):
+    """Per-worker setup after a pre-fork server forked a process with a preloaded app"""
+    with app.app_context():
+        # Connections of the parent's pool must not be used by two processes
+        db.engine.dispose(close=False)
+    from routes.emotion_routes import emotion_detector
+    emotion_detector.after_fork()
+    if Config.MODEL_WARMUP:
+        threading.Thread(target=emotion_detector.warmup, name='model-warmup', daemon=True).start()
+
 if __name__ == '__main__':
     app = create_app()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
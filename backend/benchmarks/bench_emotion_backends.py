@@ -0,0 +1,95 @@
+"""
+Benchmark of the emotion detector backends on a local image set.
+
+Every backend runs in its own fresh process, so startup time (model load +
+warmup) and RSS are measured in isolation. For each backend it reports
+startup time, mean and p95 per-image latency (face detection + emotion
+classification of the largest face, decoding excluded), max RSS, and
+agreement with the reference backend: how often both find a face, and how
+often they pick the same dominant emotion when they do.
+
+Run from the backend directory:
+    python -m benchmarks.bench_emotion_backends --images path/to/photos [--backends deepface opencv_dnn]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import Config
+from models.emotion_type import EMOTION_VECTOR_ORDER
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+
+def _image_paths(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def _run_backend(name, paths, max_side):
+    """Runs in a fresh process: startup seconds, per-image (ms, dominant emotion or None), max RSS in MB"""
+    from services.emotion_backends import create_backend
+    from services.image_pipeline import decode_image
+
+    start = time.perf_counter()
+    backend = create_backend(name)
+    backend.warmup()
+    startup = time.perf_counter() - start
+
+    results = []
+    for path in paths:
+        with open(path, 'rb') as image_file:
+            _, gray = decode_image(image_file.read(), max_side)
+        start = time.perf_counter()
+        faces = backend.detect_faces(gray)
+        emotion = None
+        if len(faces) > 0:
+            x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
+            scores = backend.classify_faces([gray[y:y + h, x:x + w]])[0]
+            emotion = EMOTION_VECTOR_ORDER[int(np.argmax(scores))]
+        results.append(((time.perf_counter() - start) * 1000, emotion))
+    return startup, results, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(directory, backends, max_side):
+    paths = _image_paths(directory)
+    if not paths:
+        print(f"No images found in {directory}")
+        return
+    print(f"{len(paths)} images, longer side {max_side} px")
+
+    outcomes = {}
+    for name in backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            outcomes[name] = pool.submit(_run_backend, name, paths, max_side).result()
+
+    reference = [emotion for _, emotion in outcomes[backends[0]][1]]
+    for name, (startup, results, rss_mb) in outcomes.items():
+        latencies = [ms for ms, _ in results]
+        emotions = [emotion for _, emotion in results]
+        both = [(ours, theirs) for ours, theirs in zip(emotions, reference) if ours and theirs]
+        face_agreement = np.mean([(ours is None) == (theirs is None) for ours, theirs in zip(emotions, reference)])
+        emotion_agreement = np.mean([ours == theirs for ours, theirs in both]) if both else 0.0
+        print(f"{name}: startup {startup:.1f} s, {np.mean(latencies):.1f} ms/image "
+              f"(p95 {np.percentile(latencies, 95):.1f} ms), max RSS {rss_mb:.0f} MB, "
+              f"faces found {sum(e is not None for e in emotions)}/{len(emotions)}, "
+              f"face agreement {face_agreement:.0%}, emotion agreement {emotion_agreement:.0%} "
+              f"vs {backends[0]}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--images', required=True, help='directory with face photos')
+    parser.add_argument('--backends', nargs='+', default=['deepface', 'opencv_dnn'], help='first one is the reference')
+    parser.add_argument('--max-side', type=int, default=Config.INFERENCE_MAX_SIDE)
+    args = parser.parse_args()
+    run(args.images, args.backends, args.max_side)
@@ -0,0 +1,81 @@
+"""
+Benchmark of decoding uploads into face-detection inputs.
+
+Compares the previous path (full PIL decode, np.array copy, RGB->BGR and
+BGR->gray at full resolution) with services.image_pipeline.decode_image.
+Peak memory is the growth of the max RSS of a fresh worker process while
+decoding one image.
+
+Run from the backend directory:
+    python -m benchmarks.bench_image_decode [--max-side 800] [--repeats 20]
+"""
+import argparse
+import io
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+from PIL import Image
+from services.image_pipeline import decode_image
+
+SIZES = ((640, 480), (1920, 1080), (4032, 3024), (6000, 4000))
+
+
+def full_decode(image_bytes, max_side):
+    pil_image = Image.open(io.BytesIO(image_bytes))
+    opencv_image = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
+    gray = cv2.cvtColor(opencv_image, cv2.COLOR_BGR2GRAY)
+    return opencv_image, gray
+
+
+def pipeline_decode(image_bytes, max_side):
+    return decode_image(image_bytes, max_side)
+
+
+DECODERS = {'full decode': full_decode, 'decode_image': pipeline_decode}
+
+
+def _photo(width, height):
+    """Smooth noise, so the JPEG is about as large as a real photo"""
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 256, (height // 16, width // 16, 3), dtype=np.uint8)
+    pixels = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def _peak_rss_growth(decoder_name, image_bytes, max_side):
+    """Runs in a fresh process: max RSS growth in MB caused by one decode"""
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    DECODERS[decoder_name](image_bytes, max_side)
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024
+
+
+def run(max_side, repeats):
+    for width, height in SIZES:
+        image_bytes = _photo(width, height)
+        for name, decoder in DECODERS.items():
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                bgr, gray = decoder(image_bytes, max_side)
+                timings.append((time.perf_counter() - start) * 1000)
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                peak_mb = pool.submit(_peak_rss_growth, name, image_bytes, max_side).result()
+            print(f"{width}x{height} ({len(image_bytes) / 1e6:.1f} MB JPEG) {name}: "
+                  f"{np.mean(timings):.1f} ms, output {bgr.shape[1]}x{bgr.shape[0]}, peak RSS +{peak_mb:.0f} MB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max-side', type=int, default=800)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+    run(args.max_side, args.repeats)
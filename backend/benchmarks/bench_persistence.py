@@ -0,0 +1,87 @@
+"""
+Benchmark of saving an analyzed emotion record with its tracks.
+
+Compares the ORM unit of work (add, flush, one EmotionTrack per track,
+commit) with services.persistence.insert_emotion_record.
+
+Run from the backend directory:
+    python -m benchmarks.bench_persistence [--database-url postgresql://...] [--records 2000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models.database import db
+from models.emotion import EmotionRecord
+from models.emotion_track import EmotionTrack
+from models.emotion_type import EmotionType
+from models.user import User
+from services.persistence import insert_emotion_record, track_row
+
+TRACKS = [
+    {
+        'name': f'Track {i}',
+        'artist': 'Artist',
+        'spotify_id': f'track_{i}',
+        'preview_url': f'https://p.scdn.co/mp3-preview/{i}',
+        'external_url': f'https://open.spotify.com/track/{i}',
+        'album_image': f'https://i.scdn.co/image/{i}'
+    }
+    for i in range(5)
+]
+
+
+def save_with_orm(user_id, emotion_type_id):
+    record = EmotionRecord(user_id=user_id, emotion_type_id=emotion_type_id, confidence=0.9, detection_source='image')
+    db.session.add(record)
+    db.session.flush()
+    for track in TRACKS:
+        db.session.add(EmotionTrack(**track_row(record.id, track)))
+    db.session.commit()
+
+
+def save_with_helper(user_id, emotion_type_id):
+    insert_emotion_record(user_id, emotion_type_id, 0.9, 'image', 'ready', TRACKS)
+    db.session.commit()
+
+
+def run(database_url, records):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    db.init_app(app)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(email='bench@example.com', password_hash='-')
+        emotion_type = EmotionType(name='happy', display_name='Szczęśliwy')
+        db.session.add_all([user, emotion_type])
+        db.session.commit()
+        user_id, emotion_type_id = user.id, emotion_type.id
+
+        for label, save in (('ORM unit of work', save_with_orm), ('insert_emotion_record', save_with_helper)):
+            timings = []
+            for _ in range(records):
+                start = time.perf_counter()
+                save(user_id, emotion_type_id)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings = np.array(timings)
+            print(f"{label}: mean {timings.mean():.3f} ms, p50 {np.percentile(timings, 50):.3f} ms, "
+                  f"p99 {np.percentile(timings, 99):.3f} ms per record with {len(TRACKS)} tracks")
+
+        db.session.remove()
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database-url', default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'vibe-tuner-bench.db')}")
+    parser.add_argument('--records', type=int, default=2000)
+    args = parser.parse_args()
+    run(args.database_url, args.records)
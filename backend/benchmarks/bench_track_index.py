@@ -0,0 +1,59 @@
+"""
+Benchmark of TrackIndex.query on synthetic catalogs.
+
+Run from the backend directory:
+    python -m benchmarks.bench_track_index [--tracks 100000]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.emotion_type import EMOTION_VECTOR_ORDER
+from services.track_index import TrackIndex
+
+
+def _catalog(n, continuous, rng):
+    tracks = [{'spotify_id': f'track_{i}'} for i in range(n)]
+    if continuous:
+        profiles = rng.random((n, len(EMOTION_VECTOR_ORDER)), dtype=np.float32)
+    else:
+        # Playlist membership: each track is in one to three emotion playlists
+        profiles = np.zeros((n, len(EMOTION_VECTOR_ORDER)), dtype=np.float32)
+        for i in range(n):
+            profiles[i, rng.choice(len(EMOTION_VECTOR_ORDER), rng.integers(1, 4), replace=False)] = 1
+    return tracks, profiles
+
+
+def run(n, repeats):
+    rng = np.random.default_rng(0)
+    for continuous in (False, True):
+        tracks, profiles = _catalog(n, continuous, rng)
+
+        start = time.perf_counter()
+        index = TrackIndex(tracks, profiles, seed=0)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        queries = [dict(zip(EMOTION_VECTOR_ORDER, rng.random(len(EMOTION_VECTOR_ORDER)) * 100)) for _ in range(repeats)]
+        exclude = {f'track_{i}' for i in range(0, n, 7)}
+        for label, kwargs in (('plain', {}), ('with exclude', {'exclude': exclude})):
+            timings = []
+            for scores in queries:
+                start = time.perf_counter()
+                index.query(scores, k=5, **kwargs)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings = np.array(timings)
+            print(f"{'continuous' if continuous else 'membership'} profiles, {index.group_count} groups, {label}: "
+                  f"build {build_ms:.0f} ms, query mean {timings.mean():.3f} ms, "
+                  f"p50 {np.percentile(timings, 50):.3f} ms, p99 {np.percentile(timings, 99):.3f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tracks', type=int, default=100000)
+    parser.add_argument('--repeats', type=int, default=1000)
+    args = parser.parse_args()
+    run(args.tracks, args.repeats)
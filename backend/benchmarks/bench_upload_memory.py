@@ -0,0 +1,90 @@
+"""
+Benchmark of peak memory per image upload.
+
+Compares the previous upload path (image_file.read(), BytesIO for PIL,
+np.array copy of the full decode) with the zero-copy one
+(services.image_pipeline.open_upload + decode_image: the spooled upload is
+memory-mapped and decoded in place by cv2.imdecode). Uploads are written to
+an unnamed temporary file, as Werkzeug does for large request bodies. Peak
+memory is the growth of the max RSS of a fresh worker process while
+handling one upload.
+
+Run from the backend directory:
+    python -m benchmarks.bench_upload_memory [--max-side 800]
+"""
+import argparse
+import io
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+from PIL import Image
+from services.image_pipeline import decode_image, open_upload
+
+SIZES = ((1920, 1080), (4032, 3024), (6000, 4000), (8000, 6000))
+
+
+def read_and_copy(upload, max_side):
+    image_bytes = upload.read()
+    pil_image = Image.open(io.BytesIO(image_bytes))
+    opencv_image = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
+    return opencv_image, cv2.cvtColor(opencv_image, cv2.COLOR_BGR2GRAY)
+
+
+def zero_copy(upload, max_side):
+    with open_upload(upload) as image_bytes:
+        return decode_image(image_bytes, max_side)
+
+
+HANDLERS = {'read + copy': read_and_copy, 'zero-copy': zero_copy}
+
+
+def _photo(width, height):
+    """Noisy JPEG; at 6000x4000 it is about the 16 MB upload limit"""
+    rng = np.random.default_rng(0)
+    small = rng.integers(0, 256, (height // 6, width // 6, 3), dtype=np.uint8)
+    pixels = cv2.resize(small, (width, height), interpolation=cv2.INTER_NEAREST)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def _spooled(image_bytes):
+    upload = tempfile.TemporaryFile()
+    upload.write(image_bytes)
+    upload.seek(0)
+    return upload
+
+
+def _handle_once(handler_name, image_bytes, max_side):
+    """Runs in a fresh process: (max RSS growth in MB, milliseconds) for one upload"""
+    with _spooled(image_bytes) as upload:
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        HANDLERS[handler_name](upload, max_side)
+        elapsed = (time.perf_counter() - start) * 1000
+        return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024, elapsed
+
+
+def run(max_side):
+    for width, height in SIZES:
+        image_bytes = _photo(width, height)
+        for name in HANDLERS:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                peak_mb, elapsed = pool.submit(_handle_once, name, image_bytes, max_side).result()
+            print(f"{width}x{height} ({len(image_bytes) / 1e6:.1f} MB JPEG) {name}: "
+                  f"{elapsed:.1f} ms, peak RSS +{peak_mb:.0f} MB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max-side', type=int, default=800)
+    args = parser.parse_args()
+    run(args.max_side)
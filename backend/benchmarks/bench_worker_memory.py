@@ -0,0 +1,115 @@
+"""
+Benchmark of per-worker memory with and without preloading models before fork.
+
+For each worker count it forks that many workers from a parent process,
+either after the parent loaded the models (preload, as gunicorn does with
+MODEL_PRELOAD=true) or with every worker loading its own copy. It then
+reports each worker's USS (memory only that process uses) and PSS (its
+share of pages shared with others) from /proc/<pid>/smaps_rollup. With
+preloading, USS stays small and PSS per worker falls as workers are added.
+
+--backend opencv_dnn loads the real models (their weights must be
+available); --backend synthetic stands in a --synthetic-mb array of
+weights, which needs nothing but NumPy. Only the synthetic backend has been
+measured so far; its numbers show copy-on-write sharing of plain arrays,
+not of any real model. deepface is not offered: TensorFlow is not
+fork-safe, so it is never preloaded.
+
+Run from the backend directory (Linux only):
+    python -m benchmarks.bench_worker_memory [--backend synthetic] [--workers 1 2 4 8]
+"""
+import argparse
+import gc
+import os
+import signal
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _load(backend, synthetic_mb):
+    if backend == 'synthetic':
+        rng = np.random.default_rng(0)
+        return rng.random(synthetic_mb * 1024 * 1024 // 8)
+    from services.emotion_backends import create_backend
+    model = create_backend(backend)
+    model.load()
+    return model
+
+
+def _memory_mb(pid):
+    """(USS, PSS) in MB of a process"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as smaps:
+        for line in smaps:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    uss = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return uss / 1024, fields.get('Pss', 0) / 1024
+
+
+def _fork_workers(count, preload, backend, synthetic_mb):
+    """Fork count workers that (optionally) load the models and wait; returns their pids and the parent's model"""
+    model = None
+    if preload:
+        model = _load(backend, synthetic_mb)
+        gc.freeze()
+    pids = []
+    for _ in range(count):
+        ready_read, ready_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_read)
+            worker_model = model if preload else _load(backend, synthetic_mb)
+            os.write(ready_write, b'1')
+            signal.sigwait({signal.SIGTERM})
+            del worker_model
+            os._exit(0)
+        os.close(ready_write)
+        os.read(ready_read, 1)
+        os.close(ready_read)
+        pids.append(pid)
+    return pids, model
+
+
+def _measure(count, preload, backend, synthetic_mb):
+    """Runs in a forked child so every configuration starts from the same parent state"""
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM})
+    # Like a gunicorn master, this process keeps its preloaded model while workers run
+    pids, model = _fork_workers(count, preload, backend, synthetic_mb)
+    try:
+        memory = [_memory_mb(pid) for pid in pids]
+        master_pss = _memory_mb(os.getpid())[1]
+    finally:
+        for pid in pids:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+    uss = np.mean([uss for uss, _ in memory])
+    pss = np.mean([pss for _, pss in memory])
+    mode = 'preload' if preload else 'per-worker load'
+    print(f"{count} workers, {mode}: USS {uss:.0f} MB/worker, PSS {pss:.0f} MB/worker, "
+          f"total PSS with master {master_pss + pss * count:.0f} MB")
+
+
+def run(backend, workers, synthetic_mb):
+    for count in workers:
+        for preload in (False, True):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    _measure(count, preload, backend, synthetic_mb)
+                finally:
+                    sys.stdout.flush()
+                    os._exit(0)
+            os.waitpid(pid, 0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', default='synthetic', choices=('synthetic', 'opencv_dnn'))
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--synthetic-mb', type=int, default=200)
+    args = parser.parse_args()
+    run(args.backend, args.workers, args.synthetic_mb)
@@ -24,12 +24,34 @@ CREATE TABLE IF NOT EXISTS emotion_playlists (
   description TEXT,
   created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
   updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+  snapshot_id VARCHAR(100),
+  synced_at TIMESTAMP WITH TIME ZONE,
   CONSTRAINT fk_playlists_emotion_type
     FOREIGN KEY (emotion_type_id) REFERENCES emotion_types(id)
     ON DELETE CASCADE ON UPDATE CASCADE,
   CONSTRAINT uq_emotion_playlist UNIQUE (emotion_type_id)
 );
 
+-- Existing databases: catalog sync state on playlists
+ALTER TABLE emotion_playlists ADD COLUMN IF NOT EXISTS snapshot_id VARCHAR(100);
+ALTER TABLE emotion_playlists ADD COLUMN IF NOT EXISTS synced_at TIMESTAMP WITH TIME ZONE;
+
+-- Playlist tracks - local catalog of emotion playlist contents, synced by snapshot_id
+CREATE TABLE IF NOT EXISTS playlist_tracks (
+  id SERIAL PRIMARY KEY,
+  playlist_id INT NOT NULL,
+  position INT NOT NULL,
+  track_name VARCHAR(255) NOT NULL,
+  artist VARCHAR(255) NOT NULL,
+  spotify_track_id VARCHAR(100) NOT NULL,
+  preview_url VARCHAR(500),
+  external_url VARCHAR(500) NOT NULL,
+  album_image VARCHAR(500),
+  CONSTRAINT fk_playlist_tracks_playlist
+    FOREIGN KEY (playlist_id) REFERENCES emotion_playlists(id)
+    ON DELETE CASCADE ON UPDATE CASCADE
+);
+
 -- Emotion records (matching backend EmotionRecord model)
 CREATE TABLE IF NOT EXISTS emotions (
   id SERIAL PRIMARY KEY,
@@ -40,15 +62,23 @@ CREATE TABLE IF NOT EXISTS emotions (
   spotify_playlist_id VARCHAR(100),
   user_feedback BOOLEAN DEFAULT NULL,
   detection_source VARCHAR(20) NOT NULL DEFAULT 'image',
+  tracks_status VARCHAR(20) NOT NULL DEFAULT 'ready',
+  raw_emotions BYTEA,
   CONSTRAINT fk_emotions_user
     FOREIGN KEY (user_id) REFERENCES users(id)
     ON DELETE CASCADE ON UPDATE CASCADE,
   CONSTRAINT fk_emotions_type
     FOREIGN KEY (emotion_type_id) REFERENCES emotion_types(id)
     ON DELETE CASCADE ON UPDATE CASCADE,
-  CONSTRAINT chk_detection_source CHECK (detection_source IN ('image', 'manual'))
+  CONSTRAINT chk_detection_source CHECK (detection_source IN ('image', 'manual')),
+  CONSTRAINT chk_tracks_status CHECK (tracks_status IN ('pending', 'ready', 'failed'))
 );
 
+-- Existing databases: background track attachment state
+ALTER TABLE emotions ADD COLUMN IF NOT EXISTS tracks_status VARCHAR(20) NOT NULL DEFAULT 'ready';
+-- Existing databases: full score vector (7 x float16, EMOTION_VECTOR_ORDER)
+ALTER TABLE emotions ADD COLUMN IF NOT EXISTS raw_emotions BYTEA;
+
 -- Emotion tracks - tracks associated with emotion records
 CREATE TABLE IF NOT EXISTS emotion_tracks (
   id SERIAL PRIMARY KEY,
@@ -72,6 +102,8 @@ CREATE INDEX IF NOT EXISTS idx_emotions_timestamp ON emotions (timestamp);
 CREATE INDEX IF NOT EXISTS idx_emotions_type_id ON emotions (emotion_type_id);
 CREATE INDEX IF NOT EXISTS idx_emotion_playlists_type_id ON emotion_playlists (emotion_type_id);
 CREATE INDEX IF NOT EXISTS idx_emotion_tracks_record_id ON emotion_tracks (emotion_record_id);
+CREATE INDEX IF NOT EXISTS idx_emotion_tracks_spotify_track_id ON emotion_tracks (spotify_track_id);
+CREATE INDEX IF NOT EXISTS idx_playlist_tracks_playlist_id ON playlist_tracks (playlist_id);
 
 
 --------------------------------------------
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
@@ -14,9 +15,90 @@ def get_polish_time():
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
+    # Shared secret for GET /api/health/metrics (X-Metrics-Token header); unset disables the endpoint
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SPOTIFY_CLIENT_ID = os.environ.get('SPOTIFY_CLIENT_ID')
     SPOTIFY_CLIENT_SECRET = os.environ.get('SPOTIFY_CLIENT_SECRET')
+    SPOTIFY_CACHE_TTL = int(os.environ.get('SPOTIFY_CACHE_TTL', 600))  # seconds
+    SPOTIFY_CACHE_MAX_ENTRIES = int(os.environ.get('SPOTIFY_CACHE_MAX_ENTRIES', 64))
+    SPOTIFY_API_URL = os.environ.get('SPOTIFY_API_URL', 'https://api.spotify.com/v1/')
+    SPOTIFY_TOKEN_URL = os.environ.get('SPOTIFY_TOKEN_URL', 'https://accounts.spotify.com/api/token')
+    # Client-credentials token shared by all workers on the host
+    SPOTIFY_TOKEN_CACHE_PATH = os.environ.get(
+        'SPOTIFY_TOKEN_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'vibe-tuner-spotify-token.json')
+    )
+    SPOTIFY_POOL_SIZE = int(os.environ.get('SPOTIFY_POOL_SIZE', 10))
+    SPOTIFY_CONNECT_TIMEOUT = float(os.environ.get('SPOTIFY_CONNECT_TIMEOUT', 2))  # seconds
+    SPOTIFY_READ_TIMEOUT = float(os.environ.get('SPOTIFY_READ_TIMEOUT', 5))  # seconds
+    SPOTIFY_MAX_RETRIES = int(os.environ.get('SPOTIFY_MAX_RETRIES', 2))
+    SPOTIFY_MAX_RETRY_AFTER = float(os.environ.get('SPOTIFY_MAX_RETRY_AFTER', 5))  # longest Retry-After we wait for
+    SPOTIFY_BREAKER_FAILURES = int(os.environ.get('SPOTIFY_BREAKER_FAILURES', 5))
+    SPOTIFY_BREAKER_RESET_TIMEOUT = float(os.environ.get('SPOTIFY_BREAKER_RESET_TIMEOUT', 30))  # seconds
+    RECENT_TRACKS_WINDOW = int(os.environ.get('RECENT_TRACKS_WINDOW', 20))  # records per user not to repeat tracks from
+    RECENT_TRACKS_MAX_USERS = int(os.environ.get('RECENT_TRACKS_MAX_USERS', 10000))
+    RECENT_TRACKS_TTL = int(os.environ.get('RECENT_TRACKS_TTL', 600))  # seconds before a history is rebuilt from DB
+    HISTORY_OVERSAMPLE = int(os.environ.get('HISTORY_OVERSAMPLE', 4))  # catalog candidates per requested track
+    # 'playlist' samples the playlist of the top emotion, 'vector' matches the full emotion distribution
+    TRACK_RETRIEVAL_MODE = os.environ.get('TRACK_RETRIEVAL_MODE', 'playlist')
+    # Blend playlists of the top BLEND_TOP_K emotions scoring within BLEND_MARGIN points of the best one
+    BLEND_MARGIN = float(os.environ.get('BLEND_MARGIN', 10))
+    BLEND_TOP_K = int(os.environ.get('BLEND_TOP_K', 3))
+    TRACK_INDEX_TTL = int(os.environ.get('TRACK_INDEX_TTL', 3600))  # seconds
+    ASYNC_TRACK_WORKERS = int(os.environ.get('ASYNC_TRACK_WORKERS', 4))
+    TRACKS_LONG_POLL_MAX = float(os.environ.get('TRACKS_LONG_POLL_MAX', 30))  # seconds
+    # Progress of `flask refresh-track-metadata`, removed when a run completes
+    TRACK_METADATA_CHECKPOINT_PATH = os.environ.get(
+        'TRACK_METADATA_CHECKPOINT_PATH', os.path.join(tempfile.gettempdir(), 'vibe-tuner-track-metadata.json')
+    )
+    MAX_BATCH_ENTRIES = int(os.environ.get('MAX_BATCH_ENTRIES', 500))  # per /emotion/batch request
+    MAX_BATCH_IMAGES = int(os.environ.get('MAX_BATCH_IMAGES', 32))  # per /emotion/analyze-batch request
+    # Load emotion models and run a dummy inference in the background at startup (see /api/health/ready)
+    MODEL_WARMUP = os.environ.get('MODEL_WARMUP', 'true').lower() in ('1', 'true', 'yes')
+    # Load models once in the master process of a pre-fork server (gunicorn.conf.py); workers share them.
+    # Only for backends safe to load before fork (opencv_dnn); ignored for deepface
+    MODEL_PRELOAD = os.environ.get('MODEL_PRELOAD', 'false').lower() in ('1', 'true', 'yes')
+    INFERENCE_MAX_SIDE = int(os.environ.get('INFERENCE_MAX_SIDE', 800))  # longer image side fed to face detection
+    MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', 50_000_000))  # uploads declaring more are refused before decoding
+    # Faces classified per image: largest, all (reported: largest, all listed) or most_confident
+    FACE_SELECTION_POLICY = os.environ.get('FACE_SELECTION_POLICY', 'largest')
+    # Detector backend: deepface (Haar + TensorFlow CNN) or opencv_dnn (cv2.dnn face SSD + FER+ ONNX)
+    EMOTION_BACKEND = os.environ.get('EMOTION_BACKEND', 'deepface')
+    DNN_FACE_MODEL_PATH = os.environ.get('DNN_FACE_MODEL_PATH', 'models/dnn/res10_300x300_ssd_iter_140000.caffemodel')
+    DNN_FACE_CONFIG_PATH = os.environ.get('DNN_FACE_CONFIG_PATH', 'models/dnn/deploy.prototxt')
+    DNN_EMOTION_MODEL_PATH = os.environ.get('DNN_EMOTION_MODEL_PATH', 'models/dnn/emotion-ferplus-8.onnx')
+    DNN_FACE_CONFIDENCE = float(os.environ.get('DNN_FACE_CONFIDENCE', 0.5))
+    # Clips and bursts (/emotion/analyze with "video" or "frames")
+    MAX_BURST_FRAMES = int(os.environ.get('MAX_BURST_FRAMES', 30))
+    VIDEO_MAX_FRAMES = int(os.environ.get('VIDEO_MAX_FRAMES', 60))  # scanned frames per clip
+    VIDEO_SCAN_FPS = float(os.environ.get('VIDEO_SCAN_FPS', 10))
+    VIDEO_MAX_PIXELS = int(os.environ.get('VIDEO_MAX_PIXELS', 1920 * 1080))  # clips with larger frames are refused before decoding
+    VIDEO_MAX_SAMPLED_FRAMES = int(os.environ.get('VIDEO_MAX_SAMPLED_FRAMES', 8))  # frames sent to the emotion model
+    FRAME_DIFF_THRESHOLD = float(os.environ.get('FRAME_DIFF_THRESHOLD', 4.0))  # mean abs pixel change (0-255) to analyse a frame
+    EMOTION_SMOOTHING_ALPHA = float(os.environ.get('EMOTION_SMOOTHING_ALPHA', 0.5))  # EMA weight of the newest frame
+    # Run detection in this many pre-warmed worker processes (0 = inline on the request thread)
+    INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 0))
+    INFERENCE_MAX_QUEUE = int(os.environ.get('INFERENCE_MAX_QUEUE', 8))  # admitted calls; more get 503 + Retry-After
+    INFERENCE_DEADLINE = float(os.environ.get('INFERENCE_DEADLINE', 10))  # seconds
+    # Use a standalone micro-batching inference server instead (http://host:port or unix:///path.sock)
+    INFERENCE_SERVER_URL = os.environ.get('INFERENCE_SERVER_URL', '')
+    INFERENCE_BATCH_SIZE = int(os.environ.get('INFERENCE_BATCH_SIZE', 16))  # images per model call on the server
+    INFERENCE_BATCH_WAIT_MS = float(os.environ.get('INFERENCE_BATCH_WAIT_MS', 10))  # longest wait for a batch to fill
+    # Detection results by image hash (size 0 disables); the optional disk tier is shared by all workers
+    INFERENCE_CACHE_SIZE = int(os.environ.get('INFERENCE_CACHE_SIZE', 1024))
+    INFERENCE_CACHE_TTL = int(os.environ.get('INFERENCE_CACHE_TTL', 86400))  # seconds
+    INFERENCE_CACHE_DISK_PATH = os.environ.get('INFERENCE_CACHE_DISK_PATH', '')
+    # Reuse results for near-identical images (dHash within INFERENCE_CACHE_MAX_DISTANCE of 64 bits)
+    INFERENCE_CACHE_PERCEPTUAL = os.environ.get('INFERENCE_CACHE_PERCEPTUAL', 'false').lower() in ('1', 'true', 'yes')
+    INFERENCE_CACHE_MAX_DISTANCE = int(os.environ.get('INFERENCE_CACHE_MAX_DISTANCE', 4))
+    # Emotion types and playlist mapping are served from memory and reloaded after this many seconds
+    EMOTION_REGISTRY_TTL = int(os.environ.get('EMOTION_REGISTRY_TTL', 300))
+    # Werkzeug method, e.g. scrypt, scrypt:65536:8:1 or pbkdf2:sha256:1000000; older hashes are upgraded on login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_SALT_LENGTH = int(os.environ.get('PASSWORD_HASH_SALT_LENGTH', 16))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))  # hashes running at once
+    PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 32))  # admitted hashes; more get 503 + Retry-After
+    PASSWORD_HASH_DEADLINE = float(os.environ.get('PASSWORD_HASH_DEADLINE', 10))  # seconds
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     TIMEZONE = POLISH_TZ
\ No newline at end of file
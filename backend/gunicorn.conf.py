@@ -0,0 +1,30 @@
+"""
+Gunicorn settings: gunicorn -c gunicorn.conf.py
+
+With MODEL_PRELOAD=true the app is loaded once in the master and every
+worker is forked from it. Models of backends that are safe to load before
+fork (opencv_dnn) are loaded there too, so workers share the weights
+through copy-on-write pages. The deepface backend (TensorFlow) is never
+loaded in the master; its workers load their own copy after the fork.
+"""
+import gc
+import os
+from config.settings import Config
+
+wsgi_app = 'app:create_app()'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+preload_app = Config.MODEL_PRELOAD
+
+
+def pre_fork(server, worker):
+    # Objects that exist now are never scanned by the collector in workers, so its
+    # bookkeeping does not write to (and un-share) their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app import after_fork
+        after_fork(server.app.wsgi())
@@ -1,9 +1,56 @@
+from datetime import timedelta
 from functools import wraps
+import hmac
 from flask import request, jsonify
 import jwt
-from config.settings import Config
+from config.settings import Config, POLISH_TZ
+
+TOKEN_LIFETIME = timedelta(days=7)
+
+
+class CurrentUser:
+    """Authenticated principal from verified token claims
+
+    The id comes from the token; any other attribute loads the User row on
+    first access (at most once per request).
+    """
+
+    def __init__(self, user_id):
+        self.id = user_id
+        self._user = None
+
+    @property
+    def user(self):
+        if self._user is None:
+            from models.database import db
+            from models.user import User
+            self._user = db.session.get(User, self.id)
+            if self._user is None:
+                raise LookupError('User not found')
+        return self._user
+
+    def __getattr__(self, name):
+        return getattr(self.user, name)
+
+
+def _token_is_current(user_id, issued_at):
+    """Whether the user still exists and the token was issued to it, not to a deleted user with the same id
+
+    The database is the shared revocation signal, so an account deleted in
+    one worker is refused by every worker on its next request. Only the
+    created_at column is read; the User row is not loaded.
+    """
+    from models.database import db
+    from models.user import User
+    created_at = db.session.query(User.created_at).filter(User.id == user_id).scalar()
+    if created_at is None:
+        return False
+    # Tokens issued before iat was added carry none; they expire within TOKEN_LIFETIME
+    return issued_at is None or issued_at >= int(created_at.replace(tzinfo=POLISH_TZ).timestamp())
+
 
 def token_required(f):
+    """Require a valid Bearer token of an existing user and set request.current_user to a CurrentUser"""
 
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -21,11 +68,9 @@ def token_required(f):
 
         try:
             data = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
-            from models.user import User
-            current_user = User.query.filter_by(id=data['user_id']).first()
-            if not current_user:
+            if not _token_is_current(data['user_id'], data.get('iat')):
                 return jsonify({'error': 'User not found'}), 401
-            request.current_user = current_user
+            request.current_user = CurrentUser(data['user_id'])
 
         except jwt.ExpiredSignatureError:
             return jsonify({'error': 'Token has expired'}), 401
@@ -36,3 +81,19 @@ def token_required(f):
         return f(*args, **kwargs)
 
     return decorated
+
+
+def metrics_token_required(f):
+    """Require the X-Metrics-Token header to equal METRICS_TOKEN; without METRICS_TOKEN the endpoint answers 404"""
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not Config.METRICS_TOKEN:
+            return jsonify({'error': 'Not found'}), 404
+
+        token = request.headers.get('X-Metrics-Token', '')
+        if not hmac.compare_digest(token.encode(), Config.METRICS_TOKEN.encode()):
+            return jsonify({'error': 'Invalid metrics token'}), 401
+        return f(*args, **kwargs)
+
+    return decorated
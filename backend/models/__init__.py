@@ -3,5 +3,6 @@ from models.emotion_track import EmotionTrack
 from models.user import User
 from models.playlist import EmotionPlaylist
 from models.emotion_type import EmotionType
+from models.playlist_track import PlaylistTrack
 
-__all__ = ['EmotionRecord', 'EmotionTrack', 'User', 'EmotionPlaylist', 'EmotionType']
+__all__ = ['EmotionRecord', 'EmotionTrack', 'User', 'EmotionPlaylist', 'EmotionType', 'PlaylistTrack']
@@ -1,6 +1,13 @@
+import numpy as np
 from models.database import db
+from models.emotion_type import EMOTION_VECTOR_ORDER
+from models.emotion_registry import get_emotion_registry
 from config.settings import get_polish_time
 
+# raw_emotions column: percent scores in EMOTION_VECTOR_ORDER as little-endian float16 (14 bytes)
+RAW_EMOTIONS_DTYPE = np.dtype('<f2')
+RAW_EMOTIONS_SIZE = len(EMOTION_VECTOR_ORDER) * RAW_EMOTIONS_DTYPE.itemsize
+
 class EmotionRecord(db.Model):
     __tablename__ = 'emotions'
 
@@ -11,18 +18,65 @@ class EmotionRecord(db.Model):
     timestamp = db.Column(db.DateTime, default=get_polish_time, nullable=False, index=True)
     user_feedback = db.Column(db.Boolean, nullable=True, default=None)
     detection_source = db.Column(db.String(20), nullable=False, default='image')  # 'image' or 'manual'
+    tracks_status = db.Column(db.String(20), nullable=False, default='ready')  # 'pending', 'ready' or 'failed'
+    raw_emotions = db.Column(db.LargeBinary(RAW_EMOTIONS_SIZE), nullable=True)  # None for manual entries
 
     # Relationship to tracks
     tracks = db.relationship('EmotionTrack', backref='emotion_record', lazy=True, cascade='all, delete-orphan')
 
     def to_dict(self):
+        # Names come from the in-memory registry instead of lazy-loading the emotion_type relationship
+        emotion_type = get_emotion_registry().get_by_id(self.emotion_type_id) or self.emotion_type
         return {
             'id': self.id,
-            'emotion': self.emotion_type.name if self.emotion_type else None,
-            'emotion_display_name': self.emotion_type.display_name if self.emotion_type else None,
+            'emotion': emotion_type.name if emotion_type else None,
+            'emotion_display_name': emotion_type.display_name if emotion_type else None,
             'confidence': self.confidence,
             'timestamp': self.timestamp.isoformat(),
             'user_feedback': self.user_feedback,
             'detection_source': self.detection_source,
+            'tracks_status': self.tracks_status,
+            'raw_emotions': self.get_raw_emotions(),
             'tracks': [track.to_dict() for track in self.tracks] if self.tracks else []
-        }
\ No newline at end of file
+        }
+
+    def get_raw_emotions(self):
+        """Stored {emotion: percent} scores, or None"""
+        if self.raw_emotions is None:
+            return None
+        scores = EmotionRecord.decode_raw_emotions([self.raw_emotions])[0]
+        return {name: round(float(score), 2) for name, score in zip(EMOTION_VECTOR_ORDER, scores)}
+
+    @staticmethod
+    def encode_raw_emotions(scores):
+        """raw_emotions column value from an {emotion: percent} mapping (missing emotions are 0)"""
+        if not scores:
+            return None
+        return np.array([scores.get(name, 0.0) for name in EMOTION_VECTOR_ORDER], dtype=RAW_EMOTIONS_DTYPE).tobytes()
+
+    @staticmethod
+    def decode_raw_emotions(values):
+        """(n, 7) float32 matrix with EMOTION_VECTOR_ORDER columns from raw_emotions values
+
+        Stored vectors are joined and decoded with one frombuffer; rows of
+        records without a vector (None) are NaN.
+        """
+        values = list(values)
+        matrix = np.full((len(values), len(EMOTION_VECTOR_ORDER)), np.nan, dtype=np.float32)
+        rows = [i for i, value in enumerate(values) if value is not None]
+        if rows:
+            stored = np.frombuffer(b''.join(values[i] for i in rows), dtype=RAW_EMOTIONS_DTYPE)
+            matrix[rows] = stored.reshape(len(rows), len(EMOTION_VECTOR_ORDER))
+        return matrix
+
+    @staticmethod
+    def get_raw_emotion_matrix(*criteria):
+        """(record ids, score matrix) of the records matching criteria that have a stored vector, oldest first
+
+        Only the id and raw_emotions columns are loaded, without ORM objects.
+        """
+        rows = db.session.query(EmotionRecord.id, EmotionRecord.raw_emotions).filter(
+            EmotionRecord.raw_emotions.isnot(None), *criteria
+        ).order_by(EmotionRecord.timestamp, EmotionRecord.id).all()
+        ids = np.array([record_id for record_id, _ in rows], dtype=np.int64)
+        return ids, EmotionRecord.decode_raw_emotions(raw for _, raw in rows)
@@ -0,0 +1,90 @@
+"""
+Process-wide, read-only snapshot of the emotion_types dictionary and the
+emotion -> playlist mapping.
+
+Both tables change only by hand (init.sql, admin edits), so the snapshot is
+loaded with two queries and then served from memory. It is reloaded after
+EMOTION_REGISTRY_TTL seconds or once invalidate_emotion_registry() bumps
+the version.
+"""
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+from models.database import db
+from config.settings import Config
+
+EmotionTypeEntry = namedtuple('EmotionTypeEntry', 'id name display_name')
+PlaylistEntry = namedtuple('PlaylistEntry', 'id emotion_type_id spotify_playlist_id')
+
+_lock = threading.Lock()
+_version = 0
+_registry = None
+
+
+class EmotionRegistry:
+    """Immutable emotion type and playlist lookups; no method queries the database"""
+
+    def __init__(self, emotion_types, playlists, version=0, loaded_at=None):
+        self.version = version
+        self.loaded_at = time.monotonic() if loaded_at is None else loaded_at
+        self._by_id = MappingProxyType({entry.id: entry for entry in emotion_types})
+        self._by_name = MappingProxyType({entry.name: entry for entry in emotion_types})
+        self.type_ids = MappingProxyType({entry.name: entry.id for entry in emotion_types})
+        self.names = frozenset(self._by_name)
+        self._playlists = MappingProxyType({entry.emotion_type_id: entry for entry in playlists})
+
+    def get_by_name(self, name):
+        return self._by_name.get(name)
+
+    def get_by_id(self, emotion_type_id):
+        return self._by_id.get(emotion_type_id)
+
+    def get_playlist(self, name):
+        """PlaylistEntry of an emotion, or None"""
+        entry = self._by_name.get(name)
+        return self._playlists.get(entry.id) if entry else None
+
+    def is_fresh(self, version, ttl):
+        return self.version == version and (ttl is None or time.monotonic() - self.loaded_at < ttl)
+
+    @staticmethod
+    def load(version=0):
+        """Read both tables (needs an app context)"""
+        from models.emotion_type import EmotionType
+        from models.playlist import EmotionPlaylist
+        emotion_types = [
+            EmotionTypeEntry(*row)
+            for row in db.session.query(EmotionType.id, EmotionType.name, EmotionType.display_name)
+        ]
+        playlists = [
+            PlaylistEntry(*row)
+            for row in db.session.query(EmotionPlaylist.id, EmotionPlaylist.emotion_type_id, EmotionPlaylist.spotify_playlist_id)
+        ]
+        return EmotionRegistry(emotion_types, playlists, version)
+
+
+def get_emotion_registry():
+    """Current snapshot, reloaded when it is older than EMOTION_REGISTRY_TTL or was invalidated"""
+    registry = _registry
+    if registry is not None and registry.is_fresh(_version, Config.EMOTION_REGISTRY_TTL):
+        return registry
+    return _reload()
+
+
+def _reload():
+    global _registry
+    with _lock:
+        # Another thread may have reloaded while this one waited
+        registry = _registry
+        if registry is not None and registry.is_fresh(_version, Config.EMOTION_REGISTRY_TTL):
+            return registry
+        registry = _registry = EmotionRegistry.load(_version)
+        return registry
+
+
+def invalidate_emotion_registry():
+    """Bump the version so the next lookup reloads the snapshot (e.g. after editing emotion types or playlists)"""
+    global _version
+    with _lock:
+        _version += 1
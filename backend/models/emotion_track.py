@@ -7,7 +7,7 @@ class EmotionTrack(db.Model):
     emotion_record_id = db.Column(db.Integer, db.ForeignKey('emotions.id', ondelete='CASCADE'), nullable=False, index=True)
     track_name = db.Column(db.String(255), nullable=False)
     artist = db.Column(db.String(255), nullable=False)
-    spotify_track_id = db.Column(db.String(100), nullable=False)
+    spotify_track_id = db.Column(db.String(100), nullable=False, index=True)
     preview_url = db.Column(db.String(500), nullable=True)
     external_url = db.Column(db.String(500), nullable=False)
     album_image = db.Column(db.String(500), nullable=True)
@@ -1,6 +1,9 @@
 from models.database import db
 from config.settings import get_polish_time
 
+# Fixed order of emotion score vectors (same as DeepFace's emotion model output)
+EMOTION_VECTOR_ORDER = ('angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral')
+
 class EmotionType(db.Model):
     __tablename__ = 'emotion_types'
 
@@ -26,8 +29,10 @@ class EmotionType(db.Model):
 
     @staticmethod
     def get_by_name(name):
-        """Get emotion type by name"""
-        return EmotionType.query.filter_by(name=name).first()
+        """Get emotion type by name (id from the registry, row from the session's identity map when loaded)"""
+        from models.emotion_registry import get_emotion_registry
+        entry = get_emotion_registry().get_by_name(name)
+        return db.session.get(EmotionType, entry.id) if entry else None
 
     @staticmethod
     def get_all():
@@ -37,9 +42,11 @@ class EmotionType(db.Model):
     @staticmethod
     def get_all_names():
         """Get list of all emotion names"""
-        return [et.name for et in EmotionType.query.all()]
+        from models.emotion_registry import get_emotion_registry
+        return sorted(get_emotion_registry().names)
 
     @staticmethod
     def is_valid_emotion(name):
         """Check if emotion name is valid"""
-        return EmotionType.query.filter_by(name=name).first() is not None
+        from models.emotion_registry import get_emotion_registry
+        return name in get_emotion_registry().names
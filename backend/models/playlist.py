@@ -11,6 +11,11 @@ class EmotionPlaylist(db.Model):
     description = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=get_polish_time, nullable=False)
     updated_at = db.Column(db.DateTime, default=get_polish_time, onupdate=get_polish_time, nullable=False)
+    snapshot_id = db.Column(db.String(100), nullable=True)  # Spotify snapshot of the synced catalog
+    synced_at = db.Column(db.DateTime, nullable=True)
+
+    # Local catalog of playlist tracks
+    tracks = db.relationship('PlaylistTrack', backref='playlist', lazy=True, cascade='all, delete-orphan')
 
     def to_dict(self):
         """Convert playlist to dictionary"""
@@ -22,17 +27,24 @@ class EmotionPlaylist(db.Model):
             'playlist_name': self.playlist_name,
             'description': self.description,
             'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'updated_at': self.updated_at.isoformat(),
+            'snapshot_id': self.snapshot_id,
+            'synced_at': self.synced_at.isoformat() if self.synced_at else None
         }
 
     @staticmethod
     def get_by_emotion(emotion_name):
-        """Get playlist by emotion name"""
-        from models.emotion_type import EmotionType
-        emotion_type = EmotionType.get_by_name(emotion_name)
-        if not emotion_type:
-            return None
-        return EmotionPlaylist.query.filter_by(emotion_type_id=emotion_type.id).first()
+        """Get playlist by emotion name (id from the registry, row from the session's identity map when loaded)"""
+        from models.emotion_registry import get_emotion_registry
+        entry = get_emotion_registry().get_playlist(emotion_name)
+        return db.session.get(EmotionPlaylist, entry.id) if entry else None
+
+    @staticmethod
+    def get_spotify_playlist_id(emotion_name):
+        """Spotify playlist id of an emotion, or None, without a query"""
+        from models.emotion_registry import get_emotion_registry
+        entry = get_emotion_registry().get_playlist(emotion_name)
+        return entry.spotify_playlist_id if entry else None
 
     @staticmethod
     def get_all():
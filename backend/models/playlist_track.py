@@ -0,0 +1,65 @@
+import random
+from models.database import db
+from services.cache import TTLCache
+from config.settings import Config
+
+# Ids of each playlist's catalog tracks, so sampling needs no ORDER BY random() over the playlist
+catalog_track_ids = TTLCache(maxsize=Config.SPOTIFY_CACHE_MAX_ENTRIES, ttl=Config.SPOTIFY_CACHE_TTL)
+
+class PlaylistTrack(db.Model):
+    """Local copy of a track from an emotion playlist, synced from Spotify"""
+    __tablename__ = 'playlist_tracks'
+
+    id = db.Column(db.Integer, primary_key=True)
+    playlist_id = db.Column(db.Integer, db.ForeignKey('emotion_playlists.id', ondelete='CASCADE'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)
+    track_name = db.Column(db.String(255), nullable=False)
+    artist = db.Column(db.String(255), nullable=False)
+    spotify_track_id = db.Column(db.String(100), nullable=False)
+    preview_url = db.Column(db.String(500), nullable=True)
+    external_url = db.Column(db.String(500), nullable=False)
+    album_image = db.Column(db.String(500), nullable=True)
+
+    def to_dict(self):
+        """Convert track to dictionary (same shape as SpotifyService tracks)"""
+        return {
+            'name': self.track_name,
+            'artist': self.artist,
+            'spotify_id': self.spotify_track_id,
+            'preview_url': self.preview_url,
+            'external_url': self.external_url,
+            'album_image': self.album_image
+        }
+
+    @staticmethod
+    def get_track_ids(playlist_id):
+        """Ids of the catalog tracks of playlist_id (cached; an empty catalog is not cached)"""
+        track_ids = catalog_track_ids.get_or_load(playlist_id, lambda: tuple(
+            track_id for track_id, in db.session.query(PlaylistTrack.id).filter(PlaylistTrack.playlist_id == playlist_id)
+        ))
+        if not track_ids:
+            catalog_track_ids.invalidate(playlist_id)
+        return track_ids
+
+    @staticmethod
+    def sample_for_emotion(emotion_name, count):
+        """Get up to count random catalog tracks for emotion
+
+        The ids are drawn in Python from the playlist's cached id list and only
+        those rows are fetched by primary key. When some of them are gone (the
+        playlist was re-synced by another process) the id list is reloaded once.
+        """
+        from models.emotion_registry import get_emotion_registry
+        playlist = get_emotion_registry().get_playlist(emotion_name)
+        if playlist is None:
+            return []
+
+        for attempt in range(2):
+            track_ids = PlaylistTrack.get_track_ids(playlist.id)
+            sampled = random.sample(track_ids, min(count, len(track_ids)))
+            if not sampled:
+                return []
+            tracks = {track.id: track for track in PlaylistTrack.query.filter(PlaylistTrack.id.in_(sampled))}
+            if len(tracks) == len(sampled) or attempt:
+                return [tracks[track_id] for track_id in sampled if track_id in tracks]
+            catalog_track_ids.invalidate(playlist.id)
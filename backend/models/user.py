@@ -1,5 +1,5 @@
 from models.database import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from services.password_hasher import password_hasher
 from config.settings import get_polish_time
 
 class User(db.Model):
@@ -14,12 +14,16 @@ class User(db.Model):
     emotion_records = db.relationship('EmotionRecord', backref='user', lazy=True, cascade='all, delete-orphan')
 
     def set_password(self, password):
-        """Hash and set the user's password"""
-        self.password_hash = generate_password_hash(password)
+        """Hash and set the user's password (on the password hashing pool)"""
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        """Check if the provided password matches the hash"""
-        return check_password_hash(self.password_hash, password)
+        """Check if the provided password matches the hash (on the password hashing pool)"""
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """Whether the stored hash uses other than the configured parameters"""
+        return password_hasher.needs_rehash(self.password_hash)
 
     def to_dict(self):
         """Convert user to dictionary (without sensitive data)"""
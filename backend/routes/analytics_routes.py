@@ -46,3 +46,17 @@ def get_emotion_distribution():
 
     except Exception as e:
         return jsonify({'error': f'Failed to fetch emotion distribution: {str(e)}'}), 500
+
+
+@analytics_bp.route('/analytics/profile', methods=['GET'])
+@token_required
+def get_emotion_profile():
+    try:
+        profile = analytics_service.get_emotion_profile(request.current_user.id)
+
+        return jsonify({
+            'profile': profile
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to fetch emotion profile: {str(e)}'}), 500
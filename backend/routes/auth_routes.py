@@ -1,14 +1,33 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from models.user import User
 from models.database import db
-from datetime import timedelta
+from datetime import datetime, timezone
 import jwt
 from config.settings import Config, get_polish_time
-from middleware.auth import token_required
+from services.password_hasher import PasswordHashingUnavailable, password_hasher
+from middleware.auth import token_required, TOKEN_LIFETIME
 import re
 
 auth_bp = Blueprint('auth', __name__)
 
+def _hashing_busy_response(error):
+    response = jsonify({'error': f'Authentication is busy, please retry: {str(error)}'})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+def _store_upgraded_hash(app, user_id, old_hash, new_hash):
+    """Save a rehashed password (on the hashing pool) unless it changed in the meantime"""
+    with app.app_context():
+        try:
+            user = db.session.get(User, user_id)
+            if user is None or user.password_hash != old_hash:
+                return
+            user.password_hash = new_hash
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error storing rehashed password of user {user_id}: {str(e)}")
+
 def validate_email(email):
     """Validate email format"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -60,6 +79,10 @@ def register():
             'user': new_user.to_dict()
         }), 201
 
+    except PasswordHashingUnavailable as e:
+        db.session.rollback()
+        return _hashing_busy_response(e)
+
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Registration failed: {str(e)}'}), 500
@@ -83,9 +106,19 @@ def login():
         if not user or not user.check_password(password):
             return jsonify({'error': 'Invalid email or password'}), 401
 
+        # Upgrade hashes made with older parameters while the plain password is at hand,
+        # in the background so the login answer does not wait for a second hash
+        # (dropped when the hashing pool is full; a later login retries)
+        if user.password_needs_rehash():
+            app, user_id, old_hash = current_app._get_current_object(), user.id, user.password_hash
+            password_hasher.hash_in_background(
+                password, lambda new_hash: _store_upgraded_hash(app, user_id, old_hash, new_hash)
+            )
+
         token = jwt.encode({
             'user_id': user.id,
-            'exp': get_polish_time() + timedelta(days=7)
+            'iat': datetime.now(timezone.utc),
+            'exp': get_polish_time() + TOKEN_LIFETIME
         }, Config.SECRET_KEY, algorithm='HS256')
 
         return jsonify({
@@ -93,7 +126,12 @@ def login():
             'user': user.to_dict()
         }), 200
 
+    except PasswordHashingUnavailable as e:
+        db.session.rollback()
+        return _hashing_busy_response(e)
+
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'Login failed: {str(e)}'}), 500
 
 @auth_bp.route('/auth/account', methods=['DELETE'])
@@ -124,13 +162,17 @@ def delete_account():
         user_email = request.current_user.email
 
         # Delete user (cascade will delete all emotion_records automatically)
-        db.session.delete(request.current_user)
+        db.session.delete(request.current_user.user)
         db.session.commit()
 
         return jsonify({
             'message': f'Account {user_email} has been permanently deleted'
         }), 200
 
+    except PasswordHashingUnavailable as e:
+        db.session.rollback()
+        return _hashing_busy_response(e)
+
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Account deletion failed: {str(e)}'}), 500
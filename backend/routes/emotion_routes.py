@@ -1,16 +1,146 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from middleware.auth import token_required
 from services.emotion_detector import EmotionDetector
-from services.spotify_service import SpotifyService
+from services.inference_pool import InferencePool, InferenceUnavailable
+from services.inference_server import InferenceClient
+from services.image_pipeline import ImageTooLarge, check_image_size
+from services.spotify_service import SpotifyService, close_emotion_weights
+from services.track_worker import track_worker, TRACKS_PENDING, TRACKS_READY
+from services.recently_played import RecentlyPlayedFilter
+from services.persistence import insert_emotion_record, insert_emotion_records
 from models.emotion import EmotionRecord
-from models.emotion_track import EmotionTrack
-from models.emotion_type import EmotionType
+from models.emotion_registry import get_emotion_registry
 from models.database import db
+from config.settings import Config, POLISH_TZ, get_polish_time
+from datetime import datetime
+import math
 import os
+import time
 
 emotion_bp = Blueprint('emotion', __name__)
 emotion_detector = EmotionDetector()
+# Optional inference server or pool of worker processes; when set, detection never runs on the request thread
+if Config.INFERENCE_SERVER_URL:
+    inference_backend = InferenceClient(Config.INFERENCE_SERVER_URL, timeout=Config.INFERENCE_DEADLINE)
+elif Config.INFERENCE_WORKERS > 0:
+    inference_backend = InferencePool(
+        workers=Config.INFERENCE_WORKERS,
+        max_queue=Config.INFERENCE_MAX_QUEUE,
+        deadline=Config.INFERENCE_DEADLINE
+    )
+else:
+    inference_backend = None
 spotify_service = SpotifyService()
+recently_played = RecentlyPlayedFilter(
+    window=Config.RECENT_TRACKS_WINDOW,
+    max_users=Config.RECENT_TRACKS_MAX_USERS,
+    ttl=Config.RECENT_TRACKS_TTL
+)
+
+# Long-poll re-checks the database at least this often (jobs may run in another process)
+TRACKS_POLL_INTERVAL = 0.5
+# Most catalog candidates loaded per emotion for one batch of recommendations
+BATCH_TRACK_POOL_MAX = 1000
+
+
+def _detect_emotion(image_file):
+    check_image_size(image_file.stream, Config.MAX_IMAGE_PIXELS)
+    if inference_backend:
+        return inference_backend.detect_emotion(image_file.read())
+    return emotion_detector.detect_emotion(image_file)
+
+
+def _detect_emotions_batch(images):
+    if inference_backend:
+        return inference_backend.detect_emotions_batch(images)
+    return emotion_detector.detect_emotions_batch(images)
+
+
+def _detect_emotion_sequence(files):
+    """Smoothed detection for a "video" clip or a burst of "frames" images"""
+    detector = inference_backend or emotion_detector
+    if 'video' in files:
+        return detector.detect_emotion_video(files['video'].read())
+    frames = [frame for frame in files.getlist('frames') if frame.filename]
+    for frame in frames:
+        check_image_size(frame.stream, Config.MAX_IMAGE_PIXELS)
+    return detector.detect_emotion_frames([frame.read() for frame in frames])
+
+
+def _inference_busy_response(error):
+    response = jsonify({'error': f'Emotion analysis is busy, please retry: {str(error)}'})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+
+def _is_async_tracks_requested():
+    return request.args.get('async_tracks', '').lower() in ('1', 'true', 'yes')
+
+
+def _recommend_tracks(user_id, emotion_name, emotion_scores=None, count=5):
+    """Sample tracks for emotion, skipping ones the user was given recently
+
+    In 'vector' retrieval mode the full score distribution (when detected from
+    an image) is matched against the catalog instead of the top emotion only.
+    Otherwise, when the top emotions are close, their playlists are blended.
+    """
+    recent_tracks = recently_played.for_user(user_id)
+    tracks = []
+    if Config.TRACK_RETRIEVAL_MODE == 'vector' and emotion_scores:
+        tracks = spotify_service.get_tracks_for_emotion_vector(emotion_scores, count=count, exclude=recent_tracks)
+    elif emotion_scores:
+        weights = close_emotion_weights(emotion_scores, Config.BLEND_MARGIN, Config.BLEND_TOP_K)
+        if len(weights) > 1:
+            tracks = spotify_service.get_blended_tracks(weights, count=count, exclude=recent_tracks)
+    if not tracks:
+        tracks = spotify_service.get_random_tracks_for_emotion(emotion_name, count=count, exclude=recent_tracks)
+    recently_played.record(user_id, [track['spotify_id'] for track in tracks])
+    return tracks
+
+def _recommend_tracks_batch(user_id, items, count=5):
+    """_recommend_tracks for each (emotion_name, emotion_scores) item of one user, with shared candidate fetches
+
+    Candidate tracks are loaded once per distinct emotion (see
+    SpotifyService.get_track_pools) and every item samples from those pools,
+    so a batch costs one catalog query or playlist download per emotion,
+    not per item. 'vector' mode queries the in-memory track index per item.
+    """
+    recent_tracks = recently_played.for_user(user_id)
+    results, weights = [None] * len(items), [None] * len(items)
+    for index, (emotion_name, emotion_scores) in enumerate(items):
+        if Config.TRACK_RETRIEVAL_MODE == 'vector' and emotion_scores:
+            results[index] = spotify_service.get_tracks_for_emotion_vector(emotion_scores, count=count, exclude=recent_tracks)
+            if results[index]:
+                recently_played.record(user_id, [track['spotify_id'] for track in results[index]])
+                continue
+        elif emotion_scores:
+            blend = close_emotion_weights(emotion_scores, Config.BLEND_MARGIN, Config.BLEND_TOP_K)
+            if len(blend) > 1:
+                weights[index] = blend
+                continue
+        weights[index] = {emotion_name: 1.0}
+
+    # A blend falls back to the top emotion alone, so that pool is loaded as well
+    uses = {}
+    for (emotion_name, _), item_weights in zip(items, weights):
+        if item_weights is not None:
+            for emotion in {emotion_name, *item_weights}:
+                uses[emotion] = uses.get(emotion, 0) + 1
+    pools = spotify_service.get_track_pools({
+        emotion: min(count * Config.HISTORY_OVERSAMPLE * emotion_uses, BATCH_TRACK_POOL_MAX)
+        for emotion, emotion_uses in uses.items()
+    })
+
+    for index, item_weights in enumerate(weights):
+        if item_weights is None:
+            continue
+        tracks = spotify_service.pick_from_pools(pools, item_weights, count=count, exclude=recent_tracks)
+        if not tracks and len(item_weights) > 1:
+            emotion_name = items[index][0]
+            tracks = spotify_service.pick_from_pools(pools, {emotion_name: 1.0}, count=count, exclude=recent_tracks)
+        recently_played.record(user_id, [track['spotify_id'] for track in tracks])
+        results[index] = tracks
+    return results
 
 @emotion_bp.route('/emotion/analyze', methods=['POST'])
 @token_required
@@ -28,7 +158,7 @@ def analyze_emotion():
             if not isinstance(confidence, (int, float)) or not (0 <= confidence <= 1):
                 return jsonify({'error': 'Confidence must be a number between 0 and 1'}), 400
 
-            emotion_type = EmotionType.get_by_name(emotion_name)
+            emotion_type = get_emotion_registry().get_by_name(emotion_name)
             if not emotion_type:
                 return jsonify({'error': f"Invalid emotion type: {emotion_name}"}), 400
 
@@ -37,6 +167,19 @@ def analyze_emotion():
                 'confidence': confidence
             }
 
+        elif 'video' in request.files or 'frames' in request.files:
+            if len(request.files.getlist('frames')) > Config.MAX_BURST_FRAMES:
+                return jsonify({'error': f'Too many frames (max {Config.MAX_BURST_FRAMES})'}), 400
+
+            emotion_result = _detect_emotion_sequence(request.files)
+
+            if not emotion_result:
+                return jsonify({'error': 'Could not detect face or emotion in the frames'}), 400
+
+            emotion_type = get_emotion_registry().get_by_name(emotion_result['emotion'])
+            if not emotion_type:
+                return jsonify({'error': f"Invalid emotion type: {emotion_result['emotion']}"}), 400
+
         else:
             if 'image' not in request.files:
                 return jsonify({'error': 'No image or emotion data provided'}), 400
@@ -46,55 +189,245 @@ def analyze_emotion():
             if image_file.filename == '':
                 return jsonify({'error': 'No image selected'}), 400
 
-            emotion_result = emotion_detector.detect_emotion(image_file)
+            emotion_result = _detect_emotion(image_file)
 
             if not emotion_result:
                 return jsonify({'error': 'Could not detect face or emotion in the image'}), 400
 
-            emotion_type = EmotionType.get_by_name(emotion_result['emotion'])
+            emotion_type = get_emotion_registry().get_by_name(emotion_result['emotion'])
             if not emotion_type:
                 return jsonify({'error': f"Invalid emotion type: {emotion_result['emotion']}"}), 400
 
-        tracks = spotify_service.get_random_tracks_for_emotion(emotion_result['emotion'], count=5)
-
-        emotion_record = EmotionRecord(
-            user_id=request.current_user.id,
-            emotion_type_id=emotion_type.id,
-            confidence=emotion_result['confidence'],
-            detection_source='manual' if request.is_json else 'image'
-        )
-
-        db.session.add(emotion_record)
-        db.session.flush()
-
-        for track in tracks:
-            emotion_track = EmotionTrack(
-                emotion_record_id=emotion_record.id,
-                track_name=track['name'],
-                artist=track['artist'],
-                spotify_track_id=track['spotify_id'],
-                preview_url=track.get('preview_url'),
-                external_url=track['external_url'],
-                album_image=track.get('album_image')
+        async_tracks = _is_async_tracks_requested()
+        user_id, emotion_name = request.current_user.id, emotion_result['emotion']
+        emotion_scores = emotion_result.get('raw_emotions')
+        detection_source = 'manual' if request.is_json else 'image'
+
+        if async_tracks:
+            # Commit and answer right away; a background worker attaches the tracks
+            record_id, timestamp = insert_emotion_record(
+                user_id, emotion_type.id, emotion_result['confidence'], detection_source, TRACKS_PENDING,
+                raw_emotions=emotion_scores
             )
-            db.session.add(emotion_track)
+            db.session.commit()
 
-        db.session.commit()
+            track_worker.submit(
+                current_app._get_current_object(),
+                record_id,
+                lambda: _recommend_tracks(user_id, emotion_name, emotion_scores)
+            )
+            tracks = []
+            tracks_status = TRACKS_PENDING
+            status_code = 202
+        else:
+            tracks = _recommend_tracks(user_id, emotion_name, emotion_scores)
 
-        return jsonify({
-            'id': emotion_record.id,
-            'emotion': emotion_result['emotion'],
+            record_id, timestamp = insert_emotion_record(
+                user_id, emotion_type.id, emotion_result['confidence'], detection_source, TRACKS_READY, tracks,
+                raw_emotions=emotion_scores
+            )
+            db.session.commit()
+            tracks_status = TRACKS_READY
+            status_code = 200
+
+        response = {
+            'id': record_id,
+            'emotion': emotion_name,
             'confidence': emotion_result['confidence'],
-            'detection_source': emotion_record.detection_source,
+            'detection_source': detection_source,
             'tracks': tracks,
-            'timestamp': emotion_record.timestamp.isoformat()
-        }), 200
+            'tracks_status': tracks_status,
+            'timestamp': timestamp.isoformat()
+        }
+        for key in ('faces', 'frames'):
+            if key in emotion_result:
+                response[key] = emotion_result[key]
+        return jsonify(response), status_code
+
+    except InferenceUnavailable as e:
+        return _inference_busy_response(e)
+
+    except ImageTooLarge as e:
+        return jsonify({'error': str(e)}), 413
 
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Emotion analysis failed: {str(e)}'}), 500
 
 
+@emotion_bp.route('/emotion/analyze-batch', methods=['POST'])
+@token_required
+def analyze_emotion_batch():
+    """Analyze up to MAX_BATCH_IMAGES uploads ("images" fields) with one model call
+
+    Every image gets its own entry in "results", in upload order; records
+    for all detected faces are saved in one transaction.
+    """
+    try:
+        image_files = [image_file for image_file in request.files.getlist('images') if image_file.filename]
+        if not image_files:
+            return jsonify({'error': 'No images provided'}), 400
+        if len(image_files) > Config.MAX_BATCH_IMAGES:
+            return jsonify({'error': f'Too many images (max {Config.MAX_BATCH_IMAGES})'}), 400
+
+        for image_file in image_files:
+            check_image_size(image_file.stream, Config.MAX_IMAGE_PIXELS)
+        detections = _detect_emotions_batch([image_file.read() for image_file in image_files])
+
+        emotion_type_ids = get_emotion_registry().type_ids
+        user_id = request.current_user.id
+        results, rows, saved, recommendations = [], [], [], []
+        for index, (image_file, detection) in enumerate(zip(image_files, detections)):
+            if not detection:
+                results.append({'index': index, 'filename': image_file.filename, 'error': 'Could not detect face or emotion in the image'})
+                continue
+            emotion_type_id = emotion_type_ids.get(detection['emotion'])
+            if emotion_type_id is None:
+                results.append({'index': index, 'filename': image_file.filename, 'error': f"Invalid emotion type: {detection['emotion']}"})
+                continue
+
+            rows.append({
+                'user_id': user_id,
+                'emotion_type_id': emotion_type_id,
+                'confidence': detection['confidence'],
+                'timestamp': get_polish_time(),
+                'detection_source': 'image',
+                'tracks_status': TRACKS_READY,
+                'raw_emotions': EmotionRecord.encode_raw_emotions(detection.get('raw_emotions'))
+            })
+            result = {
+                'index': index,
+                'filename': image_file.filename,
+                'emotion': detection['emotion'],
+                'confidence': detection['confidence'],
+                'detection_source': 'image',
+                'tracks_status': TRACKS_READY,
+                'timestamp': rows[-1]['timestamp'].isoformat()
+            }
+            results.append(result)
+            saved.append(result)
+            recommendations.append((detection['emotion'], detection.get('raw_emotions')))
+
+        # One candidate fetch per detected emotion, shared by all images
+        tracks = _recommend_tracks_batch(user_id, recommendations)
+        for result, result_tracks in zip(saved, tracks):
+            result['tracks'] = result_tracks
+
+        for result, record_id in zip(saved, insert_emotion_records(rows, tracks)):
+            result['id'] = record_id
+        db.session.commit()
+
+        return jsonify({
+            'results': results,
+            'analyzed': len(saved),
+            'failed': len(results) - len(saved)
+        }), 200
+
+    except InferenceUnavailable as e:
+        return _inference_busy_response(e)
+
+    except ImageTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Batch emotion analysis failed: {str(e)}'}), 500
+
+
+def parse_batch_entry(entry, emotion_type_ids):
+    """Validate one offline-queued entry, returning (emotion_type_id, confidence, timestamp)
+
+    Raises ValueError with a message for the client.
+    """
+    if not isinstance(entry, dict):
+        raise ValueError('Entry must be an object')
+
+    emotion_type_id = emotion_type_ids.get(entry.get('emotion'))
+    if emotion_type_id is None:
+        raise ValueError(f"Invalid emotion type: {entry.get('emotion')}")
+
+    confidence = entry.get('confidence', 1.0)
+    if isinstance(confidence, bool) or not isinstance(confidence, (int, float)) or not (0 <= confidence <= 1):
+        raise ValueError('Confidence must be a number between 0 and 1')
+
+    timestamp = entry.get('timestamp')
+    if timestamp is None:
+        return emotion_type_id, confidence, get_polish_time()
+    if not isinstance(timestamp, str):
+        raise ValueError('Timestamp must be an ISO 8601 string')
+    try:
+        timestamp = datetime.fromisoformat(timestamp)
+    except ValueError:
+        raise ValueError('Timestamp must be an ISO 8601 string')
+    # Stored as naive Polish time, like get_polish_time()
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(POLISH_TZ).replace(tzinfo=None)
+    return emotion_type_id, confidence, timestamp
+
+
+@emotion_bp.route('/emotion/batch', methods=['POST'])
+@token_required
+def log_emotion_batch():
+    """Save manual entries queued by the app while offline, in one transaction
+
+    Tracks are only generated when "generate_tracks" is true; backfilled
+    entries usually do not need them.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get('entries'), list):
+            return jsonify({'error': 'Request body must contain an "entries" list'}), 400
+
+        entries = data['entries']
+        if not entries:
+            return jsonify({'error': 'No entries provided'}), 400
+        if len(entries) > Config.MAX_BATCH_ENTRIES:
+            return jsonify({'error': f'Too many entries (max {Config.MAX_BATCH_ENTRIES})'}), 400
+
+        generate_tracks = data.get('generate_tracks', False)
+        if not isinstance(generate_tracks, bool):
+            return jsonify({'error': '"generate_tracks" must be a boolean'}), 400
+
+        emotion_type_ids = get_emotion_registry().type_ids
+
+        rows, errors = [], []
+        for index, entry in enumerate(entries):
+            try:
+                emotion_type_id, confidence, timestamp = parse_batch_entry(entry, emotion_type_ids)
+            except ValueError as e:
+                errors.append({'index': index, 'error': str(e)})
+                continue
+            rows.append({
+                'user_id': request.current_user.id,
+                'emotion_type_id': emotion_type_id,
+                'confidence': confidence,
+                'timestamp': timestamp,
+                'detection_source': 'manual',
+                'tracks_status': TRACKS_READY
+            })
+
+        if errors:
+            return jsonify({'error': 'Invalid entries', 'details': errors}), 400
+
+        tracks = None
+        if generate_tracks:
+            # One candidate fetch per distinct emotion, shared by all entries
+            tracks = _recommend_tracks_batch(request.current_user.id, [(entry['emotion'], None) for entry in entries])
+
+        record_ids = insert_emotion_records(rows, tracks)
+        db.session.commit()
+
+        return jsonify({
+            'created': len(record_ids),
+            'ids': record_ids,
+            'tracks_generated': generate_tracks
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Batch logging failed: {str(e)}'}), 500
+
+
 @emotion_bp.route('/emotion/history', methods=['GET'])
 @token_required
 def get_emotion_history():
@@ -138,6 +471,19 @@ def get_emotion(emotion_id):
         if not emotion_record:
             return jsonify({'error': 'Emotion record not found'}), 404
 
+        # Optional long-poll: ?wait=<seconds> holds the response until tracks are attached
+        wait = request.args.get('wait', 0, type=float)
+        if not math.isfinite(wait):
+            return jsonify({'error': '"wait" must be a finite number of seconds'}), 400
+        wait = max(0.0, min(wait, Config.TRACKS_LONG_POLL_MAX))
+        deadline = time.monotonic() + wait
+        while emotion_record.tracks_status == TRACKS_PENDING:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            track_worker.wait_for(emotion_record.id, min(remaining, TRACKS_POLL_INTERVAL))
+            db.session.expire(emotion_record)
+
         return jsonify(emotion_record.to_dict()), 200
 
     except Exception as e:
@@ -0,0 +1,34 @@
+from flask import Blueprint, jsonify
+from config.settings import Config
+from middleware.auth import metrics_token_required
+
+health_bp = Blueprint('health', __name__)
+
+
+@health_bp.route('/health/metrics', methods=['GET'])
+@metrics_token_required
+def get_metrics():
+    """Internal service metrics; needs the X-Metrics-Token header"""
+    try:
+        from routes.emotion_routes import spotify_service, emotion_detector, inference_backend
+        from services.password_hasher import password_hasher
+
+        return jsonify({
+            'spotify': spotify_service.get_stats(),
+            'inference_cache': emotion_detector.cache.stats() if emotion_detector.cache else None,
+            'inference_backend': inference_backend.stats() if inference_backend else None,
+            'password_hashing': password_hasher.stats()
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to collect metrics: {str(e)}'}), 500
+
+
+@health_bp.route('/health/ready', methods=['GET'])
+def get_readiness():
+    """Readiness probe: 503 until the emotion models are warmed up"""
+    from routes.emotion_routes import emotion_detector, inference_backend
+
+    if Config.MODEL_WARMUP and not (inference_backend or emotion_detector).is_ready:
+        return jsonify({'status': 'warming_up'}), 503
+    return jsonify({'status': 'ready'}), 200
@@ -1,9 +1,10 @@
 from datetime import datetime, timedelta
 from sqlalchemy import func, and_, extract
 from models.emotion import EmotionRecord
-from models.emotion_type import EmotionType
+from models.emotion_type import EmotionType, EMOTION_VECTOR_ORDER
 from models.database import db
 from collections import defaultdict
+import numpy as np
 
 
 class AnalyticsService:
@@ -87,3 +88,17 @@ class AnalyticsService:
         except Exception as e:
             print(f"Error in get_emotion_distribution: {str(e)}")
             return {}
+
+    def get_emotion_profile(self, user_id):
+        """Mean detector scores (percent) over the user's records with a stored score vector"""
+        try:
+            _, scores = EmotionRecord.get_raw_emotion_matrix(EmotionRecord.user_id == user_id)
+            if len(scores) == 0:
+                return {}
+
+            mean_scores = scores.mean(axis=0, dtype=np.float64)
+            return {name: round(float(score), 2) for name, score in zip(EMOTION_VECTOR_ORDER, mean_scores)}
+
+        except Exception as e:
+            print(f"Error in get_emotion_profile: {str(e)}")
+            return {}
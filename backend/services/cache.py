@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded, thread-safe LRU cache with per-entry time-to-live.
+
+    ``ttl=None`` disables expiry, leaving plain LRU behaviour. Expired
+    entries stay in the cache until evicted so they can still be served
+    through get_stale() when the backing source is down.
+    """
+
+    def __init__(self, maxsize=128, ttl=300, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def _lookup(self, key):
+        """Return the live value for key or _MISSING (caller holds the lock)"""
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= self._timer():
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        """Get a cached value, counting the lookup as a hit or a miss"""
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def get_stale(self, key, default=None):
+        """Get a value even if it has expired (not counted in hit/miss stats)"""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry[0] if entry is not None else default
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entry when full"""
+        expires_at = self._timer() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        """Get a cached value or compute it with loader()
+
+        Concurrent misses for the same key wait for a single loader call
+        instead of each hitting the backing source.
+        Exceptions raised by loader are propagated and nothing is cached.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                value = self._lookup(key)
+            if value is not _MISSING:
+                return value
+            try:
+                value = loader()
+                self.set(key, value)
+                return value
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+
+    def invalidate(self, key):
+        """Drop a single entry"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Snapshot of size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,186 @@
+"""
+Face detection + emotion classification backends for EmotionDetector.
+
+A backend has detect_faces(gray, min_size=None) returning (x, y, w, h)
+boxes, classify_faces(face_crops) returning percent scores with
+EMOTION_VECTOR_ORDER columns, load() (models only, no inference) and
+warmup() (load + one dummy inference). preload_before_fork tells whether
+load() may run in a server's master process before it forks workers.
+EMOTION_BACKEND picks one:
+
+- deepface: OpenCV Haar cascade + DeepFace's emotion CNN on TensorFlow
+- opencv_dnn: OpenCV DNN face detector (res10 SSD) + an FER+ ONNX emotion
+  classifier, both run by cv2.dnn, without TensorFlow
+"""
+import importlib
+import threading
+import cv2
+import numpy as np
+from models.emotion_type import EMOTION_VECTOR_ORDER
+from config.settings import Config
+
+FACE_CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+WARMUP_IMAGE_SIZE = 224
+# Input of the DeepFace emotion model: 48x48 grayscale in [0, 1]
+EMOTION_MODEL_INPUT_SIZE = 48
+# res10 SSD face detector input and the mean subtracted from its BGR channels
+DNN_FACE_INPUT_SIZE = 300
+DNN_FACE_MEAN = (104.0, 177.0, 123.0)
+# FER+ classifier: 64x64 grayscale in [0, 255], eight classes in this order
+FERPLUS_INPUT_SIZE = 64
+FERPLUS_ORDER = ('neutral', 'happy', 'surprise', 'sad', 'angry', 'disgust', 'fear', 'contempt')
+
+
+class _LazyDeepFace:
+    """Imports deepface (and TensorFlow) on first use, so API processes that only talk to an inference server never load it"""
+
+    def __getattr__(self, name):
+        return getattr(importlib.import_module('deepface.DeepFace'), name)
+
+
+DeepFace = _LazyDeepFace()
+
+
+def _to_percent(predictions):
+    predictions = np.asarray(predictions, dtype=np.float64)
+    totals = predictions.sum(axis=1, keepdims=True)
+    return 100 * predictions / np.where(totals > 0, totals, 1)
+
+
+class DeepFaceBackend:
+    """Haar cascade faces, DeepFace emotion CNN (TensorFlow)"""
+
+    name = 'deepface'
+    # Building the Keras model starts the TensorFlow runtime, which is not fork-safe
+    preload_before_fork = False
+
+    def __init__(self):
+        # CascadeClassifier is not safe to share between threads, so each thread loads its own once
+        self._local = threading.local()
+        self._emotion_model = None
+        self._model_lock = threading.Lock()
+
+    def _get_face_cascade(self):
+        face_cascade = getattr(self._local, 'face_cascade', None)
+        if face_cascade is None:
+            face_cascade = self._local.face_cascade = cv2.CascadeClassifier(FACE_CASCADE_PATH)
+        return face_cascade
+
+    def _get_emotion_model(self):
+        # Built once even when several threads (e.g. inference server handlers) ask at the same time.
+        # build_model(task=...) and EmotionClient.model need deepface >= 0.0.93
+        if self._emotion_model is None:
+            with self._model_lock:
+                if self._emotion_model is None:
+                    self._emotion_model = DeepFace.build_model(model_name='Emotion', task='facial_attribute')
+        return self._emotion_model
+
+    def load(self):
+        self._get_emotion_model()
+        self._get_face_cascade()
+
+    def warmup(self):
+        self.load()
+        self.detect_faces(np.zeros((WARMUP_IMAGE_SIZE, WARMUP_IMAGE_SIZE), dtype=np.uint8))
+        self.classify_faces([np.zeros((EMOTION_MODEL_INPUT_SIZE, EMOTION_MODEL_INPUT_SIZE), dtype=np.uint8)])
+
+    def detect_faces(self, gray, min_size=None):
+        if min_size:
+            return self._get_face_cascade().detectMultiScale(gray, 1.1, 4, minSize=min_size)
+        return self._get_face_cascade().detectMultiScale(gray, 1.1, 4)
+
+    def classify_faces(self, face_crops):
+        """All crops go through the model as one (n, 48, 48, 1) batch"""
+        size = (EMOTION_MODEL_INPUT_SIZE, EMOTION_MODEL_INPUT_SIZE)
+        batch = np.empty((len(face_crops), EMOTION_MODEL_INPUT_SIZE, EMOTION_MODEL_INPUT_SIZE, 1), dtype=np.float32)
+        for i, crop in enumerate(face_crops):
+            batch[i, :, :, 0] = cv2.resize(crop, size, interpolation=cv2.INTER_AREA)
+        batch /= 255.0
+        return _to_percent(self._get_emotion_model().model.predict_on_batch(batch))
+
+
+class OpenCVDnnBackend:
+    """res10 SSD faces and FER+ emotions, both through cv2.dnn on the CPU
+
+    Model files are not bundled: face_model/face_config are the Caffe
+    res10_300x300_ssd weights and deploy.prototxt, emotion_model the FER+
+    ONNX model (emotion-ferplus-8.onnx). FER+'s "contempt" is counted as
+    disgust. cv2.dnn networks are not thread-safe, so each thread loads its
+    own copy once.
+    """
+
+    name = 'opencv_dnn'
+    # load() only reads the weight files into cv2.dnn networks
+    preload_before_fork = True
+
+    def __init__(self, face_model, face_config, emotion_model, confidence=0.5):
+        self.face_model = face_model
+        self.face_config = face_config
+        self.emotion_model = emotion_model
+        self.confidence = confidence
+        self._local = threading.local()
+        # FER+ class -> EMOTION_VECTOR_ORDER column
+        self._columns = [EMOTION_VECTOR_ORDER.index('disgust' if name == 'contempt' else name) for name in FERPLUS_ORDER]
+
+    def _nets(self):
+        nets = getattr(self._local, 'nets', None)
+        if nets is None:
+            nets = self._local.nets = (
+                cv2.dnn.readNetFromCaffe(self.face_config, self.face_model),
+                cv2.dnn.readNetFromONNX(self.emotion_model)
+            )
+        return nets
+
+    def load(self):
+        self._nets()
+
+    def warmup(self):
+        self.detect_faces(np.zeros((WARMUP_IMAGE_SIZE, WARMUP_IMAGE_SIZE), dtype=np.uint8))
+        self.classify_faces([np.zeros((FERPLUS_INPUT_SIZE, FERPLUS_INPUT_SIZE), dtype=np.uint8)])
+
+    def detect_faces(self, gray, min_size=None):
+        height, width = gray.shape[:2]
+        size = (DNN_FACE_INPUT_SIZE, DNN_FACE_INPUT_SIZE)
+        blob = cv2.dnn.blobFromImage(
+            cv2.resize(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR), size), 1.0, size, DNN_FACE_MEAN
+        )
+        face_net = self._nets()[0]
+        face_net.setInput(blob)
+        # (1, 1, n, 7) rows: image id, class, confidence, x1, y1, x2, y2 (relative)
+        detections = face_net.forward().reshape(-1, 7)
+        faces = []
+        for confidence, x1, y1, x2, y2 in detections[:, 2:7]:
+            if confidence < self.confidence:
+                continue
+            left, top = max(0, int(x1 * width)), max(0, int(y1 * height))
+            right, bottom = min(width, int(x2 * width)), min(height, int(y2 * height))
+            w, h = right - left, bottom - top
+            if w > 0 and h > 0 and (not min_size or (w >= min_size[0] and h >= min_size[1])):
+                faces.append((left, top, w, h))
+        return faces
+
+    def classify_faces(self, face_crops):
+        emotion_net = self._nets()[1]
+        size = (FERPLUS_INPUT_SIZE, FERPLUS_INPUT_SIZE)
+        scores = np.zeros((len(face_crops), len(EMOTION_VECTOR_ORDER)))
+        # The FER+ graph has a fixed batch size of 1
+        for i, crop in enumerate(face_crops):
+            emotion_net.setInput(cv2.dnn.blobFromImage(cv2.resize(crop, size, interpolation=cv2.INTER_AREA)))
+            logits = emotion_net.forward().reshape(-1)
+            probabilities = np.exp(logits - logits.max())
+            np.add.at(scores[i], self._columns, probabilities / probabilities.sum())
+        return _to_percent(scores)
+
+
+def create_backend(name):
+    """Backend for an EMOTION_BACKEND value"""
+    if name == DeepFaceBackend.name:
+        return DeepFaceBackend()
+    if name == OpenCVDnnBackend.name:
+        return OpenCVDnnBackend(
+            Config.DNN_FACE_MODEL_PATH,
+            Config.DNN_FACE_CONFIG_PATH,
+            Config.DNN_EMOTION_MODEL_PATH,
+            confidence=Config.DNN_FACE_CONFIDENCE
+        )
+    raise ValueError(f'Unknown emotion backend: {name}')
@@ -1,23 +1,252 @@
 import cv2
-import numpy as np
-from deepface import DeepFace
-from PIL import Image
-import io
 import hashlib
-from models.emotion_type import EmotionType
+import threading
+from models.emotion_type import EMOTION_VECTOR_ORDER
+from models.emotion_registry import get_emotion_registry
+from services.emotion_backends import create_backend
+from services.image_pipeline import ImageTooLarge, decode_image, open_upload
+from services.frame_sequence import decode_frames, read_video_frames, select_changed_frames, smooth_scores, track_faces
+from services.inference_cache import InferenceCache, MISS, difference_hash
+from config.settings import Config
 
 class EmotionDetector:
-    def __init__(self):
-        self._valid_emotions = None
+    def __init__(self, backend=None):
+        # Face detection + emotion model (EMOTION_BACKEND), loaded lazily or by warmup()
+        self.backend = backend or create_backend(Config.EMOTION_BACKEND)
+        self._ready = threading.Event()
+        # Results by image content hash, so retried uploads skip detection entirely
+        self.cache = InferenceCache(
+            maxsize=Config.INFERENCE_CACHE_SIZE,
+            ttl=Config.INFERENCE_CACHE_TTL,
+            disk_path=Config.INFERENCE_CACHE_DISK_PATH or None,
+            perceptual=Config.INFERENCE_CACHE_PERCEPTUAL,
+            max_distance=Config.INFERENCE_CACHE_MAX_DISTANCE
+        ) if Config.INFERENCE_CACHE_SIZE > 0 else None
 
-    def _get_valid_emotions(self):
-        """Get list of valid emotions from database (cached)"""
-        if self._valid_emotions is None:
+    @property
+    def is_ready(self):
+        """Whether warmup() has loaded the models and run a first inference"""
+        return self._ready.is_set()
+
+    def warmup(self):
+        """Load the models and run one dummy inference so the first request is not slow
+
+        Returns whether it succeeded; the detector only reports ready afterwards.
+        """
+        try:
+            self.backend.warmup()
+            self._ready.set()
+            return True
+        except Exception as e:
+            print(f"Error warming up emotion models: {str(e)}")
+            return False
+
+    def preload(self):
+        """Load the models without running them, e.g. in a server's master process before it forks workers
+
+        Workers then share the weights through copy-on-write pages; each one
+        calls after_fork() and warmup(). Only backends whose loading is safe
+        before fork (preload_before_fork) are loaded; for the others (DeepFace:
+        TensorFlow is not fork-safe) nothing is loaded and False is returned,
+        so every worker loads its own copy after the fork.
+        """
+        if not getattr(self.backend, 'preload_before_fork', False):
+            print(f"MODEL_PRELOAD ignored: the {self.backend.name} backend cannot be loaded before fork; "
+                  "workers load their own models (use INFERENCE_SERVER_URL to share one copy)")
+            return False
+        try:
+            self.backend.load()
+            return True
+        except Exception as e:
+            print(f"Error preloading emotion models: {str(e)}")
+            return False
+
+    def after_fork(self):
+        """Reset state that must not be shared with the parent process"""
+        self._ready = threading.Event()
+        if self.cache:
+            self.cache.after_fork()
+
+    def _detect_faces(self, gray, min_size=None):
+        return self.backend.detect_faces(gray, min_size)
+
+    def _classify_faces(self, face_crops):
+        """Emotion scores (percent, EMOTION_VECTOR_ORDER columns) for grayscale face crops"""
+        return self.backend.classify_faces(face_crops)
+
+    @staticmethod
+    def _select_faces(faces, policy):
+        """Face boxes to classify, largest first: only the largest one unless the policy needs every face"""
+        faces = sorted((tuple(int(v) for v in face) for face in faces), key=lambda face: face[2] * face[3], reverse=True)
+        return faces if policy in ('all', 'most_confident') else faces[:1]
+
+    def _faces_result(self, faces, face_scores, policy):
+        """Detection result for classified faces (largest first) under the face selection policy
+
+        'largest' and 'all' report the largest face, 'most_confident' the face
+        with the most confident emotion; 'all' also lists every face.
+        """
+        results = [self._emotion_result(dict(zip(EMOTION_VECTOR_ORDER, scores))) for scores in face_scores]
+        if policy == 'most_confident':
+            best = max(range(len(results)), key=lambda i: results[i]['confidence'])
+        else:
+            best = 0
+        result = dict(results[best], face=list(faces[best]))
+        if policy == 'all':
+            result['faces'] = [
+                {'box': list(face), 'emotion': face_result['emotion'], 'confidence': face_result['confidence']}
+                for face, face_result in zip(faces, results)
+            ]
+        return result
+
+    def _emotion_result(self, emotion_scores):
+        """Detection result from an {emotion: percent} mapping"""
+        dominant_emotion = max(emotion_scores, key=emotion_scores.get)
+        confidence = float(emotion_scores[dominant_emotion] / 100.0)
+
+        return {
+            'emotion': self._validate_emotion(dominant_emotion), #checking if it exist in database
+            'confidence': float(round(confidence, 3)),
+            'raw_emotions': {name: float(score) for name, score in emotion_scores.items()}
+        }
+
+    def detect_emotions_batch(self, images):
+        """Detect emotions in several images (raw bytes) with one model call
+
+        Haar-detected faces of all images (chosen by FACE_SELECTION_POLICY)
+        are classified together as a single batch. As in detect_emotion, a
+        near-identical image (perceptual cache) reuses a recent result, also
+        one of an earlier image in the same batch. Returns one result or
+        None per image.
+        """
+        policy = Config.FACE_SELECTION_POLICY
+        results = [None] * len(images)
+        pending = []  # (index, image_hash, perceptual_hash, face boxes)
+        duplicates = []  # (index, image_hash, index of the near-identical pending image)
+        face_crops = []
+        for index, image_bytes in enumerate(images):
             try:
-                self._valid_emotions = set(EmotionType.get_all_names())
-            except:
-                self._valid_emotions = {'happy', 'sad', 'angry', 'fear', 'surprise', 'disgust', 'neutral'}
-        return self._valid_emotions
+                image_hash = hashlib.md5(image_bytes).hexdigest()
+                cached = self.cache.get(image_hash) if self.cache else MISS
+                if cached is not MISS:
+                    results[index] = dict(cached, image_hash=image_hash) if cached else None
+                    continue
+
+                _, gray = decode_image(image_bytes, Config.INFERENCE_MAX_SIDE, Config.MAX_IMAGE_PIXELS)
+
+                perceptual_hash = None
+                if self.cache and self.cache.perceptual:
+                    perceptual_hash = difference_hash(gray)
+                    similar = self.cache.get_similar(perceptual_hash)
+                    if similar is not MISS:
+                        self.cache.set(image_hash, similar)
+                        results[index] = dict(similar, image_hash=image_hash) if similar else None
+                        continue
+                    # Not cached yet, but waiting for the model in this batch
+                    source = next((
+                        entry[0] for entry in pending
+                        if (entry[2] ^ perceptual_hash).bit_count() <= self.cache.max_distance
+                    ), None)
+                    if source is not None:
+                        duplicates.append((index, image_hash, source))
+                        continue
+
+                faces = self._detect_faces(gray)
+                if len(faces) == 0:
+                    if self.cache:
+                        self.cache.set(image_hash, None, perceptual_hash)
+                    continue
+
+                faces = self._select_faces(faces, policy)
+                pending.append((index, image_hash, perceptual_hash, faces))
+                face_crops.extend(gray[y:y + h, x:x + w] for x, y, w, h in faces)
+            except Exception as e:
+                print(f"Error detecting emotion in batch image {index}: {str(e)}")
+
+        if pending:
+            scores = self._classify_faces(face_crops)
+            analyzed = {}
+            offset = 0
+            for index, image_hash, perceptual_hash, faces in pending:
+                result = analyzed[index] = self._faces_result(faces, scores[offset:offset + len(faces)], policy)
+                offset += len(faces)
+                if self.cache:
+                    self.cache.set(image_hash, result, perceptual_hash)
+                results[index] = dict(result, image_hash=image_hash)
+            for index, image_hash, source in duplicates:
+                self.cache.set(image_hash, analyzed[source])
+                results[index] = dict(analyzed[source], image_hash=image_hash)
+        return results
+
+    def detect_emotion_frames(self, images):
+        """Detect one smoothed emotion in a burst of frames (raw image bytes, oldest first)"""
+        return self._detect_sequence(
+            hashlib.md5(b''.join(images)).hexdigest(),
+            lambda: decode_frames(images, Config.INFERENCE_MAX_SIDE, Config.MAX_IMAGE_PIXELS)
+        )
+
+    def detect_emotion_video(self, video_bytes):
+        """Detect one smoothed emotion in a short clip (raw video file bytes)"""
+        return self._detect_sequence(
+            hashlib.md5(video_bytes).hexdigest(),
+            lambda: read_video_frames(
+                video_bytes, Config.INFERENCE_MAX_SIDE, Config.VIDEO_MAX_FRAMES, Config.VIDEO_SCAN_FPS,
+                Config.VIDEO_MAX_PIXELS
+            )
+        )
+
+    def _detect_sequence(self, image_hash, read_frames):
+        try:
+            cached = self.cache.get(image_hash) if self.cache else MISS
+            if cached is not MISS:
+                return dict(cached, image_hash=image_hash) if cached else None
+
+            result = self._analyze_sequence(read_frames())
+            if self.cache:
+                self.cache.set(image_hash, result)
+            return dict(result, image_hash=image_hash) if result else None
+
+        except ImageTooLarge:
+            raise
+
+        except Exception as e:
+            print(f"Error detecting emotion in frames: {str(e)}")
+            return None
+
+    def _analyze_sequence(self, frames):
+        """Smoothed emotion over a frame sequence; None when no frame has a face
+
+        Near-identical consecutive frames are skipped, one face is tracked
+        through the remaining ones, all its crops are classified in one batch
+        and the per-frame scores are smoothed with an EMA.
+        """
+        selected = [frames[index] for index in select_changed_frames(
+            frames, Config.FRAME_DIFF_THRESHOLD, Config.VIDEO_MAX_SAMPLED_FRAMES
+        )]
+        boxes, full_detections = track_faces(selected, self._detect_faces)
+        faces = [(frame, box) for frame, box in zip(selected, boxes) if box is not None]
+        if not faces:
+            return None
+
+        crops = [frame[y:y + h, x:x + w] for frame, (x, y, w, h) in faces]
+
+        smoothed = smooth_scores(self._classify_faces(crops), Config.EMOTION_SMOOTHING_ALPHA)
+        result = self._emotion_result(dict(zip(EMOTION_VECTOR_ORDER, smoothed)))
+        result['face'] = list(faces[-1][1])
+        result['frames'] = {
+            'total': len(frames),
+            'analyzed': len(selected),
+            'with_face': len(crops),
+            'full_detections': full_detections
+        }
+        return result
+
+    def _get_valid_emotions(self):
+        """Emotion names from the shared registry; the model's own classes outside an app context (inference workers)"""
+        try:
+            return get_emotion_registry().names
+        except Exception:
+            return frozenset(EMOTION_VECTOR_ORDER)
 
     def _validate_emotion(self, emotion):
         """Validate if emotion exists in database"""
@@ -26,45 +255,46 @@ class EmotionDetector:
     
     def detect_emotion(self, image_file):
         try:
-            image_bytes = image_file.read()
-            
-            pil_image = Image.open(io.BytesIO(image_bytes))#to pil image
-            
-            opencv_image = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR) #to opencv format
-
-            image_hash = hashlib.md5(image_bytes).hexdigest() #image hash for storage
-            
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            gray = cv2.cvtColor(opencv_image, cv2.COLOR_BGR2GRAY)
-            faces = face_cascade.detectMultiScale(gray, 1.1, 4) #detecting face first
-            
-            if len(faces) == 0:
-                return None
-            
-            result = DeepFace.analyze( #deepface analyze
-                opencv_image, 
-                actions=['emotion'],
-                enforce_detection=False
-            )
-            
-            if isinstance(result, list): # Handle both single result and list results
-                result = result[0]
-
-            dominant_emotion = result['dominant_emotion']
-            confidence = float(result['emotion'][dominant_emotion] / 100.0)
-
-            validated_emotion = self._validate_emotion(dominant_emotion) #checking if it exist in database
-
-            return {
-                'emotion': validated_emotion,
-                'confidence': float(round(confidence, 3)),
-                'image_hash': image_hash,
-                'raw_emotions': result['emotion']
-            }
-            
+            # Bytes or an mmap of the spooled upload, without an extra copy
+            with open_upload(image_file) as image_bytes:
+                image_hash = hashlib.md5(image_bytes).hexdigest() #image hash for storage
+                cached = self.cache.get(image_hash) if self.cache else MISS
+                if cached is not MISS:
+                    return dict(cached, image_hash=image_hash) if cached else None
+
+                # Reduced-size decode, upright, at most INFERENCE_MAX_SIDE pixels per side
+                _, gray = decode_image(image_bytes, Config.INFERENCE_MAX_SIDE, Config.MAX_IMAGE_PIXELS)
+
+                # Near-identical frame (burst selfie, re-encoded retry) analysed recently
+                perceptual_hash = None
+                if self.cache and self.cache.perceptual:
+                    perceptual_hash = difference_hash(gray)
+                    similar = self.cache.get_similar(perceptual_hash)
+                    if similar is not MISS:
+                        self.cache.set(image_hash, similar)
+                        return dict(similar, image_hash=image_hash) if similar else None
+
+                result = self._analyze(gray)
+                if self.cache:
+                    self.cache.set(image_hash, result, perceptual_hash)
+                return dict(result, image_hash=image_hash) if result else None
+
         except Exception as e:
             print(f"Error detecting emotion: {str(e)}")
             return None
+
+    def _analyze(self, gray):
+        """Haar face detection, then the emotion model on the face crops only; None when there is no face"""
+        faces = self._detect_faces(gray)
+
+        if len(faces) == 0:
+            return None
+
+        # The Haar boxes are the only face localization; no second detector pass over the frame
+        policy = Config.FACE_SELECTION_POLICY
+        faces = self._select_faces(faces, policy)
+        face_scores = self._classify_faces([gray[y:y + h, x:x + w] for x, y, w, h in faces])
+        return self._faces_result(faces, face_scores, policy)
     
     def preprocess_image(self, image):
         # Resize image if too large
@@ -0,0 +1,125 @@
+import tempfile
+import cv2
+import numpy as np
+from services.image_pipeline import ImageTooLarge, decode_image
+
+# Frames are compared as small grayscale thumbnails
+DIFFERENCE_SIZE = (64, 48)
+# Tracked face box is searched for in a window this much larger on every side
+TRACKING_MARGIN = 0.5
+
+
+def _downscale_gray(frame, max_side):
+    height, width = frame.shape[:2]
+    scale = min(1.0, max_side / max(width, height))
+    if scale < 1.0:
+        frame = cv2.resize(frame, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+def read_video_frames(video_bytes, max_side=800, max_frames=90, scan_fps=10, max_pixels=None):
+    """Grayscale frames (longer side at most max_side) of a short clip, about scan_fps per second
+
+    Frames between the scanned ones are only grabbed, not decoded into
+    images. Reading stops after max_frames scanned frames. A clip whose
+    frames have more than max_pixels pixels raises ImageTooLarge before any
+    frame is decoded.
+    """
+    # VideoCapture only reads from files
+    with tempfile.NamedTemporaryFile(suffix='.video') as video_file:
+        video_file.write(video_bytes)
+        video_file.flush()
+        capture = cv2.VideoCapture(video_file.name)
+        try:
+            if not capture.isOpened():
+                raise ValueError('Unsupported video format')
+            width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            if max_pixels and width * height > max_pixels:
+                raise ImageTooLarge(f'Video frames are too large ({width}x{height}, max {max_pixels} pixels)')
+            fps = capture.get(cv2.CAP_PROP_FPS) or scan_fps
+            stride = max(1, round(fps / scan_fps))
+            frames, position = [], 0
+            while len(frames) < max_frames and capture.grab():
+                if position % stride == 0:
+                    ok, frame = capture.retrieve()
+                    if ok:
+                        frames.append(_downscale_gray(frame, max_side))
+                position += 1
+            return frames
+        finally:
+            capture.release()
+
+
+def decode_frames(images, max_side=800, max_pixels=None):
+    """Grayscale frames of a burst of still images (raw bytes)"""
+    return [decode_image(image_bytes, max_side, max_pixels)[1] for image_bytes in images]
+
+
+def frame_difference(frame, other):
+    """Mean absolute difference (0-255) of two frames' thumbnails"""
+    a = cv2.resize(frame, DIFFERENCE_SIZE, interpolation=cv2.INTER_AREA)
+    b = cv2.resize(other, DIFFERENCE_SIZE, interpolation=cv2.INTER_AREA)
+    return float(cv2.absdiff(a, b).mean())
+
+
+def select_changed_frames(frames, threshold, max_frames):
+    """Indexes of frames worth analysing
+
+    A frame is kept when it differs from the last kept one by at least
+    threshold; of those, at most max_frames evenly spaced ones remain. The
+    first frame is always kept.
+    """
+    if not frames:
+        return []
+    selected = [0]
+    for index in range(1, len(frames)):
+        if frame_difference(frames[index], frames[selected[-1]]) >= threshold:
+            selected.append(index)
+    if len(selected) > max_frames:
+        positions = np.linspace(0, len(selected) - 1, max_frames).round().astype(int)
+        selected = [selected[position] for position in positions]
+    return selected
+
+
+def _largest(faces):
+    return max((tuple(int(v) for v in face) for face in faces), key=lambda face: face[2] * face[3])
+
+
+def track_faces(frames, detect_faces):
+    """Face box (or None) per frame, following one face through the sequence
+
+    detect_faces(image, min_size=None) is the backend's face detector.
+    Once a face is found it is only searched for in a window around its last
+    box; the whole frame is scanned again only when it is lost. Returns the
+    boxes and the number of full-frame detections.
+    """
+    boxes, full_detections, previous = [], 0, None
+    for frame in frames:
+        box = None
+        if previous is not None:
+            x, y, w, h = previous
+            left, top = max(0, int(x - w * TRACKING_MARGIN)), max(0, int(y - h * TRACKING_MARGIN))
+            right = min(frame.shape[1], int(x + w * (1 + TRACKING_MARGIN)))
+            bottom = min(frame.shape[0], int(y + h * (1 + TRACKING_MARGIN)))
+            faces = detect_faces(frame[top:bottom, left:right], (w // 2, h // 2))
+            if len(faces) > 0:
+                fx, fy, fw, fh = _largest(faces)
+                box = (fx + left, fy + top, fw, fh)
+        if box is None:
+            full_detections += 1
+            faces = detect_faces(frame)
+            if len(faces) > 0:
+                box = _largest(faces)
+        boxes.append(box)
+        if box is not None:
+            previous = box
+    return boxes, full_detections
+
+
+def smooth_scores(frame_scores, alpha):
+    """Exponential moving average of per-frame score vectors (oldest first)"""
+    smoothed = None
+    for scores in frame_scores:
+        smoothed = scores if smoothed is None else alpha * scores + (1 - alpha) * smoothed
+    return smoothed
@@ -0,0 +1,168 @@
+import io
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager, suppress
+import cv2
+import numpy as np
+from PIL import Image
+
+# EXIF orientation -> transpose that makes the image upright
+EXIF_ORIENTATION = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+SWAPS_AXES = {Image.Transpose.TRANSPOSE, Image.Transpose.ROTATE_270, Image.Transpose.TRANSVERSE, Image.Transpose.ROTATE_90}
+# cv2.imdecode flags decoding a JPEG at 1/n of its size (DCT scaling)
+JPEG_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+@contextmanager
+def open_upload(upload):
+    """Contents of an uploaded file as bytes or a read-only mmap, copied as little as possible
+
+    BytesIO uploads hand over their buffer as bytes; uploads backed by a
+    file are memory-mapped instead of read. Werkzeug's SpooledTemporaryFile
+    is rolled over to its temporary file first (a no-op for large uploads,
+    which are already there), so only public file APIs are used.
+    """
+    stream = getattr(upload, 'stream', upload)
+    if isinstance(stream, tempfile.SpooledTemporaryFile):
+        stream.rollover()
+    if isinstance(stream, io.BytesIO):
+        # getvalue() shares the BytesIO buffer instead of copying it
+        yield stream.getvalue()
+        return
+    try:
+        fileno = stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        stream.seek(0)
+        yield stream.read()
+        return
+    stream.flush()
+    if os.fstat(fileno).st_size == 0:
+        yield b''
+        return
+    buffer = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    try:
+        yield buffer
+    finally:
+        # Still exported (e.g. a cached array view); the mapping goes away with it
+        with suppress(BufferError):
+            buffer.close()
+
+
+def _as_file(source):
+    if hasattr(source, 'read'):
+        source.seek(0)
+        return source
+    return io.BytesIO(source)
+
+
+def _open_checked(source, max_pixels):
+    """PIL image with only the header read, rejected if it has more than max_pixels pixels"""
+    try:
+        image = Image.open(_as_file(source))
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e))
+    width, height = image.size
+    if max_pixels and width * height > max_pixels:
+        raise ImageTooLarge(f'Image is too large ({width}x{height}, max {max_pixels} pixels)')
+    return image
+
+
+def check_image_size(source, max_pixels):
+    """Raise ImageTooLarge for an upload whose header declares more than max_pixels pixels
+
+    Only the header is read, so decompression bombs are refused before any
+    pixel is decoded. source may be a file-like object (its position is kept)
+    or a buffer.
+    """
+    position = source.tell() if hasattr(source, 'tell') else None
+    try:
+        _open_checked(source, max_pixels)
+    except OSError:
+        pass  # not a readable image; decoding reports that
+    finally:
+        if position is not None:
+            source.seek(position)
+
+
+def _decode_jpeg(buffer, size, max_side):
+    """JPEG decoded straight from buffer at the smallest DCT scale covering max_side"""
+    flag = next((flag for factor, flag in JPEG_REDUCED_FLAGS if max(size) // factor >= max_side), cv2.IMREAD_COLOR)
+    # imdecode reads the buffer in place and applies the EXIF orientation itself
+    bgr = cv2.imdecode(np.frombuffer(buffer, dtype=np.uint8), flag)
+    if bgr is None:
+        raise ValueError('Could not decode JPEG image')
+    height, width = bgr.shape[:2]
+    scale = min(1.0, max_side / max(width, height))
+    if scale < 1.0:
+        bgr = cv2.resize(bgr, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+    return bgr, cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+
+
+def _flatten(image):
+    """RGB or L version of any PIL mode; transparent areas become white"""
+    if image.mode == 'P':
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    if image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'RGB' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode not in ('RGB', 'L'):
+        return image.convert('RGB')
+    return image
+
+
+def decode_image(image_bytes, max_side=800, max_pixels=None):
+    """Decode an upload (bytes or mmap) into (bgr, gray) uint8 arrays whose longer side is at most max_side
+
+    The header is checked against max_pixels first (ImageTooLarge). JPEGs
+    are decoded by OpenCV directly from the buffer at a reduced DCT scale
+    (1/2, 1/4 or 1/8) when the full size is not needed; other formats go
+    through PIL: those formats have no reduced-size decoding, so the pixels
+    are decoded at full size once (bounded by max_pixels), immediately
+    box-reduced by an integer factor, and only the reduced image is
+    flattened (transparency), rotated upright (EXIF orientation) and resized.
+    """
+    image = _open_checked(image_bytes, max_pixels)
+    if image.format == 'JPEG':
+        return _decode_jpeg(image_bytes, image.size, max_side)
+
+    orientation = image.getexif().get(EXIF_ORIENTATION)
+
+    width, height = image.size
+    scale = min(1.0, max_side / max(width, height))
+    target_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    if image.mode == 'P':
+        image = _flatten(image)  # palettes cannot be reduced; converted at full size
+    factor = int(1 / scale)
+    if factor > 1:
+        with suppress(ValueError):  # modes Image.reduce does not support are resized at full size
+            image = image.reduce(factor)
+    image = _flatten(image)
+
+    transpose = ORIENTATION_TRANSPOSE.get(orientation)
+    if transpose is not None:
+        image = image.transpose(transpose)
+        if transpose in SWAPS_AXES:
+            target_size = target_size[::-1]
+
+    pixels = np.asarray(image)
+    if image.size != target_size:
+        pixels = cv2.resize(pixels, target_size, interpolation=cv2.INTER_AREA)
+    if pixels.ndim == 2:
+        return cv2.cvtColor(pixels, cv2.COLOR_GRAY2BGR), np.ascontiguousarray(pixels)
+    return cv2.cvtColor(pixels, cv2.COLOR_RGB2BGR), cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY)
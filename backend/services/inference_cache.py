@@ -0,0 +1,166 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import cv2
+import numpy as np
+from services.cache import TTLCache
+
+# Returned on a cache miss (None is a valid, cached "no face" result)
+MISS = object()
+
+
+def difference_hash(gray_image):
+    """64-bit dHash of a grayscale image: brightness gradients of a 9x8 thumbnail
+
+    Re-encoded or slightly shifted copies of the same shot differ in only a few bits.
+    """
+    thumbnail = cv2.resize(gray_image, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class DiskResultStore:
+    """SQLite-backed result tier shared by all worker processes on the host
+
+    Keeps at most max_entries results, dropping the oldest ones first.
+    """
+
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS idx_results_created_at ON results (created_at)')
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+        return connection
+
+    def after_fork(self):
+        """Drop connections inherited from the parent process; SQLite handles must not cross fork"""
+        self._local = threading.local()
+
+    def get(self, key, max_age=None):
+        row = self._connect().execute('SELECT value, created_at FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None or (max_age is not None and row[1] + max_age <= time.time()):
+            return MISS
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        with self._connect() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO results (key, value, created_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), time.time())
+            )
+            # Trimming needs a scan, so only check every 100 writes
+            self._writes += 1
+            if self._writes % 100 == 0:
+                connection.execute(
+                    'DELETE FROM results WHERE key IN '
+                    '(SELECT key FROM results ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,)
+                )
+
+
+class InferenceCache:
+    """Detection results keyed by image content hash
+
+    Lookups go to a bounded in-memory LRU first, then to the optional disk
+    tier. In perceptual mode an image whose dHash is within max_distance
+    bits of a recently analysed one reuses that result as well, which covers
+    burst selfies and re-encoded retries. Results of "no face" are cached too.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, disk_path=None, perceptual=False, max_distance=4):
+        self.ttl = ttl
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._disk = DiskResultStore(disk_path) if disk_path else None
+        self.perceptual = perceptual
+        self.max_distance = max_distance
+        # dHash -> (result, stored_at), most recent last
+        self._perceptual_entries = OrderedDict()
+        self._perceptual_maxsize = maxsize
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.perceptual_hits = 0
+
+    def after_fork(self):
+        if self._disk is not None:
+            self._disk.after_fork()
+
+    def get(self, content_hash):
+        """Cached result for an exact image, or MISS"""
+        with self._lock:
+            self.lookups += 1
+        value = self._memory.get(content_hash, MISS)
+        if value is not MISS:
+            with self._lock:
+                self.memory_hits += 1
+            return value
+        if self._disk is not None:
+            try:
+                value = self._disk.get(content_hash, max_age=self.ttl)
+            except sqlite3.Error as e:
+                print(f"Error reading inference cache: {str(e)}")
+                value = MISS
+            if value is not MISS:
+                self._memory.set(content_hash, value)
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+        return MISS
+
+    def get_similar(self, image_hash):
+        """Result of the closest recently analysed image within max_distance bits, or MISS"""
+        now = time.monotonic()
+        with self._lock:
+            best_distance, best_result = self.max_distance + 1, MISS
+            for other_hash, (result, stored_at) in self._perceptual_entries.items():
+                if self.ttl is not None and stored_at + self.ttl <= now:
+                    continue
+                distance = (image_hash ^ other_hash).bit_count()
+                if distance < best_distance:
+                    best_distance, best_result = distance, result
+            if best_result is not MISS:
+                self.perceptual_hits += 1
+            return best_result
+
+    def set(self, content_hash, result, image_hash=None):
+        self._memory.set(content_hash, result)
+        if self._disk is not None:
+            try:
+                self._disk.set(content_hash, result)
+            except sqlite3.Error as e:
+                print(f"Error writing inference cache: {str(e)}")
+        if image_hash is not None:
+            with self._lock:
+                self._perceptual_entries[image_hash] = (result, time.monotonic())
+                self._perceptual_entries.move_to_end(image_hash)
+                while len(self._perceptual_entries) > self._perceptual_maxsize:
+                    self._perceptual_entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits + self.perceptual_hits
+            return {
+                'lookups': self.lookups,
+                'hits': hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'perceptual_hits': self.perceptual_hits,
+                'hit_rate': round(hits / self.lookups, 4) if self.lookups else 0.0,
+                'memory': self._memory.stats(),
+                'disk_enabled': self._disk is not None,
+                'perceptual': self.perceptual
+            }
@@ -0,0 +1,183 @@
+import io
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from services.metrics import LatencyHistogram
+
+# Per-process detector, created by the pool initializer
+_detector = None
+
+
+class InferenceUnavailable(Exception):
+    """Inference cannot be served right now; retry_after is a hint in seconds"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class InferenceQueueFull(InferenceUnavailable):
+    pass
+
+
+class InferenceTimeout(InferenceUnavailable):
+    pass
+
+
+def create_emotion_detector():
+    from services.emotion_detector import EmotionDetector
+    return EmotionDetector()
+
+
+def _init_worker(detector_factory):
+    global _detector
+    _detector = detector_factory()
+    warmup = getattr(_detector, 'warmup', None)
+    if warmup is not None:
+        warmup()
+
+
+def _worker_ready(hold_seconds):
+    # Holding the worker briefly makes the executor start the next process for the next call
+    time.sleep(hold_seconds)
+    return os.getpid(), getattr(_detector, 'is_ready', True)
+
+
+def _run(method_name, args):
+    started_at = time.time()
+    return started_at, getattr(_detector, method_name)(*args)
+
+
+class InferencePool:
+    """Emotion detection in pre-warmed worker processes behind a bounded queue
+
+    At most max_queue calls are admitted at a time (running or waiting);
+    further calls fail fast with InferenceQueueFull, and a call that is not
+    answered within deadline seconds raises InferenceTimeout, both carrying a
+    Retry-After hint. Workers are spawned (not forked), so TensorFlow is never
+    inherited from a multi-threaded parent.
+    """
+
+    def __init__(self, workers=2, max_queue=8, deadline=10, detector_factory=create_emotion_detector):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self._detector_factory = detector_factory
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._lock = threading.Lock()
+        self._executor = self._create_executor()
+        self._ready = threading.Event()
+        self.depth = 0
+        self.max_depth = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_time = LatencyHistogram()
+        self.latency = LatencyHistogram()
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self._detector_factory,)
+        )
+
+    @property
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def warmup(self, timeout=300):
+        """Start every worker process (each warms up its detector) and wait for them"""
+        try:
+            futures = [self._executor.submit(_worker_ready, 0.5) for _ in range(self.workers)]
+            results = [future.result(timeout=timeout) for future in futures]
+            if all(ready for _, ready in results):
+                self._ready.set()
+                return True
+            print("Inference workers started, but some detectors failed to warm up")
+            return False
+        except Exception as e:
+            print(f"Error starting inference workers: {str(e)}")
+            return False
+
+    def _retry_after(self):
+        """Rough seconds until a queue slot frees up"""
+        mean_latency = self.latency.snapshot()['mean'] or 1
+        return max(1, min(60, math.ceil(mean_latency * self.depth / self.workers)))
+
+    def _call(self, method_name, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise InferenceQueueFull('Inference queue is full', self._retry_after())
+
+        submitted_at = time.time()
+        with self._lock:
+            self.depth += 1
+            self.max_depth = max(self.max_depth, self.depth)
+        try:
+            executor = self._executor
+            future = executor.submit(_run, method_name, args)
+        except BrokenProcessPool:
+            self._release()
+            self._replace_executor(executor)
+            raise InferenceUnavailable('Inference workers are restarting', 1)
+        # The slot stays taken until the worker is really done, even after a timeout
+        future.add_done_callback(self._release)
+
+        try:
+            started_at, result = future.result(timeout=self.deadline)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise InferenceTimeout('Inference deadline exceeded', self._retry_after())
+        except BrokenProcessPool:
+            self._replace_executor(executor)
+            raise InferenceUnavailable('Inference workers are restarting', 1)
+
+        self.wait_time.observe(max(0.0, started_at - submitted_at))
+        self.latency.observe(time.time() - submitted_at)
+        return result
+
+    def _replace_executor(self, broken_executor):
+        """A worker died (e.g. OOM killed): start a fresh pool once for all waiting callers"""
+        with self._lock:
+            if self._executor is broken_executor:
+                self._executor = self._create_executor()
+        broken_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, future=None):
+        with self._lock:
+            self.depth -= 1
+        self._slots.release()
+
+    def detect_emotion(self, image_bytes):
+        return self._call('detect_emotion', io.BytesIO(image_bytes))
+
+    def detect_emotions_batch(self, images):
+        return self._call('detect_emotions_batch', images)
+
+    def detect_emotion_frames(self, images):
+        return self._call('detect_emotion_frames', images)
+
+    def detect_emotion_video(self, video_bytes):
+        return self._call('detect_emotion_video', video_bytes)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'depth': self.depth,
+                'max_depth': self.max_depth,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'ready': self.is_ready,
+                'wait_time': self.wait_time.snapshot(),
+                'latency': self.latency.snapshot()
+            }
@@ -0,0 +1,443 @@
+"""
+Standalone emotion inference service with dynamic micro-batching.
+
+Concurrent requests from all API workers are collected into batches of up to
+INFERENCE_BATCH_SIZE images, waiting at most INFERENCE_BATCH_WAIT_MS for a
+batch to fill, and each batch goes through the emotion model in one call.
+
+Run from the backend directory:
+    python -m services.inference_server [--port 8500 | --unix-socket /run/vibe-tuner/inference.sock]
+and point the API at it with INFERENCE_SERVER_URL (http://127.0.0.1:8500 or
+unix:///run/vibe-tuner/inference.sock).
+"""
+import argparse
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from config.settings import Config
+from services.image_pipeline import ImageTooLarge
+from services.inference_pool import InferenceQueueFull, InferenceTimeout, InferenceUnavailable
+from services.metrics import LatencyHistogram
+
+_STOP = object()
+
+
+def pack_images(images):
+    """Length-prefixed concatenation of image payloads (body of /detect-batch)"""
+    return b''.join(struct.pack('>I', len(image)) + image for image in images)
+
+
+def unpack_images(body):
+    """Image payloads of a pack_images body; ValueError when it is truncated"""
+    images, offset = [], 0
+    while offset < len(body):
+        if offset + 4 > len(body):
+            raise ValueError('Incomplete image length header')
+        (length,) = struct.unpack_from('>I', body, offset)
+        offset += 4
+        if offset + length > len(body):
+            raise ValueError('Image length runs past the end of the body')
+        images.append(body[offset:offset + length])
+        offset += length
+    return images
+
+
+class _Call:
+    """A job for the batcher thread that is run on its own, not batched"""
+
+    def __init__(self, function, args):
+        self.function = function
+        self.args = args
+
+
+class MicroBatcher:
+    """Collects single items submitted from many threads into batches for one process_batch call
+
+    A batch is run as soon as it has max_batch_size items or max_wait seconds
+    after its first item arrived. At most max_queue items wait; submit()
+    raises InferenceQueueFull beyond that. submit_call() queues other model
+    work (e.g. a frame sequence) on the same thread and queue, so only one
+    model call runs at a time. Cancelled futures are skipped.
+    """
+
+    def __init__(self, process_batch, max_batch_size=16, max_wait=0.01, max_queue=256):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.calls = 0
+        self.rejected = 0
+        self.batch_latency = LatencyHistogram()
+        self._thread = threading.Thread(target=self._loop, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Future of item's result in the next batch"""
+        return self._put(item)
+
+    def submit_call(self, function, *args):
+        """Future of function(*args), run alone on the batcher thread"""
+        return self._put(_Call(function, args))
+
+    def _put(self, item):
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise InferenceQueueFull('Inference server queue is full', 1)
+        return future
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            if isinstance(first[0], _Call):
+                self._run_call(*first)
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            stopping, call = False, None
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                if isinstance(entry[0], _Call):
+                    # Keep the queue order: the batch so far runs first
+                    call = entry
+                    break
+                batch.append(entry)
+            self._run(batch)
+            if call is not None:
+                self._run_call(*call)
+            if stopping:
+                return
+
+    def _run_call(self, call, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(call.function(*call.args))
+        except Exception as e:
+            future.set_exception(e)
+        with self._lock:
+            self.calls += 1
+
+    def _run(self, batch):
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            with self.batch_latency.time():
+                results = self.process_batch([item for item, _ in batch])
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'batches': self.batches,
+                'items': self.items,
+                'mean_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+                'max_batch_size': self.max_batch_seen,
+                'calls': self.calls,
+                'rejected': self.rejected,
+                'batch_latency': self.batch_latency.snapshot()
+            }
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """POST /detect (one image), POST /detect-batch (pack_images body), GET /health
+
+    POST /detect-frames (pack_images body) and POST /detect-video (clip bytes)
+    analyse one sequence with the server's detector; the sequence already
+    sends all of its face crops to the model in one call, so it is queued
+    as a single job on the batcher thread with the same limits.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {'error': 'Not found'})
+            return
+        self._send_json(200, {'ready': self.server.is_ready(), 'batcher': self.server.batcher.stats()})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        batcher, detector = self.server.batcher, self.server.sequence_detector
+        try:
+            if self.path == '/detect':
+                jobs = [(batcher.submit, (body,))]
+            elif self.path == '/detect-batch':
+                jobs = [(batcher.submit, (image,)) for image in unpack_images(body)]
+            elif self.path == '/detect-frames' and detector is not None:
+                jobs = [(batcher.submit_call, (detector.detect_emotion_frames, unpack_images(body)))]
+            elif self.path == '/detect-video' and detector is not None:
+                jobs = [(batcher.submit_call, (detector.detect_emotion_video, body))]
+            else:
+                self._send_json(404, {'error': 'Not found'})
+                return
+        except ValueError as e:
+            self._send_json(400, {'error': f'Malformed request body: {str(e)}'})
+            return
+
+        futures = []
+        try:
+            for submit, args in jobs:
+                futures.append(submit(*args))
+            deadline = time.monotonic() + self.server.deadline
+            results = [future.result(timeout=max(0, deadline - time.monotonic())) for future in futures]
+        except InferenceQueueFull as e:
+            self._cancel(futures)
+            self._send_json(503, {'error': str(e)}, {'Retry-After': str(e.retry_after)})
+            return
+        except FutureTimeoutError:
+            self._cancel(futures)
+            self._send_json(503, {'error': 'Inference deadline exceeded'}, {'Retry-After': '1'})
+            return
+        except ImageTooLarge as e:
+            self._send_json(413, {'error': str(e)})
+            return
+        except Exception as e:
+            self._cancel(futures)
+            self._send_json(500, {'error': f'Inference failed: {str(e)}'})
+            return
+        self._send_json(200, {'results': results})
+
+    @staticmethod
+    def _cancel(futures):
+        # Items of a refused request that are still queued are skipped by the batcher
+        for future in futures:
+            future.cancel()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UnixThreadingHTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        socketserver.TCPServer.server_bind(self)
+        self.server_name, self.server_port = 'localhost', 0
+
+
+def make_server(batcher, host='127.0.0.1', port=8500, unix_socket=None, deadline=10, is_ready=lambda: True,
+                sequence_detector=None):
+    """HTTP server (TCP or Unix socket) answering inference requests through batcher"""
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = UnixThreadingHTTPServer(unix_socket, InferenceRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), InferenceRequestHandler)
+    server.daemon_threads = True
+    server.batcher = batcher
+    server.deadline = deadline
+    server.is_ready = is_ready
+    server.sequence_detector = sequence_detector
+    return server
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class InferenceClient:
+    """Thin client for the inference server, with the detector's call interface
+
+    Keeps one keep-alive connection per thread. Connection problems raise
+    InferenceUnavailable and an overloaded server InferenceQueueFull, so the
+    API answers 503 with Retry-After either way.
+    """
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        parts = urlsplit(url)
+        self._socket_path = parts.path if parts.scheme == 'unix' else None
+        self._host, self._port = parts.hostname, parts.port
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            if self._socket_path:
+                connection = UnixHTTPConnection(self._socket_path, self.timeout)
+            else:
+                connection = http.client.HTTPConnection(self._host, self._port, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def _drop_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+        self._local.connection = None
+
+    def _request(self, method, path, body=None):
+        with self._lock:
+            self.requests += 1
+        started = time.perf_counter()
+        # A kept-alive connection may have been closed by the server; retry once on a new one
+        for attempt in range(2):
+            try:
+                connection = self._connection()
+                connection.request(method, path, body=body, headers={'Content-Type': 'application/octet-stream'})
+                response = connection.getresponse()
+                payload = response.read()
+                break
+            except TimeoutError:
+                self._drop_connection()
+                self._count_error()
+                raise InferenceTimeout('Inference server did not answer in time', 1)
+            except (OSError, http.client.HTTPException) as e:
+                self._drop_connection()
+                if attempt:
+                    self._count_error()
+                    raise InferenceUnavailable(f'Inference server unreachable: {str(e)}', 1)
+        self.latency.observe(time.perf_counter() - started)
+
+        if response.status == 503:
+            self._count_error()
+            raise InferenceQueueFull('Inference server is busy', int(response.getheader('Retry-After', 1)))
+        if response.status == 413:
+            raise ImageTooLarge(json.loads(payload)['error'])
+        if response.status != 200:
+            self._count_error()
+            raise InferenceUnavailable(f'Inference server error {response.status}', 1)
+        return json.loads(payload)
+
+    def _count_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def detect_emotion(self, image_bytes):
+        return self._request('POST', '/detect', image_bytes)['results'][0]
+
+    def detect_emotions_batch(self, images):
+        return self._request('POST', '/detect-batch', pack_images(images))['results']
+
+    def detect_emotion_frames(self, images):
+        return self._request('POST', '/detect-frames', pack_images(images))['results'][0]
+
+    def detect_emotion_video(self, video_bytes):
+        return self._request('POST', '/detect-video', video_bytes)['results'][0]
+
+    @property
+    def is_ready(self):
+        try:
+            return bool(self._request('GET', '/health')['ready'])
+        except InferenceUnavailable:
+            return False
+
+    def warmup(self, timeout=300):
+        """Wait until the server reports its models are loaded"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.is_ready:
+                return True
+            time.sleep(1)
+        print(f"Inference server at {self.url} did not become ready")
+        return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'url': self.url,
+                'requests': self.requests,
+                'errors': self.errors,
+                'latency': self.latency.snapshot()
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Emotion inference server with micro-batching')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8500)
+    parser.add_argument('--unix-socket', help='listen on a Unix socket instead of TCP')
+    parser.add_argument('--max-batch', type=int, default=Config.INFERENCE_BATCH_SIZE)
+    parser.add_argument('--max-wait-ms', type=float, default=Config.INFERENCE_BATCH_WAIT_MS)
+    args = parser.parse_args()
+
+    from services.emotion_detector import EmotionDetector
+    detector = EmotionDetector()
+    threading.Thread(target=detector.warmup, name='model-warmup', daemon=True).start()
+
+    batcher = MicroBatcher(
+        detector.detect_emotions_batch,
+        max_batch_size=args.max_batch,
+        max_wait=args.max_wait_ms / 1000,
+        max_queue=Config.INFERENCE_MAX_QUEUE * args.max_batch
+    )
+    server = make_server(
+        batcher, host=args.host, port=args.port, unix_socket=args.unix_socket,
+        deadline=Config.INFERENCE_DEADLINE, is_ready=lambda: detector.is_ready, sequence_detector=detector
+    )
+    print(f"Inference server listening on {args.unix_socket or f'{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        batcher.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds in seconds; the last bucket catches everything slower
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """Thread-safe cumulative latency histogram with fixed buckets"""
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += seconds
+            self._count += 1
+            self._max = max(self._max, seconds)
+
+    @contextmanager
+    def time(self):
+        """Observe the wall time of the wrapped block, even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self):
+        """Bucket counts (keyed by upper bound) with count, sum, mean and max"""
+        with self._lock:
+            counts = list(self._counts)
+            total, count, maximum = self._sum, self._count, self._max
+
+        buckets = {f'le_{bound:g}': n for bound, n in zip(self.buckets, counts)}
+        buckets['le_inf'] = counts[-1]
+        return {
+            'count': count,
+            'sum': round(total, 6),
+            'mean': round(total / count, 6) if count else 0.0,
+            'max': round(maximum, 6),
+            'buckets': buckets
+        }
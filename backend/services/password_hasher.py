@@ -0,0 +1,144 @@
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+from services.metrics import LatencyHistogram
+from config.settings import Config
+
+
+class PasswordHashingUnavailable(Exception):
+    """Too many password hashes are queued; retry_after is a hint in seconds"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """Werkzeug password hashing on a dedicated, bounded thread pool
+
+    At most workers hashes run at once and at most max_queue are admitted
+    (running or waiting); further calls fail fast with
+    PasswordHashingUnavailable, as do calls not finished within deadline
+    seconds. hashlib's scrypt and PBKDF2 release the GIL, so a login storm
+    occupies at most workers cores and other requests keep running.
+
+    This only limits CPU concurrency: hash() and verify() still block the
+    calling thread until the result is ready (or the deadline passes), so a
+    waiting login holds its request thread. Work that need not be answered
+    right away, like rehashing after login, goes through hash_in_background.
+    """
+
+    def __init__(self, method='scrypt', salt_length=16, workers=2, max_queue=32, deadline=10):
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = workers
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._lock = threading.Lock()
+        # Werkzeug fills in defaults ("scrypt" -> "scrypt:32768:8:1"), so ask it once for the full form;
+        # needs_rehash is then a string comparison
+        self._hash_prefix = generate_password_hash('', method, salt_length).split('$', 1)[0]
+        self.depth = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.timeouts = 0
+        self.hash_latency = LatencyHistogram()
+        self.verify_latency = LatencyHistogram()
+
+    def _retry_after(self):
+        mean_latency = self.hash_latency.snapshot()['mean'] or self.verify_latency.snapshot()['mean'] or 0.1
+        return max(1, min(60, math.ceil(mean_latency * self.depth / self.workers)))
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.depth -= 1
+        self._slots.release()
+
+    def _timed(self, histogram, function, *args):
+        with histogram.time():
+            return function(*args)
+
+    def _call(self, histogram, function, *args):
+        """Run function on the pool and wait for its result"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHashingUnavailable('Password hashing queue is full', self._retry_after())
+
+        with self._lock:
+            self.depth += 1
+        future = self._executor.submit(self._timed, histogram, function, *args)
+        # The slot stays taken until the hash is really done, even after a timeout
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.deadline)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise PasswordHashingUnavailable('Password hashing deadline exceeded', self._retry_after())
+
+    def hash(self, password):
+        """Salted hash of password with the configured method"""
+        return self._call(
+            self.hash_latency, generate_password_hash, password, self.method, self.salt_length
+        )
+
+    def verify(self, password_hash, password):
+        """Whether password matches password_hash (any method Werkzeug supports)"""
+        return self._call(self.verify_latency, check_password_hash, password_hash, password)
+
+    def hash_in_background(self, password, callback):
+        """Hash password on the pool without waiting, then call callback(password_hash) on the pool thread
+
+        Returns False (the job is dropped) when max_queue hashes are already
+        admitted, so background work never queues without bound.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.dropped += 1
+            return False
+
+        with self._lock:
+            self.depth += 1
+        future = self._executor.submit(self._hash_and_call, password, callback)
+        future.add_done_callback(self._release)
+        return True
+
+    def _hash_and_call(self, password, callback):
+        try:
+            callback(self._timed(self.hash_latency, generate_password_hash, password, self.method, self.salt_length))
+        except Exception as e:
+            print(f"Error in background password hashing: {str(e)}")
+
+    def needs_rehash(self, password_hash):
+        """Whether password_hash was made with other parameters than the configured ones (no hashing)"""
+        parts = password_hash.split('$')
+        return len(parts) != 3 or parts[0] != self._hash_prefix or len(parts[1]) != self.salt_length
+
+    def stats(self):
+        with self._lock:
+            depth, rejected, dropped, timeouts = self.depth, self.rejected, self.dropped, self.timeouts
+        return {
+            'method': self.method,
+            'workers': self.workers,
+            'max_queue': self.max_queue,
+            'depth': depth,
+            'rejected': rejected,
+            'dropped': dropped,
+            'timeouts': timeouts,
+            'hash_latency': self.hash_latency.snapshot(),
+            'verify_latency': self.verify_latency.snapshot()
+        }
+
+
+password_hasher = PasswordHasher(
+    method=Config.PASSWORD_HASH_METHOD,
+    salt_length=Config.PASSWORD_HASH_SALT_LENGTH,
+    workers=Config.PASSWORD_HASH_WORKERS,
+    max_queue=Config.PASSWORD_HASH_MAX_QUEUE,
+    deadline=Config.PASSWORD_HASH_DEADLINE
+)
@@ -0,0 +1,79 @@
+from sqlalchemy import insert
+from config.settings import get_polish_time
+from models.database import db
+from models.emotion import EmotionRecord
+from models.emotion_track import EmotionTrack
+
+emotions = EmotionRecord.__table__
+emotion_tracks = EmotionTrack.__table__
+
+
+def track_row(emotion_record_id, track):
+    """emotion_tracks row values from a SpotifyService track dictionary"""
+    return {
+        'emotion_record_id': emotion_record_id,
+        'track_name': track['name'],
+        'artist': track['artist'],
+        'spotify_track_id': track['spotify_id'],
+        'preview_url': track.get('preview_url'),
+        'external_url': track['external_url'],
+        'album_image': track.get('album_image')
+    }
+
+
+def insert_tracks(emotion_record_id, tracks):
+    """Insert tracks for a record as one executemany (a single multi-row INSERT where supported)"""
+    if tracks:
+        db.session.execute(insert(emotion_tracks), [track_row(emotion_record_id, track) for track in tracks])
+
+
+def insert_emotion_record(user_id, emotion_type_id, confidence, detection_source, tracks_status, tracks=(), raw_emotions=None):
+    """Insert an emotion record with its tracks without the ORM unit of work
+
+    The record id comes back through INSERT ... RETURNING where the database
+    supports it, or the cursor's lastrowid otherwise. raw_emotions is the
+    detector's {emotion: percent} mapping, stored as a float16 vector.
+    Returns (id, timestamp); the caller commits.
+    """
+    timestamp = get_polish_time()
+    statement = insert(emotions).values(
+        user_id=user_id,
+        emotion_type_id=emotion_type_id,
+        confidence=confidence,
+        timestamp=timestamp,
+        detection_source=detection_source,
+        tracks_status=tracks_status,
+        raw_emotions=EmotionRecord.encode_raw_emotions(raw_emotions)
+    )
+    if db.session.get_bind().dialect.insert_returning:
+        record_id = db.session.execute(statement.returning(emotions.c.id)).scalar_one()
+    else:
+        record_id = db.session.execute(statement).inserted_primary_key[0]
+
+    insert_tracks(record_id, tracks)
+    return record_id, timestamp
+
+
+def insert_emotion_records(rows, tracks=None):
+    """Bulk-insert emotion records (column dicts with the same keys) and return their ids in order
+
+    tracks, when given, holds one list of track dictionaries per row.
+    With RETURNING support the records go in as batched multi-row INSERTs.
+    """
+    if not rows:
+        return []
+    if db.session.get_bind().dialect.insert_returning:
+        statement = insert(emotions).returning(emotions.c.id, sort_by_parameter_order=True)
+        record_ids = db.session.execute(statement, rows).scalars().all()
+    else:
+        record_ids = [db.session.execute(insert(emotions).values(**row)).inserted_primary_key[0] for row in rows]
+
+    if tracks:
+        track_rows = [
+            track_row(record_id, track)
+            for record_id, record_tracks in zip(record_ids, tracks)
+            for track in record_tracks
+        ]
+        if track_rows:
+            db.session.execute(insert(emotion_tracks), track_rows)
+    return record_ids
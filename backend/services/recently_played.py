@@ -0,0 +1,114 @@
+import hashlib
+import math
+import threading
+from sqlalchemy import select
+from models.database import db
+from models.emotion import EmotionRecord
+from models.emotion_track import EmotionTrack
+from services.cache import TTLCache
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (no false negatives)"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class UserTrackHistory:
+    """Tracks recommended to one user in roughly their last window records
+
+    Two Bloom filter generations of window records each: when the current
+    generation is full it becomes the previous one and the oldest is dropped,
+    so lookups always cover at least the last window records.
+    """
+
+    def __init__(self, window, tracks_per_record=5):
+        self.window = window
+        self._capacity = window * tracks_per_record
+        self._current = BloomFilter(self._capacity)
+        self._previous = None
+        self._records_in_current = 0
+        self._lock = threading.Lock()
+
+    def add_record(self, track_ids):
+        with self._lock:
+            if self._records_in_current >= self.window:
+                self._previous = self._current
+                self._current = BloomFilter(self._capacity)
+                self._records_in_current = 0
+            for track_id in track_ids:
+                self._current.add(track_id)
+            self._records_in_current += 1
+
+    def __contains__(self, track_id):
+        with self._lock:
+            return track_id in self._current or (self._previous is not None and track_id in self._previous)
+
+
+class RecentlyPlayedFilter:
+    """Process-wide, bounded map of user id -> UserTrackHistory
+
+    Histories are rebuilt from emotion_tracks (one query) when missing or
+    expired, so records made by other worker processes are picked up after
+    at most ttl seconds.
+    """
+
+    def __init__(self, window=20, max_users=10000, ttl=600):
+        self.window = window
+        self._histories = TTLCache(maxsize=max_users, ttl=ttl)
+
+    def _load_history(self, user_id):
+        recent_records = select(EmotionRecord.id).where(
+            EmotionRecord.user_id == user_id
+        ).order_by(
+            EmotionRecord.timestamp.desc()
+        ).limit(self.window)
+
+        rows = db.session.query(
+            EmotionTrack.emotion_record_id,
+            EmotionTrack.spotify_track_id
+        ).filter(
+            EmotionTrack.emotion_record_id.in_(recent_records.scalar_subquery())
+        ).order_by(EmotionTrack.emotion_record_id).all()
+
+        tracks_by_record = {}
+        for record_id, track_id in rows:
+            tracks_by_record.setdefault(record_id, []).append(track_id)
+
+        history = UserTrackHistory(self.window)
+        for track_ids in tracks_by_record.values():
+            history.add_record(track_ids)
+        return history
+
+    def for_user(self, user_id):
+        """Get the user's history (supports `track_id in history`)"""
+        return self._histories.get_or_load(user_id, lambda: self._load_history(user_id))
+
+    def record(self, user_id, track_ids):
+        """Remember tracks just recommended to the user"""
+        if track_ids:
+            self.for_user(user_id).add_record(track_ids)
+
+    def forget(self, user_id):
+        self._histories.invalidate(user_id)
+
+    def clear(self):
+        self._histories.clear()
@@ -1,51 +1,411 @@
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
-from config.settings import Config
+from sqlalchemy import insert
+from config.settings import Config, get_polish_time
+from models.database import db
 from models.playlist import EmotionPlaylist
+from models.playlist_track import PlaylistTrack, catalog_track_ids
+from services.cache import TTLCache
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from services.metrics import LatencyHistogram
+from services.spotify_transport import SharedTokenCacheHandler, build_session, is_transient_error
+from services.track_index import TrackIndex
+from concurrent.futures import ThreadPoolExecutor
 import random
 
+# Only the fields we keep in the catalog, to keep playlist pages small
+PLAYLIST_ITEMS_FIELDS = 'next,items(track(id,type,name,preview_url,artists(name),external_urls(spotify),album(images(url))))'
+
+
+def close_emotion_weights(emotion_scores, margin, top_k):
+    """Top emotions scoring within margin points of the best one, as {emotion: score}"""
+    ranked = sorted(
+        ((name, float(score)) for name, score in emotion_scores.items()),
+        key=lambda item: item[1],
+        reverse=True
+    )[:top_k]
+    if not ranked:
+        return {}
+    best_score = ranked[0][1]
+    return {name: score for name, score in ranked if best_score - score <= margin}
+
+
+def split_count(weights, count):
+    """Split count between keys proportionally to weights (largest remainder)
+
+    Keys are returned heaviest first; keys that get nothing are left out.
+    """
+    total = sum(weights.values())
+    if total <= 0:
+        return {}
+    exact = {name: weight * count / total for name, weight in weights.items()}
+    quotas = {name: int(share) for name, share in exact.items()}
+    by_remainder = sorted(exact, key=lambda name: exact[name] - quotas[name], reverse=True)
+    for name in by_remainder[:count - sum(quotas.values())]:
+        quotas[name] += 1
+    return {name: quotas[name] for name in sorted(quotas, key=weights.get, reverse=True) if quotas[name] > 0}
+
+
 class SpotifyService:
     def __init__(self):
+        # One keep-alive pool for both the token endpoint and the Web API
+        self.session = build_session(
+            pool_size=Config.SPOTIFY_POOL_SIZE,
+            max_retries=Config.SPOTIFY_MAX_RETRIES,
+            max_retry_after=Config.SPOTIFY_MAX_RETRY_AFTER
+        )
+        timeout = (Config.SPOTIFY_CONNECT_TIMEOUT, Config.SPOTIFY_READ_TIMEOUT)
+
         self.client_credentials_manager = SpotifyClientCredentials(
             client_id=Config.SPOTIFY_CLIENT_ID,
-            client_secret=Config.SPOTIFY_CLIENT_SECRET
+            client_secret=Config.SPOTIFY_CLIENT_SECRET,
+            requests_session=self.session,
+            requests_timeout=timeout,
+            cache_handler=SharedTokenCacheHandler(Config.SPOTIFY_TOKEN_CACHE_PATH)
+        )
+        self.client_credentials_manager.OAUTH_TOKEN_URL = Config.SPOTIFY_TOKEN_URL
+        self.spotify = spotipy.Spotify(
+            client_credentials_manager=self.client_credentials_manager,
+            requests_session=self.session,
+            requests_timeout=timeout
+        )
+        self.spotify.prefix = Config.SPOTIFY_API_URL
+
+        self.breaker = CircuitBreaker(
+            failure_threshold=Config.SPOTIFY_BREAKER_FAILURES,
+            reset_timeout=Config.SPOTIFY_BREAKER_RESET_TIMEOUT
         )
-        self.spotify = spotipy.Spotify(client_credentials_manager=self.client_credentials_manager)
+        self.latency = LatencyHistogram()
+        # Normalized track lists per emotion, so a hot emotion costs one playlist download per TTL window
+        self.tracks_cache = TTLCache(
+            maxsize=Config.SPOTIFY_CACHE_MAX_ENTRIES,
+            ttl=Config.SPOTIFY_CACHE_TTL
+        )
+        # Concurrent live playlist downloads when blending several emotions
+        self.fetch_executor = ThreadPoolExecutor(max_workers=Config.SPOTIFY_POOL_SIZE, thread_name_prefix='spotify-fetch')
+        # Emotion-profile index over the whole catalog, rebuilt after a sync or TTL
+        self.track_index_cache = TTLCache(maxsize=1, ttl=Config.TRACK_INDEX_TTL)
+
+    def _call(self, func, *args, **kwargs):
+        """Call the Spotify API through the circuit breaker, recording latency"""
+        def timed_call():
+            with self.latency.time():
+                return func(*args, **kwargs)
+
+        return self.breaker.call(timed_call, is_failure=is_transient_error)
 
     def _get_playlist_id_for_emotion(self, emotion):
-        playlist = EmotionPlaylist.get_by_emotion(emotion)
-        return playlist.spotify_playlist_id if playlist else None
+        return EmotionPlaylist.get_spotify_playlist_id(emotion)
+
+    @staticmethod
+    def _normalize_track(track):
+        return {
+            'name': track['name'],
+            'artist': track['artists'][0]['name'] if track['artists'] else 'Unknown',
+            'spotify_id': track['id'],
+            'preview_url': track.get('preview_url'),
+            'external_url': track['external_urls']['spotify'],
+            'album_image': track['album']['images'][0]['url'] if track['album']['images'] else None
+        }
+
+    def _fetch_playlist_tracks(self, playlist_id):
+        """Download a playlist and reshape its items into track dicts"""
+        playlist = self._call(self.spotify.playlist, playlist_id)
+        return [
+            self._normalize_track(item['track'])
+            for item in playlist['tracks']['items']
+            if item['track']
+        ]
+
+    def _fetch_all_playlist_tracks(self, playlist_id):
+        """Download every page of playlist items (not only the first 100)"""
+        tracks = []
+        page = self._call(
+            self.spotify.playlist_items,
+            playlist_id,
+            fields=PLAYLIST_ITEMS_FIELDS,
+            limit=100,
+            additional_types=('track',)
+        )
+        while page:
+            for item in page['items']:
+                track = item.get('track')
+                if track and track.get('id') and track.get('type', 'track') == 'track':
+                    tracks.append(self._normalize_track(track))
+            page = self._call(self.spotify.next, page) if page.get('next') else None
+        return tracks
+
+    def get_tracks_metadata(self, track_ids):
+        """Current preview_url/album_image for up to 50 track ids, as {track_id: fields}
+
+        Tracks Spotify no longer knows are left out of the result.
+        """
+        response = self._call(self.spotify.tracks, track_ids)
+        metadata = {}
+        # Results come back in request order; relinked tracks may carry a different id
+        for track_id, track in zip(track_ids, response['tracks']):
+            if track:
+                metadata[track_id] = {
+                    'preview_url': track.get('preview_url'),
+                    'album_image': track['album']['images'][0]['url'] if track['album']['images'] else None
+                }
+        return metadata
+
+    def sync_playlist(self, playlist):
+        """Refresh the local catalog of playlist if its Spotify snapshot_id changed
+
+        Returns True when the tracks were re-downloaded.
+        """
+        snapshot_id = self._call(self.spotify.playlist, playlist.spotify_playlist_id, fields='snapshot_id')['snapshot_id']
+        if playlist.snapshot_id == snapshot_id:
+            return False
+
+        tracks = self._fetch_all_playlist_tracks(playlist.spotify_playlist_id)
+
+        PlaylistTrack.query.filter_by(playlist_id=playlist.id).delete(synchronize_session=False)
+        if tracks:
+            db.session.execute(insert(PlaylistTrack), [
+                {
+                    'playlist_id': playlist.id,
+                    'position': position,
+                    'track_name': track['name'],
+                    'artist': track['artist'],
+                    'spotify_track_id': track['spotify_id'],
+                    'preview_url': track['preview_url'],
+                    'external_url': track['external_url'],
+                    'album_image': track['album_image']
+                }
+                for position, track in enumerate(tracks)
+            ])
+        playlist.snapshot_id = snapshot_id
+        playlist.synced_at = get_polish_time()
+        db.session.commit()
+
+        if playlist.emotion_type:
+            self.tracks_cache.invalidate(playlist.emotion_type.name)
+        catalog_track_ids.invalidate(playlist.id)
+        self.track_index_cache.clear()
+        return True
+
+    def sync_catalog(self):
+        """Sync the local catalog of every emotion playlist, skipping unchanged snapshots"""
+        summary = {'synced': 0, 'unchanged': 0, 'failed': 0}
+        for playlist in EmotionPlaylist.get_all():
+            playlist_id = playlist.spotify_playlist_id
+            try:
+                if self.sync_playlist(playlist):
+                    summary['synced'] += 1
+                else:
+                    summary['unchanged'] += 1
+            except Exception as e:
+                db.session.rollback()
+                summary['failed'] += 1
+                print(f"Error syncing playlist {playlist_id}: {str(e)}")
+        return summary
+
+    def _get_tracks_for_emotion(self, emotion, playlist_id=None):
+        """Get all tracks for emotion, served from cache while fresh
+
+        When Spotify fails (or the circuit is open) an expired cached list is
+        returned instead, if there is one. Passing playlist_id avoids the
+        database lookup, so this can run in a fetch thread.
+        """
+        def load():
+            resolved_id = playlist_id or self._get_playlist_id_for_emotion(emotion)
+            if not resolved_id:
+                return []
+            return self._fetch_playlist_tracks(resolved_id)
 
-    def get_random_tracks_for_emotion(self, emotion, count=5):
         try:
+            return self.tracks_cache.get_or_load(emotion, load)
+        except Exception:
+            stale_tracks = self.tracks_cache.get_stale(emotion)
+            if stale_tracks is not None:
+                return stale_tracks
+            raise
+
+    @staticmethod
+    def _pick_tracks(shuffled_tracks, count, exclude):
+        """Take count tracks from an already shuffled list, preferring ones not in exclude
+
+        When there are not enough fresh tracks the rest is filled with excluded
+        ones, so an exhausted pool still yields a full recommendation.
+        """
+        if exclude is None:
+            return shuffled_tracks[:count]
+        fresh, repeated = [], []
+        for track in shuffled_tracks:
+            (repeated if track['spotify_id'] in exclude else fresh).append(track)
+            if len(fresh) == count:
+                return fresh
+        return fresh + repeated[:count - len(fresh)]
+
+    def get_random_tracks_for_emotion(self, emotion, count=5, exclude=None):
+        """Sample count tracks for emotion
+
+        exclude is an optional container of Spotify track ids (e.g. the user's
+        recently played history) that are only used when nothing else is left.
+        """
+        try:
+            # Local catalog first: one indexed query, no Spotify call on the request path
+            limit = count if exclude is None else count * Config.HISTORY_OVERSAMPLE
+            catalog_tracks = PlaylistTrack.sample_for_emotion(emotion, limit)
+            if catalog_tracks:
+                return self._pick_tracks([track.to_dict() for track in catalog_tracks], count, exclude)
+
             if not self.spotify:
                 return []
 
-            playlist_id = self._get_playlist_id_for_emotion(emotion)
+            # Catalog not synced yet for this emotion - fall back to the live playlist
+            all_tracks = self._get_tracks_for_emotion(emotion)
 
-            if not playlist_id:
-                return []
+            if exclude is None:
+                if len(all_tracks) <= count:
+                    return list(all_tracks)
+                return random.sample(all_tracks, count)
 
-            playlist = self.spotify.playlist(playlist_id)
+            return self._pick_tracks(random.sample(all_tracks, len(all_tracks)), count, exclude)
 
-            all_tracks = []
-            for item in playlist['tracks']['items']:
-                if item['track']:
-                    track = item['track']
-                    all_tracks.append({
-                        'name': track['name'],
-                        'artist': track['artists'][0]['name'] if track['artists'] else 'Unknown',
-                        'spotify_id': track['id'],
-                        'preview_url': track.get('preview_url'),
-                        'external_url': track['external_urls']['spotify'],
-                        'album_image': track['album']['images'][0]['url'] if track['album']['images'] else None
-                    })
+        except CircuitOpenError:
+            # Spotify is known to be unhealthy - fail fast without logging every request
+            return []
+        except Exception as e:
+            print(f"Error getting Spotify tracks: {str(e)}")
+            return []
+
+    @staticmethod
+    def _merge_candidates(quotas, candidates, count, exclude):
+        """Take quotas[emotion] tracks from each shuffled candidate list, without duplicates
+
+        Shortfalls (small playlists, recently played tracks) are filled from the
+        other emotions' leftovers, fresh ones first.
+        """
+        chosen, seen, leftovers = [], set(), []
+        for emotion, quota in quotas.items():
+            taken = 0
+            for track in candidates.get(emotion, []):
+                if track['spotify_id'] in seen:
+                    continue
+                if taken < quota and (exclude is None or track['spotify_id'] not in exclude):
+                    chosen.append(track)
+                    seen.add(track['spotify_id'])
+                    taken += 1
+                else:
+                    leftovers.append(track)
+
+        leftovers.sort(key=lambda track: exclude is not None and track['spotify_id'] in exclude)
+        for track in leftovers:
+            if len(chosen) >= count:
+                break
+            if track['spotify_id'] not in seen:
+                chosen.append(track)
+                seen.add(track['spotify_id'])
+        return chosen
+
+    def get_blended_tracks(self, emotion_weights, count=5, exclude=None):
+        """Mix tracks from several emotion playlists in proportion to emotion_weights
+
+        Catalog samples are local queries; emotions that need a live playlist
+        download are fetched concurrently, so the total latency stays close to
+        a single fetch.
+        """
+        try:
+            quotas = split_count(emotion_weights, count)
+            limit = count * Config.HISTORY_OVERSAMPLE
+            candidates, live_fetches = {}, {}
 
-            if len(all_tracks) <= count:
-                return all_tracks
+            for emotion in quotas:
+                catalog_tracks = PlaylistTrack.sample_for_emotion(emotion, limit)
+                if catalog_tracks:
+                    candidates[emotion] = [track.to_dict() for track in catalog_tracks]
+                    continue
+                playlist_id = self._get_playlist_id_for_emotion(emotion)
+                if playlist_id:
+                    live_fetches[emotion] = self.fetch_executor.submit(self._get_tracks_for_emotion, emotion, playlist_id)
 
-            return random.sample(all_tracks, count)
+            for emotion, future in live_fetches.items():
+                try:
+                    tracks = future.result()
+                    candidates[emotion] = random.sample(tracks, len(tracks))
+                except CircuitOpenError:
+                    pass
+                except Exception as e:
+                    print(f"Error getting Spotify tracks for {emotion}: {str(e)}")
+
+            return self._merge_candidates(quotas, candidates, count, exclude)
 
         except Exception as e:
-            print(f"Error getting Spotify tracks: {str(e)}")
-            return []
\ No newline at end of file
+            print(f"Error blending Spotify tracks: {str(e)}")
+            return []
+
+    def get_track_pools(self, pool_sizes):
+        """Candidate tracks for each {emotion: size} entry, loaded once for a whole batch of recommendations
+
+        A pool is a sample of up to size catalog tracks (one query) or, while
+        the catalog is not synced, the live playlist; live downloads run
+        concurrently. Emotions without tracks get an empty pool.
+        """
+        pools, live_fetches = {}, {}
+        for emotion, size in pool_sizes.items():
+            pools[emotion] = []
+            try:
+                catalog_tracks = PlaylistTrack.sample_for_emotion(emotion, size)
+                if catalog_tracks:
+                    pools[emotion] = [track.to_dict() for track in catalog_tracks]
+                    continue
+                playlist_id = self._get_playlist_id_for_emotion(emotion) if self.spotify else None
+                if playlist_id:
+                    live_fetches[emotion] = self.fetch_executor.submit(self._get_tracks_for_emotion, emotion, playlist_id)
+            except Exception as e:
+                print(f"Error loading track pool for {emotion}: {str(e)}")
+
+        for emotion, future in live_fetches.items():
+            try:
+                pools[emotion] = list(future.result())
+            except CircuitOpenError:
+                pass
+            except Exception as e:
+                print(f"Error getting Spotify tracks for {emotion}: {str(e)}")
+        return pools
+
+    @staticmethod
+    def pick_from_pools(pools, emotion_weights, count=5, exclude=None):
+        """One recommendation from get_track_pools() pools, no queries
+
+        A single emotion is sampled like get_random_tracks_for_emotion, several
+        are blended in proportion to emotion_weights like get_blended_tracks.
+        """
+        quotas = split_count(emotion_weights, count)
+        limit = count if exclude is None else count * Config.HISTORY_OVERSAMPLE
+        candidates = {}
+        for emotion in quotas:
+            pool = pools.get(emotion, [])
+            candidates[emotion] = random.sample(pool, min(limit, len(pool)))
+        if len(candidates) == 1:
+            return SpotifyService._pick_tracks(next(iter(candidates.values())), count, exclude)
+        return SpotifyService._merge_candidates(quotas, candidates, count, exclude)
+
+    def get_track_index(self):
+        return self.track_index_cache.get_or_load('catalog', TrackIndex.from_catalog)
+
+    def get_tracks_for_emotion_vector(self, emotion_scores, count=5, exclude=None):
+        """Nearest catalog tracks for the full {emotion: score} distribution
+
+        Returns an empty list when the catalog has not been synced yet.
+        """
+        try:
+            return self.get_track_index().query(emotion_scores, k=count, exclude=exclude)
+        except Exception as e:
+            print(f"Error querying track index: {str(e)}")
+            return []
+
+    def get_cache_stats(self):
+        return self.tracks_cache.stats()
+
+    def get_stats(self):
+        """Cache, circuit breaker and API latency stats for monitoring"""
+        return {
+            'cache': self.tracks_cache.stats(),
+            'circuit_breaker': self.breaker.stats(),
+            'latency': self.latency.snapshot()
+        }
@@ -0,0 +1,109 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from spotipy.cache_handler import CacheHandler
+from spotipy.exceptions import SpotifyException, SpotifyOauthError
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class BoundedRetry(Retry):
+    """urllib3 Retry that honors Retry-After only up to max_retry_after seconds
+
+    A longer Retry-After (a rate limit that will not clear soon) gives up
+    immediately instead of parking the request thread.
+    """
+
+    def __init__(self, *args, max_retry_after=5, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_retry_after = max_retry_after
+
+    def new(self, **kw):
+        new_retry = super().new(**kw)
+        new_retry.max_retry_after = self.max_retry_after
+        return new_retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if response is not None and self.respect_retry_after_header:
+            retry_after = self.get_retry_after(response)
+            if retry_after is not None and retry_after > self.max_retry_after:
+                raise MaxRetryError(_pool, url, ResponseError(
+                    f'Retry-After of {retry_after:g}s exceeds {self.max_retry_after:g}s'
+                ))
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+def build_session(pool_size=10, max_retries=2, backoff_factor=0.3, max_retry_after=5):
+    """Keep-alive session with a bounded connection pool and bounded retries"""
+    retry = BoundedRetry(
+        total=max_retries,
+        connect=max_retries,
+        read=0,
+        status=max_retries,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET', 'POST']),
+        backoff_factor=backoff_factor,
+        respect_retry_after_header=True,
+        max_retry_after=max_retry_after
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def is_transient_error(error):
+    """Whether error means Spotify is unhealthy (as opposed to e.g. a missing playlist)"""
+    if isinstance(error, SpotifyException):
+        return error.http_status == 429 or error.http_status >= 500
+    return isinstance(error, (SpotifyOauthError, requests.exceptions.RequestException, OSError))
+
+
+class SharedTokenCacheHandler(CacheHandler):
+    """Client-credentials token cache shared by all worker processes on the host
+
+    The token is kept in memory and in a JSON file; the file is only read when
+    the in-memory token is missing or about to expire, and it is replaced
+    atomically so concurrent workers never see a half-written token.
+    """
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self._token_info = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_fresh(token_info):
+        return bool(token_info) and token_info.get('expires_at', 0) - time.time() >= 60
+
+    def get_cached_token(self):
+        with self._lock:
+            if self._is_fresh(self._token_info):
+                return self._token_info
+            try:
+                with open(self.cache_path, encoding='utf-8') as f:
+                    token_info = json.load(f)
+            except (OSError, ValueError):
+                return self._token_info
+            self._token_info = token_info
+            return token_info
+
+    def save_token_to_cache(self, token_info):
+        with self._lock:
+            self._token_info = token_info
+            directory = os.path.dirname(os.path.abspath(self.cache_path))
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.spotify-token-')
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(token_info, f)
+                os.chmod(tmp_path, 0o600)
+                os.replace(tmp_path, self.cache_path)
+            except OSError as e:
+                print(f"Couldn't write Spotify token cache: {str(e)}")
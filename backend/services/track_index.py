@@ -0,0 +1,124 @@
+import numpy as np
+from models.database import db
+from models.emotion_type import EmotionType, EMOTION_VECTOR_ORDER
+from models.playlist import EmotionPlaylist
+from models.playlist_track import PlaylistTrack
+
+EMOTION_INDEX = {name: i for i, name in enumerate(EMOTION_VECTOR_ORDER)}
+
+
+def emotion_vector(scores):
+    """Unit-length float32 vector from an {emotion: score} mapping
+
+    Unknown emotions are ignored; an all-zero input stays all-zero.
+    """
+    vector = np.zeros(len(EMOTION_VECTOR_ORDER), dtype=np.float32)
+    for name, score in scores.items():
+        index = EMOTION_INDEX.get(name)
+        if index is not None:
+            vector[index] = float(score)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class TrackIndex:
+    """In-memory nearest-neighbour index of catalog tracks by emotion profile
+
+    Tracks with an identical profile form a group, so a query scores each
+    distinct profile once (cosine similarity) and then samples random members
+    of the best groups - ties are broken randomly at no extra cost.
+    """
+
+    def __init__(self, tracks, profiles, seed=None):
+        self.tracks = list(tracks)
+        self._rng = np.random.default_rng(seed)
+
+        profiles = np.asarray(profiles, dtype=np.float32).reshape(len(self.tracks), len(EMOTION_VECTOR_ORDER))
+        norms = np.linalg.norm(profiles, axis=1, keepdims=True)
+        profiles = np.divide(profiles, norms, out=np.zeros_like(profiles), where=norms > 0)
+
+        if len(self.tracks):
+            self._group_profiles, group_of_track = np.unique(profiles, axis=0, return_inverse=True)
+            group_of_track = group_of_track.reshape(-1)
+        else:
+            self._group_profiles = np.zeros((0, len(EMOTION_VECTOR_ORDER)), dtype=np.float32)
+            group_of_track = np.zeros(0, dtype=np.intp)
+
+        # Stored transposed: a (7, G) layout makes the per-query product much faster
+        self._group_profiles_t = np.ascontiguousarray(self._group_profiles.T)
+
+        # Track indices sorted by group; members of group g are members[offsets[g]:offsets[g + 1]]
+        self._members = np.argsort(group_of_track, kind='stable')
+        self._offsets = np.concatenate(([0], np.cumsum(np.bincount(group_of_track, minlength=len(self._group_profiles)))))
+
+    def __len__(self):
+        return len(self.tracks)
+
+    @property
+    def group_count(self):
+        return len(self._group_profiles)
+
+    @classmethod
+    def from_catalog(cls):
+        """Build the index from the local playlist catalog
+
+        A track's profile counts the emotion playlists it appears in, so a
+        song listed for both happy and surprise sits between the two moods.
+        """
+        rows = db.session.query(
+            PlaylistTrack, EmotionType.name
+        ).join(
+            EmotionPlaylist, PlaylistTrack.playlist_id == EmotionPlaylist.id
+        ).join(
+            EmotionType, EmotionPlaylist.emotion_type_id == EmotionType.id
+        ).all()
+
+        tracks, profiles, position = [], [], {}
+        for track, emotion_name in rows:
+            emotion_index = EMOTION_INDEX.get(emotion_name)
+            if emotion_index is None:
+                continue
+            i = position.get(track.spotify_track_id)
+            if i is None:
+                i = position[track.spotify_track_id] = len(tracks)
+                tracks.append(track.to_dict())
+                profiles.append(np.zeros(len(EMOTION_VECTOR_ORDER), dtype=np.float32))
+            profiles[i][emotion_index] += 1
+
+        return cls(tracks, np.array(profiles, dtype=np.float32))
+
+    def query(self, scores, k=5, exclude=None):
+        """Get k tracks whose profiles are closest to the {emotion: score} mapping
+
+        Tracks whose spotify_id is in exclude are skipped unless nothing else
+        is left among the best candidates.
+        """
+        if not self.tracks or k <= 0:
+            return []
+        vector = emotion_vector(scores)
+        group_scores = vector @ self._group_profiles_t
+
+        # Each group holds at least one track, so the best k groups cover k tracks
+        # (more when recently played tracks have to be skipped)
+        group_limit = k if exclude is None else k * 4
+        candidate_groups = np.arange(len(group_scores))
+        if len(group_scores) > group_limit:
+            candidate_groups = np.argpartition(group_scores, len(group_scores) - group_limit)[len(group_scores) - group_limit:]
+        ordered_groups = candidate_groups[np.argsort(-group_scores[candidate_groups], kind='stable')]
+
+        picked, repeated = [], []
+        for group in ordered_groups:
+            members = self._members[self._offsets[group]:self._offsets[group + 1]]
+            need = k - len(picked)
+            sample_size = min(len(members), need if exclude is None else need * 4)
+            if len(members) > 1:
+                members = members[self._rng.choice(len(members), sample_size, replace=False)]
+            for track_index in members:
+                track = self.tracks[track_index]
+                if exclude is not None and track['spotify_id'] in exclude:
+                    repeated.append(track)
+                    continue
+                picked.append(track)
+                if len(picked) == k:
+                    return picked
+        return picked + repeated[:k - len(picked)]
@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+from sqlalchemy import String, column, or_, select, update, values
+from models.database import db
+from models.emotion_track import EmotionTrack
+
+# Spotify's GET /tracks accepts at most 50 ids
+SPOTIFY_TRACKS_BATCH = 50
+
+emotion_tracks = EmotionTrack.__table__
+
+
+def update_track_metadata(metadata):
+    """One set-based UPDATE for a chunk of {track_id: {preview_url, album_image}} lookups
+
+    The new values travel as a VALUES list in a CTE joined with UPDATE ...
+    FROM, so the whole chunk is a single statement (PostgreSQL, SQLite 3.33+).
+    Rows that already match are not rewritten. RETURNING reports the updated
+    rows, because the driver's rowcount is not reliable for statements that
+    start with WITH.
+    """
+    new_metadata = values(
+        column('track_id', String), column('preview_url', String), column('album_image', String),
+        name='new_metadata'
+    ).data([
+        (track_id, fields['preview_url'], fields['album_image']) for track_id, fields in metadata.items()
+    ]).cte('new_metadata')
+    return update(emotion_tracks).where(
+        emotion_tracks.c.spotify_track_id == new_metadata.c.track_id,
+        or_(
+            emotion_tracks.c.preview_url.is_distinct_from(new_metadata.c.preview_url),
+            emotion_tracks.c.album_image.is_distinct_from(new_metadata.c.album_image)
+        )
+    ).values(
+        preview_url=new_metadata.c.preview_url,
+        album_image=new_metadata.c.album_image
+    ).returning(emotion_tracks.c.id)
+
+
+class TrackMetadataRefresher:
+    """Re-fetch preview_url and album_image of every stored emotion track
+
+    Distinct track ids are streamed in order through a server-side cursor and
+    looked up 50 at a time. Each chunk's updates are committed before the last
+    id is written to the checkpoint file, so an interrupted run resumes after
+    the last finished chunk and memory use does not grow with the table.
+    """
+
+    def __init__(self, spotify_service, checkpoint_path, chunk_size=SPOTIFY_TRACKS_BATCH, stream_batch=1000):
+        self.spotify_service = spotify_service
+        self.checkpoint_path = checkpoint_path
+        self.chunk_size = min(chunk_size, SPOTIFY_TRACKS_BATCH)
+        self.stream_batch = stream_batch
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_checkpoint(self, state):
+        directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.track-metadata-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def clear_checkpoint(self):
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
+
+    def _apply(self, metadata):
+        """Write one chunk of lookups in a single transaction, returning the updated row count"""
+        if not metadata:
+            return 0
+        with db.engine.begin() as connection:
+            return len(connection.execute(update_track_metadata(metadata)).all())
+
+    def run(self, restart=False):
+        """Refresh all tracks (or the rest of an interrupted run) and return a summary"""
+        if restart:
+            self.clear_checkpoint()
+        state = self.load_checkpoint() or {'last_track_id': None, 'tracks': 0, 'updated': 0, 'missing': 0}
+        resumed_from = state['last_track_id']
+
+        query = select(EmotionTrack.spotify_track_id).distinct().order_by(EmotionTrack.spotify_track_id)
+        if resumed_from is not None:
+            query = query.where(EmotionTrack.spotify_track_id > resumed_from)
+
+        # Reads and writes use separate connections, so committing a chunk never closes the cursor
+        with db.engine.connect() as connection:
+            streamed = connection.execution_options(stream_results=True, yield_per=self.stream_batch)
+            with streamed.execute(query) as result:
+                for chunk in result.scalars().partitions(self.chunk_size):
+                    metadata = self.spotify_service.get_tracks_metadata(chunk)
+                    state['updated'] += self._apply(metadata)
+                    state['tracks'] += len(chunk)
+                    state['missing'] += len(chunk) - len(metadata)
+                    state['last_track_id'] = chunk[-1]
+                    self._save_checkpoint(state)
+
+        self.clear_checkpoint()
+        return dict(state, resumed_from=resumed_from)
@@ -0,0 +1,68 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from models.database import db
+from models.emotion import EmotionRecord
+from services.persistence import insert_tracks
+from config.settings import Config
+
+TRACKS_PENDING = 'pending'
+TRACKS_READY = 'ready'
+TRACKS_FAILED = 'failed'
+
+
+class TrackAttachmentWorker:
+    """Background pool that attaches Spotify tracks to already committed emotion records"""
+
+    def __init__(self, max_workers=4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='track-worker')
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def submit(self, app, record_id, load_tracks):
+        """Schedule load_tracks() for record_id; it runs inside an app context"""
+        with self._lock:
+            self._events[record_id] = threading.Event()
+        return self._executor.submit(self._attach_tracks, app, record_id, load_tracks)
+
+    def _attach_tracks(self, app, record_id, load_tracks):
+        with app.app_context():
+            try:
+                tracks = load_tracks()
+
+                emotion_record = db.session.get(EmotionRecord, record_id)
+                if emotion_record is None:  # deleted in the meantime
+                    return
+                insert_tracks(record_id, tracks)
+                emotion_record.tracks_status = TRACKS_READY
+                db.session.commit()
+
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error attaching tracks to emotion record {record_id}: {str(e)}")
+                emotion_record = db.session.get(EmotionRecord, record_id)
+                if emotion_record is not None:
+                    emotion_record.tracks_status = TRACKS_FAILED
+                    db.session.commit()
+
+            finally:
+                with self._lock:
+                    event = self._events.pop(record_id, None)
+                if event:
+                    event.set()
+
+    def wait_for(self, record_id, timeout):
+        """Block until the job for record_id finishes or timeout passes
+
+        Jobs running in another process are not visible here, so in that case
+        this just sleeps for timeout and the caller re-checks the database.
+        """
+        with self._lock:
+            event = self._events.get(record_id)
+        if event is not None:
+            event.wait(timeout)
+        else:
+            time.sleep(timeout)
+
+
+track_worker = TrackAttachmentWorker(max_workers=Config.ASYNC_TRACK_WORKERS)
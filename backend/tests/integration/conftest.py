@@ -8,6 +8,7 @@ import pytest
 import jwt
 import sys
 import os
+from concurrent.futures import Future
 from datetime import datetime, timedelta, timezone
 from unittest.mock import patch
 from flask import Flask
@@ -27,6 +28,18 @@ class TestConfig:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
 
 
+class InlineExecutor:
+    """Wykonuje zadania od razu, w wątku wywołującym (zamiast puli wątków)."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
 def create_test_app():
     """Tworzy aplikację Flask z konfiguracją testową."""
     from models.database import db
@@ -40,10 +53,12 @@ def create_test_app():
     from routes.auth_routes import auth_bp
     from routes.emotion_routes import emotion_bp
     from routes.analytics_routes import analytics_bp
+    from routes.health_routes import health_bp
 
     app.register_blueprint(auth_bp, url_prefix='/api')
     app.register_blueprint(emotion_bp, url_prefix='/api')
     app.register_blueprint(analytics_bp, url_prefix='/api')
+    app.register_blueprint(health_bp, url_prefix='/api')
 
     return app
 
@@ -64,6 +79,14 @@ def app():
 
     test_app = create_test_app()
 
+    # Per-process state must not leak between test databases
+    from routes.emotion_routes import recently_played
+    from models.emotion_registry import invalidate_emotion_registry
+    from models.playlist_track import catalog_track_ids
+    recently_played.clear()
+    invalidate_emotion_registry()
+    catalog_track_ids.clear()
+
     with test_app.app_context():
         db.create_all()
         _seed_emotion_types(db)
@@ -133,7 +156,10 @@ def mock_spotify_service():
     ]
 
     with patch('routes.emotion_routes.spotify_service') as mock:
+        from services.spotify_service import SpotifyService
         mock.get_random_tracks_for_emotion.return_value = mock_tracks
+        mock.get_track_pools.side_effect = lambda pool_sizes: {emotion: list(mock_tracks) for emotion in pool_sizes}
+        mock.pick_from_pools.side_effect = SpotifyService.pick_from_pools
         yield mock
 
 
@@ -173,3 +199,9 @@ def _seed_emotion_playlists(db):
                 playlist_name=f'Test Playlist for {emotion_name}'
             )
             db.session.add(playlist)
+
+
+@pytest.fixture
+def inline_executor():
+    """Executor wykonujący zadania w tle od razu, w wątku testu."""
+    return InlineExecutor()
@@ -31,6 +31,24 @@ class TestAnalytics:
         assert response.status_code == 200
         assert 'distribution' in json.loads(response.data)
 
+    def test_get_profile_averages_stored_scores(self, app, client, auth_headers, test_user):
+        """Sprawdza średnie wyniki emocji z zapisanych wektorów."""
+        from models.database import db
+        from services.persistence import insert_emotion_record
+
+        with app.app_context():
+            insert_emotion_record(test_user['id'], 1, 0.8, 'image', 'ready', raw_emotions={'happy': 80.0, 'sad': 20.0})
+            insert_emotion_record(test_user['id'], 2, 0.6, 'image', 'ready', raw_emotions={'happy': 40.0, 'sad': 60.0})
+            db.session.commit()
+
+        response = client.get('/api/analytics/profile', headers=auth_headers)
+
+        assert response.status_code == 200
+        profile = json.loads(response.data)['profile']
+        assert profile['happy'] == 60.0
+        assert profile['sad'] == 40.0
+        assert profile['angry'] == 0.0
+
     def test_analytics_without_auth_returns_401(self, client):
         """Sprawdza czy brak autoryzacji zwraca 401."""
         response = client.get('/api/analytics/by-hour')
@@ -5,6 +5,8 @@ Testuje punkty końcowe: rejestracja, logowanie, usunięcie konta.
 """
 import pytest
 import json
+from unittest.mock import patch
+from services.password_hasher import password_hasher
 
 
 class TestRegister:
@@ -66,3 +68,132 @@ class TestDeleteAccount:
         response = client.delete('/api/auth/account', data=json.dumps({'password': 'any'}), content_type='application/json')
 
         assert response.status_code == 401
+
+
+class TestTokenRevocation:
+    """Testy dla sprawdzania tokenów w token_required."""
+
+    def _token(self, user_id, issued_at):
+        import jwt
+        from datetime import timedelta
+        from tests.integration.conftest import TestConfig
+        return jwt.encode({'user_id': user_id, 'iat': issued_at, 'exp': issued_at + timedelta(days=7)}, TestConfig.SECRET_KEY, algorithm='HS256')
+
+    def test_handler_does_not_load_user_row(self, client, auth_headers):
+        """Sprawdza czy weryfikacja tokenu nie wczytuje wiersza użytkownika."""
+        from unittest.mock import patch
+        from models.database import db
+
+        with patch.object(db.session, 'get', side_effect=AssertionError('user lookup')):
+            response = client.get('/api/analytics/distribution', headers=auth_headers)
+
+        assert response.status_code == 200
+
+    def test_login_token_is_accepted(self, client, test_user):
+        """Sprawdza czy token z logowania (z iat) jest akceptowany."""
+        login = client.post('/api/auth/login', data=json.dumps({'email': test_user['email'], 'password': test_user['password']}), content_type='application/json')
+        token = json.loads(login.data)['token']
+
+        assert client.get('/api/emotion/history', headers={'Authorization': f'Bearer {token}'}).status_code == 200
+
+    def test_user_deleted_elsewhere_is_rejected_immediately(self, app, client, test_user, auth_headers):
+        """Sprawdza czy token jest odrzucany od razu po usunięciu konta (np. przez inny worker)."""
+        from models.database import db
+        from models.user import User
+
+        assert client.get('/api/analytics/by-hour', headers=auth_headers).status_code == 200
+        with app.app_context():
+            db.session.delete(db.session.get(User, test_user['id']))
+            db.session.commit()
+
+        assert client.get('/api/emotion/history', headers=auth_headers).status_code == 401
+        assert client.get('/api/analytics/by-hour', headers=auth_headers).status_code == 401
+
+    def test_token_of_deleted_user_does_not_pass_to_reused_id(self, app, client, test_user):
+        """Sprawdza czy token usuniętego użytkownika nie działa dla nowego konta z tym samym id."""
+        from datetime import datetime, timedelta, timezone
+        from models.database import db
+        from models.user import User
+
+        old_token = self._token(test_user['id'], datetime.now(timezone.utc) - timedelta(hours=1))
+        with app.app_context():
+            db.session.delete(db.session.get(User, test_user['id']))
+            db.session.commit()
+            new_user = User(email='new@example.com')
+            new_user.password_hash = 'unused'
+            db.session.add(new_user)
+            db.session.commit()
+            assert new_user.id == test_user['id']
+
+        response = client.get('/api/emotion/history', headers={'Authorization': f'Bearer {old_token}'})
+        new_token = self._token(test_user['id'], datetime.now(timezone.utc))
+
+        assert response.status_code == 401
+        assert client.get('/api/emotion/history', headers={'Authorization': f'Bearer {new_token}'}).status_code == 200
+
+
+class TestPasswordRehash:
+    """Testy dla aktualizacji hashy haseł przy logowaniu."""
+
+    def test_login_upgrades_old_hash(self, app, client, test_user, inline_executor):
+        """Sprawdza czy hash utworzony starymi parametrami jest zastępowany po udanym logowaniu."""
+        from werkzeug.security import generate_password_hash
+        from models.database import db
+        from models.user import User
+
+        with app.app_context():
+            user = db.session.get(User, test_user['id'])
+            user.password_hash = generate_password_hash(test_user['password'], 'pbkdf2:sha256:1000')
+            db.session.commit()
+
+        with patch.object(password_hasher, '_executor', inline_executor):
+            response = client.post('/api/auth/login', data=json.dumps({'email': test_user['email'], 'password': test_user['password']}), content_type='application/json')
+
+        assert response.status_code == 200
+        with app.app_context():
+            user = db.session.get(User, test_user['id'])
+            assert not user.password_needs_rehash()
+            assert user.check_password(test_user['password'])
+
+    def test_rehash_does_not_run_on_request_thread(self, app, client, test_user):
+        """Sprawdza, że logowanie tylko zleca ponowne hashowanie i nie liczy drugiego hasha."""
+        from werkzeug.security import generate_password_hash
+        from models.database import db
+        from models.user import User
+
+        with app.app_context():
+            user = db.session.get(User, test_user['id'])
+            user.password_hash = generate_password_hash(test_user['password'], 'pbkdf2:sha256:1000')
+            db.session.commit()
+
+        with patch.object(password_hasher, 'hash_in_background') as hash_in_background, patch.object(password_hasher, 'hash') as password_hash:
+            response = client.post('/api/auth/login', data=json.dumps({'email': test_user['email'], 'password': test_user['password']}), content_type='application/json')
+
+        assert response.status_code == 200
+        assert hash_in_background.call_count == 1
+        password_hash.assert_not_called()
+
+    def test_rehash_skips_password_changed_meanwhile(self, app, test_user):
+        """Sprawdza, że zaległe ponowne hashowanie nie nadpisuje nowszego hasła."""
+        from models.database import db
+        from models.user import User
+        from routes.auth_routes import _store_upgraded_hash
+
+        with app.app_context():
+            current_hash = db.session.get(User, test_user['id']).password_hash
+
+        _store_upgraded_hash(app, test_user['id'], 'old-hash', 'rehashed')
+
+        with app.app_context():
+            assert db.session.get(User, test_user['id']).password_hash == current_hash
+
+    def test_busy_hashing_returns_503(self, client, test_user):
+        """Sprawdza odpowiedź 503 z Retry-After przy przeciążonym hashowaniu."""
+        from unittest.mock import patch
+        from services.password_hasher import PasswordHashingUnavailable
+
+        with patch('services.password_hasher.password_hasher.verify', side_effect=PasswordHashingUnavailable('full', 3)):
+            response = client.post('/api/auth/login', data=json.dumps({'email': test_user['email'], 'password': test_user['password']}), content_type='application/json')
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '3'
@@ -0,0 +1,140 @@
+"""
+Testy integracyjne dla synchronizacji lokalnego katalogu utworów.
+
+Testuje pobieranie wszystkich stron playlisty, pomijanie niezmienionych
+snapshotów oraz losowanie utworów z katalogu.
+"""
+import pytest
+from unittest.mock import Mock, patch
+
+
+def _spotify_track(i):
+    return {
+        'id': f'track_{i}',
+        'type': 'track',
+        'name': f'Track {i}',
+        'preview_url': None,
+        'artists': [{'name': 'Artist'}],
+        'external_urls': {'spotify': f'https://open.spotify.com/track/{i}'},
+        'album': {'images': [{'url': f'https://example.com/album{i}.jpg'}]}
+    }
+
+
+@pytest.fixture
+def spotify_service():
+    """Serwis Spotify z mockiem klienta zwracającym playlistę w dwóch stronach."""
+    with patch('services.spotify_service.SpotifyClientCredentials'), \
+            patch('services.spotify_service.spotipy.Spotify') as mock_spotify_class:
+        from services.spotify_service import SpotifyService
+
+        first_page = {'items': [{'track': _spotify_track(i)} for i in range(100)], 'next': 'page-2'}
+        second_page = {'items': [{'track': _spotify_track(i)} for i in range(100, 130)] + [{'track': None}], 'next': None}
+
+        client = Mock()
+        client.playlist.return_value = {'snapshot_id': 'snap-1'}
+        client.playlist_items.return_value = first_page
+        client.next.return_value = second_page
+        mock_spotify_class.return_value = client
+
+        yield SpotifyService()
+
+
+class TestCatalogSync:
+    """Testy dla synchronizacji katalogu."""
+
+    def test_sync_downloads_all_pages(self, app, spotify_service):
+        """Sprawdza czy synchronizacja zapisuje utwory ze wszystkich stron."""
+        from models.playlist import EmotionPlaylist
+        from models.playlist_track import PlaylistTrack
+
+        with app.app_context():
+            playlist = EmotionPlaylist.get_by_emotion('happy')
+
+            assert spotify_service.sync_playlist(playlist) is True
+            assert PlaylistTrack.query.filter_by(playlist_id=playlist.id).count() == 130
+            assert playlist.snapshot_id == 'snap-1'
+
+    def test_unchanged_snapshot_is_skipped(self, app, spotify_service):
+        """Sprawdza czy niezmieniony snapshot nie pobiera utworów ponownie."""
+        from models.playlist import EmotionPlaylist
+
+        with app.app_context():
+            playlist = EmotionPlaylist.get_by_emotion('happy')
+            spotify_service.sync_playlist(playlist)
+
+            assert spotify_service.sync_playlist(playlist) is False
+            assert spotify_service.spotify.playlist_items.call_count == 1
+
+    def test_random_tracks_come_from_catalog(self, app, spotify_service):
+        """Sprawdza losowanie utworów z lokalnego katalogu bez pobierania playlisty."""
+        with app.app_context():
+            summary = spotify_service.sync_catalog()
+            spotify_service.spotify.playlist.reset_mock()
+
+            tracks = spotify_service.get_random_tracks_for_emotion('happy', count=5)
+
+            assert summary['failed'] == 0
+            assert len(tracks) == 5
+            assert len({track['spotify_id'] for track in tracks}) == 5
+            spotify_service.spotify.playlist.assert_not_called()
+
+    def test_track_index_is_built_from_catalog(self, app, spotify_service):
+        """Sprawdza budowę indeksu wektorowego z lokalnego katalogu."""
+        with app.app_context():
+            spotify_service.sync_catalog()
+
+            tracks = spotify_service.get_tracks_for_emotion_vector({'happy': 70.0, 'sad': 20.0}, count=5)
+
+        assert len(tracks) == 5
+        assert len(spotify_service.get_track_index()) == 130
+
+    def test_sampling_does_not_sort_the_playlist(self, app, spotify_service):
+        """Sprawdza losowanie po id bez ORDER BY random() na całej playliście."""
+        from sqlalchemy import event
+        from models.database import db
+        from models.playlist_track import PlaylistTrack
+
+        with app.app_context():
+            spotify_service.sync_catalog()
+            statements = []
+
+            def before_execute(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement.lower())
+
+            event.listen(db.engine, 'before_cursor_execute', before_execute)
+            try:
+                first = PlaylistTrack.sample_for_emotion('happy', 10)
+                second = PlaylistTrack.sample_for_emotion('happy', 10)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', before_execute)
+
+            assert len(first) == len(second) == 10
+            assert len({track.id for track in first}) == 10
+            assert not any('random' in statement for statement in statements)
+            # Lista id jest wczytywana raz, potem tylko wylosowane wiersze
+            assert sum('where playlist_tracks.playlist_id' in statement for statement in statements) == 1
+
+    def test_sampling_reloads_ids_after_resync_elsewhere(self, app, spotify_service):
+        """Sprawdza ponowne wczytanie listy id, gdy katalog zsynchronizował inny proces."""
+        from models.database import db
+        from models.playlist import EmotionPlaylist
+        from models.playlist_track import PlaylistTrack
+
+        with app.app_context():
+            spotify_service.sync_catalog()
+            PlaylistTrack.sample_for_emotion('happy', 5)
+            playlist = EmotionPlaylist.get_by_emotion('happy')
+            # Inny proces podmienia utwory playlisty, pamięć podręczna tego procesu zostaje
+            rows = [(track.position, track.spotify_track_id) for track in PlaylistTrack.query.filter_by(playlist_id=playlist.id)]
+            PlaylistTrack.query.filter_by(playlist_id=playlist.id).delete(synchronize_session=False)
+            db.session.add_all(
+                PlaylistTrack(playlist_id=playlist.id, position=position, track_name='Track', artist='Artist',
+                              spotify_track_id=track_id, external_url='https://open.spotify.com/track')
+                for position, track_id in rows
+            )
+            db.session.commit()
+
+            tracks = PlaylistTrack.sample_for_emotion('happy', 5)
+
+            assert len(tracks) == 5
+            assert all(track.playlist_id == playlist.id for track in tracks)
@@ -0,0 +1,73 @@
+"""
+Testy integracyjne rejestru typów emocji w pamięci.
+
+Sprawdza wyszukiwanie bez zapytań do bazy oraz odświeżanie po zmianie
+wersji i po upływie TTL.
+"""
+from contextlib import contextmanager
+from unittest.mock import patch
+from sqlalchemy import event
+
+
+@contextmanager
+def count_queries(engine):
+    """Zlicza zapytania SQL wykonane w bloku."""
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_execute)
+
+
+class TestEmotionRegistry:
+    """Testy dla rejestru EmotionRegistry."""
+
+    def test_lookups_do_not_query_after_load(self, app):
+        """Sprawdza wyszukiwanie po nazwie, id i playliście bez zapytań do bazy."""
+        from models.database import db
+        from models.emotion_registry import get_emotion_registry
+        from models.emotion_type import EmotionType
+        from models.playlist import EmotionPlaylist
+
+        with app.app_context():
+            happy = get_emotion_registry().get_by_name('happy')
+            with count_queries(db.engine) as statements:
+                registry = get_emotion_registry()
+                assert registry.get_by_id(happy.id).display_name == 'Szczęśliwy'
+                assert registry.type_ids['sad'] == registry.get_by_name('sad').id
+                assert EmotionType.is_valid_emotion('angry') is True
+                assert EmotionType.is_valid_emotion('unknown') is False
+                assert EmotionPlaylist.get_spotify_playlist_id('happy') == 'test_happy'
+                assert EmotionPlaylist.get_spotify_playlist_id('unknown') is None
+
+            assert statements == []
+
+    def test_version_bump_reloads(self, app):
+        """Sprawdza czy po unieważnieniu rejestr widzi nowe typy emocji."""
+        from models.database import db
+        from models.emotion_registry import get_emotion_registry, invalidate_emotion_registry
+        from models.emotion_type import EmotionType
+
+        with app.app_context():
+            assert 'fear' not in get_emotion_registry().names
+            db.session.add(EmotionType(name='fear', display_name='Przestraszony'))
+            db.session.commit()
+            assert 'fear' not in get_emotion_registry().names
+
+            invalidate_emotion_registry()
+
+            assert 'fear' in get_emotion_registry().names
+
+    def test_expired_snapshot_is_reloaded(self, app):
+        """Sprawdza ponowne wczytanie rejestru po upływie TTL."""
+        from models.emotion_registry import get_emotion_registry
+
+        with app.app_context():
+            registry = get_emotion_registry()
+            with patch('models.emotion_registry.Config.EMOTION_REGISTRY_TTL', 0):
+                assert get_emotion_registry() is not registry
@@ -26,6 +26,19 @@ class TestAnalyzeEmotion:
 
         assert response.status_code == 400
 
+    def test_busy_inference_returns_503_with_retry_after(self, client, auth_headers):
+        """Sprawdza odpowiedź 503 z Retry-After przy pełnej kolejce inferencji."""
+        from io import BytesIO
+        from unittest.mock import patch
+        from services.inference_pool import InferenceQueueFull
+
+        with patch('routes.emotion_routes.inference_backend') as mock_backend:
+            mock_backend.detect_emotion.side_effect = InferenceQueueFull('Inference queue is full', 3)
+            response = client.post('/api/emotion/analyze', data={'image': (BytesIO(b'image'), 'photo.jpg')}, content_type='multipart/form-data', headers=auth_headers)
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '3'
+
     def test_analyze_emotion_without_auth_returns_401(self, client):
         """Sprawdza czy brak autoryzacji zwraca 401."""
         response = client.post('/api/emotion/analyze', data=json.dumps({'emotion': 'happy'}), content_type='application/json')
@@ -72,3 +85,258 @@ class TestEmotionFeedback:
         response = client.post('/api/emotion/99999/feedback', data=json.dumps({'agrees': True}), content_type='application/json', headers=auth_headers)
 
         assert response.status_code == 404
+
+
+class TestAsyncTracks:
+    """Testy dla asynchronicznego dołączania utworów."""
+
+    def test_async_analyze_returns_pending_record(self, client, auth_headers, mock_spotify_service):
+        """Sprawdza czy rekord jest zwracany od razu ze statusem pending."""
+        from routes.emotion_routes import track_worker
+        from unittest.mock import Mock, patch
+
+        with patch.object(track_worker, '_executor', Mock()):
+            response = client.post('/api/emotion/analyze?async_tracks=true', data=json.dumps({'emotion': 'happy', 'confidence': 0.9}), content_type='application/json', headers=auth_headers)
+            emotion_id = json.loads(response.data)['id']
+            record_response = client.get(f'/api/emotion/{emotion_id}', headers=auth_headers)
+
+        assert response.status_code == 202
+        assert json.loads(response.data)['tracks_status'] == 'pending'
+        assert json.loads(record_response.data)['tracks_status'] == 'pending'
+        mock_spotify_service.get_random_tracks_for_emotion.assert_not_called()
+
+    @pytest.mark.parametrize('wait', ['nan', 'inf', '-inf'])
+    def test_non_finite_wait_returns_400(self, client, auth_headers, mock_spotify_service, wait):
+        """Sprawdza odrzucenie nieskończonego lub NaN czasu oczekiwania."""
+        from routes.emotion_routes import track_worker
+        from unittest.mock import Mock, patch
+
+        with patch.object(track_worker, '_executor', Mock()):
+            response = client.post('/api/emotion/analyze?async_tracks=true', data=json.dumps({'emotion': 'happy', 'confidence': 0.9}), content_type='application/json', headers=auth_headers)
+        emotion_id = json.loads(response.data)['id']
+
+        assert client.get(f'/api/emotion/{emotion_id}?wait={wait}', headers=auth_headers).status_code == 400
+
+    def test_worker_attaches_tracks(self, client, auth_headers, mock_spotify_service, inline_executor):
+        """Sprawdza czy worker zapisuje utwory i oznacza rekord jako gotowy."""
+        from routes.emotion_routes import track_worker
+        from unittest.mock import patch
+
+        with patch.object(track_worker, '_executor', inline_executor):
+            response = client.post('/api/emotion/analyze?async_tracks=true', data=json.dumps({'emotion': 'happy', 'confidence': 0.9}), content_type='application/json', headers=auth_headers)
+        emotion_id = json.loads(response.data)['id']
+
+        record = json.loads(client.get(f'/api/emotion/{emotion_id}?wait=1', headers=auth_headers).data)
+
+        assert record['tracks_status'] == 'ready'
+        assert len(record['tracks']) == 1
+
+    def test_worker_failure_marks_record_failed(self, client, auth_headers, mock_spotify_service, inline_executor):
+        """Sprawdza czy błąd pobierania utworów ustawia status failed."""
+        from routes.emotion_routes import track_worker
+        from unittest.mock import patch
+
+        mock_spotify_service.get_random_tracks_for_emotion.side_effect = RuntimeError('Spotify down')
+        with patch.object(track_worker, '_executor', inline_executor):
+            response = client.post('/api/emotion/analyze?async_tracks=true', data=json.dumps({'emotion': 'happy', 'confidence': 0.9}), content_type='application/json', headers=auth_headers)
+        emotion_id = json.loads(response.data)['id']
+
+        record = json.loads(client.get(f'/api/emotion/{emotion_id}', headers=auth_headers).data)
+
+        assert record['tracks_status'] == 'failed'
+
+
+class TestEmotionBatch:
+    """Testy dla zbiorczego zapisu emocji z kolejki offline."""
+
+    def test_batch_saves_entries_without_tracks(self, client, auth_headers, mock_spotify_service):
+        """Sprawdza zapis wielu wpisów bez generowania utworów."""
+        entries = [
+            {'emotion': 'happy', 'confidence': 0.9, 'timestamp': '2025-01-10T08:30:00+00:00'},
+            {'emotion': 'sad', 'confidence': 0.4, 'timestamp': '2025-01-10T12:00:00'},
+            {'emotion': 'neutral'}
+        ]
+
+        response = client.post('/api/emotion/batch', data=json.dumps({'entries': entries}), content_type='application/json', headers=auth_headers)
+
+        assert response.status_code == 201
+        data = json.loads(response.data)
+        assert data['created'] == 3
+        mock_spotify_service.get_random_tracks_for_emotion.assert_not_called()
+
+        first = json.loads(client.get(f"/api/emotion/{data['ids'][0]}", headers=auth_headers).data)
+        assert first['emotion'] == 'happy'
+        assert first['timestamp'] == '2025-01-10T09:30:00'
+        assert first['tracks'] == []
+
+    def test_batch_with_generated_tracks(self, client, auth_headers, mock_spotify_service):
+        """Sprawdza czy przy generate_tracks każdy wpis dostaje utwory."""
+        entries = [{'emotion': 'happy'}, {'emotion': 'angry'}]
+
+        response = client.post('/api/emotion/batch', data=json.dumps({'entries': entries, 'generate_tracks': True}), content_type='application/json', headers=auth_headers)
+
+        data = json.loads(response.data)
+        assert response.status_code == 201
+        for record_id in data['ids']:
+            record = json.loads(client.get(f'/api/emotion/{record_id}', headers=auth_headers).data)
+            assert len(record['tracks']) == 1
+
+    def test_generated_tracks_share_one_fetch_per_emotion(self, client, auth_headers, mock_spotify_service):
+        """Sprawdza pobranie kandydatów raz dla każdej emocji zamiast osobno dla każdego wpisu."""
+        entries = [{'emotion': 'happy'}, {'emotion': 'angry'}, {'emotion': 'happy'}, {'emotion': 'happy'}]
+
+        response = client.post('/api/emotion/batch', data=json.dumps({'entries': entries, 'generate_tracks': True}), content_type='application/json', headers=auth_headers)
+
+        assert response.status_code == 201
+        assert mock_spotify_service.get_track_pools.call_count == 1
+        pool_sizes = mock_spotify_service.get_track_pools.call_args[0][0]
+        assert set(pool_sizes) == {'happy', 'angry'}
+        assert pool_sizes['happy'] == 3 * pool_sizes['angry']
+        assert mock_spotify_service.pick_from_pools.call_count == 4
+        mock_spotify_service.get_random_tracks_for_emotion.assert_not_called()
+
+    def test_invalid_entry_rejects_whole_batch(self, client, auth_headers):
+        """Sprawdza czy błędny wpis odrzuca całą partię z listą błędów."""
+        entries = [{'emotion': 'happy'}, {'emotion': 'nonexistent'}, {'emotion': 'sad', 'timestamp': 'yesterday'}]
+
+        response = client.post('/api/emotion/batch', data=json.dumps({'entries': entries}), content_type='application/json', headers=auth_headers)
+        history = json.loads(client.get('/api/emotion/history', headers=auth_headers).data)
+
+        assert response.status_code == 400
+        assert [detail['index'] for detail in json.loads(response.data)['details']] == [1, 2]
+        assert history['total'] == 0
+
+    def test_too_many_entries_returns_400(self, client, auth_headers):
+        """Sprawdza limit liczby wpisów w jednym żądaniu."""
+        from unittest.mock import patch
+
+        with patch('routes.emotion_routes.Config.MAX_BATCH_ENTRIES', 2):
+            response = client.post('/api/emotion/batch', data=json.dumps({'entries': [{'emotion': 'happy'}] * 3}), content_type='application/json', headers=auth_headers)
+
+        assert response.status_code == 400
+
+
+class TestAnalyzeBatch:
+    """Testy dla wsadowej analizy wielu zdjęć."""
+
+    def _files(self, count):
+        from io import BytesIO
+        return [(BytesIO(f'image {i}'.encode()), f'photo{i}.jpg') for i in range(count)]
+
+    def test_batch_returns_per_image_results(self, client, auth_headers, mock_spotify_service):
+        """Sprawdza wyniki dla każdego zdjęcia i zapis rekordów dla wykrytych twarzy."""
+        from unittest.mock import patch
+
+        detections = [
+            {'emotion': 'happy', 'confidence': 0.9, 'image_hash': 'a', 'raw_emotions': {'happy': 90.0}},
+            None,
+            {'emotion': 'sad', 'confidence': 0.6, 'image_hash': 'c', 'raw_emotions': {'sad': 60.0}}
+        ]
+        with patch('routes.emotion_routes.emotion_detector') as mock_detector:
+            mock_detector.detect_emotions_batch.return_value = detections
+            response = client.post('/api/emotion/analyze-batch', data={'images': self._files(3)}, content_type='multipart/form-data', headers=auth_headers)
+
+        data = json.loads(response.data)
+        assert response.status_code == 200
+        assert data['analyzed'] == 2
+        assert data['failed'] == 1
+        assert [result['index'] for result in data['results']] == [0, 1, 2]
+        assert 'error' in data['results'][1]
+
+        stored = json.loads(client.get(f"/api/emotion/{data['results'][2]['id']}", headers=auth_headers).data)
+        assert stored['emotion'] == 'sad'
+        assert len(stored['tracks']) == 1
+        assert stored['raw_emotions']['sad'] == 60.0
+        assert stored['raw_emotions']['happy'] == 0.0
+
+    def test_recommendations_share_one_fetch_per_emotion(self, client, auth_headers, mock_spotify_service):
+        """Sprawdza jedno pobranie kandydatów na wykrytą emocję zamiast osobnej rekomendacji dla każdego zdjęcia."""
+        from unittest.mock import patch
+
+        detections = [
+            {'emotion': 'happy', 'confidence': 0.9, 'image_hash': 'a', 'raw_emotions': {'happy': 90.0, 'sad': 10.0}},
+            {'emotion': 'happy', 'confidence': 0.8, 'image_hash': 'b', 'raw_emotions': {'happy': 80.0, 'sad': 20.0}},
+            {'emotion': 'sad', 'confidence': 0.7, 'image_hash': 'c', 'raw_emotions': {'sad': 70.0, 'happy': 30.0}}
+        ]
+        with patch('routes.emotion_routes.emotion_detector') as mock_detector:
+            mock_detector.detect_emotions_batch.return_value = detections
+            response = client.post('/api/emotion/analyze-batch', data={'images': self._files(3)}, content_type='multipart/form-data', headers=auth_headers)
+
+        data = json.loads(response.data)
+        assert response.status_code == 200
+        assert all(len(result['tracks']) == 1 for result in data['results'])
+        assert mock_spotify_service.get_track_pools.call_count == 1
+        assert set(mock_spotify_service.get_track_pools.call_args[0][0]) == {'happy', 'sad'}
+        mock_spotify_service.get_random_tracks_for_emotion.assert_not_called()
+
+    def test_too_many_images_returns_400(self, client, auth_headers):
+        """Sprawdza limit liczby zdjęć w jednym żądaniu."""
+        from unittest.mock import patch
+
+        with patch('routes.emotion_routes.Config.MAX_BATCH_IMAGES', 2):
+            response = client.post('/api/emotion/analyze-batch', data={'images': self._files(3)}, content_type='multipart/form-data', headers=auth_headers)
+
+        assert response.status_code == 400
+
+
+class TestAnalyzeSequence:
+    """Testy dla analizy krótkiego klipu lub serii zdjęć."""
+
+    def test_burst_frames_give_one_record(self, client, auth_headers, mock_spotify_service):
+        """Sprawdza zapis jednego rekordu dla serii klatek."""
+        from io import BytesIO
+        from unittest.mock import patch
+
+        detection = {
+            'emotion': 'happy', 'confidence': 0.8, 'image_hash': 'a', 'raw_emotions': {'happy': 80.0},
+            'frames': {'total': 3, 'analyzed': 2, 'with_face': 2, 'full_detections': 1}
+        }
+        frames = [(BytesIO(f'frame {i}'.encode()), f'frame{i}.jpg') for i in range(3)]
+        with patch('routes.emotion_routes.emotion_detector') as mock_detector:
+            mock_detector.detect_emotion_frames.return_value = detection
+            response = client.post('/api/emotion/analyze', data={'frames': frames}, content_type='multipart/form-data', headers=auth_headers)
+
+        data = json.loads(response.data)
+        assert response.status_code == 200
+        assert data['emotion'] == 'happy'
+        assert data['frames']['analyzed'] == 2
+        assert len(mock_detector.detect_emotion_frames.call_args[0][0]) == 3
+
+    def test_video_without_face_returns_400(self, client, auth_headers):
+        """Sprawdza odpowiedź 400, gdy w klipie nie ma twarzy."""
+        from io import BytesIO
+        from unittest.mock import patch
+
+        with patch('routes.emotion_routes.emotion_detector') as mock_detector:
+            mock_detector.detect_emotion_video.return_value = None
+            response = client.post('/api/emotion/analyze', data={'video': (BytesIO(b'clip'), 'clip.mp4')}, content_type='multipart/form-data', headers=auth_headers)
+
+        assert response.status_code == 400
+        assert mock_detector.detect_emotion_video.call_args[0][0] == b'clip'
+
+    def test_video_with_too_large_frames_returns_413(self, client, auth_headers):
+        """Sprawdza odrzucenie klipu o zbyt dużych klatkach z kodem 413."""
+        from io import BytesIO
+        from unittest.mock import patch
+        from services.image_pipeline import ImageTooLarge
+
+        with patch('routes.emotion_routes.emotion_detector') as mock_detector:
+            mock_detector.detect_emotion_video.side_effect = ImageTooLarge('Video frames are too large')
+            response = client.post('/api/emotion/analyze', data={'video': (BytesIO(b'clip'), 'clip.mp4')}, content_type='multipart/form-data', headers=auth_headers)
+
+        assert response.status_code == 413
+
+    def test_oversized_image_returns_413(self, client, auth_headers):
+        """Sprawdza odrzucenie zbyt dużego obrazu z kodem 413."""
+        from io import BytesIO
+        from unittest.mock import patch
+        from PIL import Image
+
+        image_bytes = BytesIO()
+        Image.new('RGB', (400, 300)).save(image_bytes, format='PNG')
+        image_bytes.seek(0)
+        with patch('routes.emotion_routes.Config.MAX_IMAGE_PIXELS', 1000), patch('routes.emotion_routes.emotion_detector') as mock_detector:
+            response = client.post('/api/emotion/analyze', data={'frames': [(image_bytes, 'frame.png')]}, content_type='multipart/form-data', headers=auth_headers)
+
+        assert response.status_code == 413
+        mock_detector.detect_emotion_frames.assert_not_called()
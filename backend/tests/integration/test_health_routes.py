@@ -0,0 +1,70 @@
+"""
+Testy integracyjne dla modułu health.
+
+Testuje punkty końcowe: metryki serwisu i gotowość modeli.
+"""
+import pytest
+import json
+
+
+class TestHealthMetrics:
+    """Testy dla metryk serwisu."""
+
+    def test_metrics_expose_spotify_stats(self, client):
+        """Sprawdza czy metryki zawierają stan circuit breakera i histogram opóźnień."""
+        from unittest.mock import patch
+
+        with patch('middleware.auth.Config.METRICS_TOKEN', 'metrics-secret'):
+            response = client.get('/api/health/metrics', headers={'X-Metrics-Token': 'metrics-secret'})
+
+        assert response.status_code == 200
+        spotify = json.loads(response.data)['spotify']
+        assert spotify['circuit_breaker']['state'] == 'closed'
+        assert 'buckets' in spotify['latency']
+
+    @pytest.mark.parametrize('headers', [{}, {'X-Metrics-Token': 'wrong'}])
+    def test_metrics_without_valid_token_return_401(self, client, headers):
+        """Sprawdza odrzucenie zapytania bez poprawnego tokenu metryk."""
+        from unittest.mock import patch
+
+        with patch('middleware.auth.Config.METRICS_TOKEN', 'metrics-secret'):
+            response = client.get('/api/health/metrics', headers=headers)
+
+        assert response.status_code == 401
+        assert 'spotify' not in json.loads(response.data)
+
+    def test_metrics_are_disabled_without_configured_token(self, client):
+        """Sprawdza, że bez ustawionego METRICS_TOKEN metryki nie są dostępne."""
+        from unittest.mock import patch
+
+        with patch('middleware.auth.Config.METRICS_TOKEN', None):
+            response = client.get('/api/health/metrics', headers={'X-Metrics-Token': ''})
+
+        assert response.status_code == 404
+
+
+class TestReadiness:
+    """Testy dla sondy gotowości."""
+
+    def test_not_ready_before_warmup(self, client):
+        """Sprawdza czy przed rozgrzaniem modeli zwracane jest 503."""
+        from routes.emotion_routes import emotion_detector
+        from unittest.mock import patch
+
+        with patch('routes.health_routes.Config.MODEL_WARMUP', True), \
+                patch.object(type(emotion_detector), 'is_ready', False):
+            response = client.get('/api/health/ready')
+
+        assert response.status_code == 503
+        assert json.loads(response.data)['status'] == 'warming_up'
+
+    def test_ready_after_warmup(self, client):
+        """Sprawdza czy po rozgrzaniu modeli zwracane jest 200."""
+        from routes.emotion_routes import emotion_detector
+        from unittest.mock import patch
+
+        with patch('routes.health_routes.Config.MODEL_WARMUP', True), \
+                patch.object(type(emotion_detector), 'is_ready', True):
+            response = client.get('/api/health/ready')
+
+        assert response.status_code == 200
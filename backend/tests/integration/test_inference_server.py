@@ -0,0 +1,195 @@
+"""
+Testy integracyjne dla serwera inferencji z mikro-batchowaniem.
+
+Serwer działa naprawdę (TCP lub gniazdo Unix), a model zastępuje funkcja
+zapisująca rozmiary otrzymanych paczek.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import pytest
+from unittest.mock import Mock
+from services.image_pipeline import ImageTooLarge
+from services.inference_pool import InferenceQueueFull, InferenceUnavailable
+from services.inference_server import InferenceClient, MicroBatcher, make_server, pack_images, unpack_images
+
+
+class RecordingModel:
+    """Udaje model: zapamiętuje rozmiary paczek i zwraca długość każdego obrazu."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batch_sizes = []
+
+    def __call__(self, images):
+        self.batch_sizes.append(len(images))
+        time.sleep(self.delay)
+        return [{'emotion': 'happy', 'confidence': float(len(image))} for image in images]
+
+
+@pytest.fixture
+def start_server():
+    started = []
+
+    def factory(model, unix_socket=None, deadline=5, sequence_detector=None, **batcher_kwargs):
+        batcher = MicroBatcher(model, **batcher_kwargs)
+        server = make_server(
+            batcher, port=0, unix_socket=unix_socket, deadline=deadline, sequence_detector=sequence_detector
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started.append((server, batcher))
+        if unix_socket:
+            return InferenceClient(f'unix://{unix_socket}', timeout=5)
+        return InferenceClient(f'http://127.0.0.1:{server.server_address[1]}', timeout=5)
+
+    yield factory
+    for server, batcher in started:
+        server.shutdown()
+        server.server_close()
+        batcher.close()
+
+
+class TestInferenceServer:
+    """Testy dla serwera inferencji i klienta InferenceClient."""
+
+    def test_pack_and_unpack_images(self):
+        """Sprawdza kodowanie wielu obrazów w jednym ciele zapytania."""
+        images = [b'abc', b'', b'\x00' * 10]
+
+        assert unpack_images(pack_images(images)) == images
+
+    @pytest.mark.parametrize('body', [b'\x00\x01', b'\x00\x00\x00\x09abc'])
+    def test_truncated_body_is_rejected(self, body):
+        """Sprawdza odrzucenie niepełnego nagłówka i długości wykraczającej poza ciało."""
+        with pytest.raises(ValueError):
+            unpack_images(body)
+
+    def test_malformed_batch_returns_400(self, start_server):
+        """Sprawdza odpowiedź 400 zamiast zerwanego połączenia przy uszkodzonym ciele."""
+        import http.client
+
+        model = RecordingModel()
+        client = start_server(model)
+        connection = http.client.HTTPConnection(client._host, client._port, timeout=5)
+        connection.request('POST', '/detect-batch', body=b'\x00\x01')
+        response = connection.getresponse()
+
+        assert response.status == 400
+        assert 'Malformed' in json.loads(response.read())['error']
+        assert model.batch_sizes == []
+
+    def test_single_detection_over_tcp(self, start_server):
+        """Sprawdza pojedynczą detekcję i gotowość serwera."""
+        client = start_server(RecordingModel())
+
+        assert client.is_ready is True
+        assert client.detect_emotion(b'12345') == {'emotion': 'happy', 'confidence': 5.0}
+        assert client.stats()['requests'] == 2
+
+    def test_batch_detection_over_unix_socket(self, start_server):
+        """Sprawdza detekcję wielu obrazów przez gniazdo Unix."""
+        model = RecordingModel()
+        with tempfile.TemporaryDirectory() as directory:
+            client = start_server(model, unix_socket=os.path.join(directory, 'inference.sock'))
+
+            results = client.detect_emotions_batch([b'a', b'bb', b'ccc'])
+
+        assert [result['confidence'] for result in results] == [1.0, 2.0, 3.0]
+        assert model.batch_sizes == [3]
+
+    def test_concurrent_requests_are_batched(self, start_server):
+        """Sprawdza łączenie równoległych zapytań w jedno wywołanie modelu."""
+        model = RecordingModel()
+        client = start_server(model, max_batch_size=8, max_wait=0.3)
+        results = [None] * 8
+
+        def detect(index):
+            results[index] = client.detect_emotion(b'x' * (index + 1))
+
+        threads = [threading.Thread(target=detect, args=(index,)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert [result['confidence'] for result in results] == [float(index + 1) for index in range(8)]
+        assert sum(model.batch_sizes) == 8
+        assert len(model.batch_sizes) < 8
+
+    def test_full_queue_returns_busy(self, start_server):
+        """Sprawdza odpowiedź 503 z Retry-After przy pełnej kolejce serwera."""
+        client = start_server(RecordingModel(delay=1.0), max_batch_size=1, max_wait=0, max_queue=1)
+        # Pierwsze zapytanie jest już przetwarzane, drugie czeka w kolejce
+        threads = [threading.Thread(target=client.detect_emotion, args=(b'x',)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.2)
+
+        with pytest.raises(InferenceQueueFull) as error:
+            client.detect_emotion(b'x')
+        for thread in threads:
+            thread.join()
+
+        assert error.value.retry_after >= 1
+
+    def test_unreachable_server(self):
+        """Sprawdza błąd InferenceUnavailable, gdy serwer nie działa."""
+        client = InferenceClient('http://127.0.0.1:1', timeout=1)
+
+        with pytest.raises(InferenceUnavailable):
+            client.detect_emotion(b'x')
+        assert client.is_ready is False
+
+    def test_too_large_clip_is_reported_as_image_too_large(self, start_server):
+        """Sprawdza przekazanie odrzucenia zbyt dużego klipu (413) jako ImageTooLarge."""
+        detector = Mock()
+        detector.detect_emotion_video.side_effect = ImageTooLarge('Video frames are too large (3840x2160)')
+        client = start_server(RecordingModel(), sequence_detector=detector)
+
+        with pytest.raises(ImageTooLarge, match='3840x2160'):
+            client.detect_emotion_video(b'clip')
+        assert client.stats()['errors'] == 0
+
+    def test_sequence_runs_on_batcher_thread(self, start_server):
+        """Sprawdza, że analiza klipu idzie przez kolejkę batchera, a nie w wątku połączenia."""
+        threads = []
+        detector = Mock()
+        detector.detect_emotion_video.side_effect = lambda body: threads.append(threading.current_thread().name) or {'emotion': 'happy'}
+        client = start_server(RecordingModel(), sequence_detector=detector)
+
+        assert client.detect_emotion_video(b'clip') == {'emotion': 'happy'}
+        assert threads == ['micro-batcher']
+        assert client.stats()['errors'] == 0
+
+    def test_sequence_respects_queue_limit(self, start_server):
+        """Sprawdza odpowiedź 503 dla klipu, gdy kolejka batchera jest pełna."""
+        detector = Mock()
+        client = start_server(RecordingModel(delay=1.0), sequence_detector=detector, max_batch_size=1, max_wait=0, max_queue=1)
+        threads = [threading.Thread(target=client.detect_emotion, args=(b'x',)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.2)
+
+        with pytest.raises(InferenceQueueFull):
+            client.detect_emotion_video(b'clip')
+        for thread in threads:
+            thread.join()
+
+        detector.detect_emotion_video.assert_not_called()
+
+    def test_refused_batch_items_are_not_classified(self, start_server):
+        """Sprawdza, że obrazy odrzuconej paczki, które zdążyły trafić do kolejki, nie są analizowane."""
+        model = RecordingModel(delay=0.5)
+        client = start_server(model, max_batch_size=1, max_wait=0, max_queue=2)
+        busy = threading.Thread(target=client.detect_emotion, args=(b'busy',))
+        busy.start()
+        time.sleep(0.2)
+
+        with pytest.raises(InferenceQueueFull):
+            client.detect_emotions_batch([b'1', b'22', b'333'])
+        busy.join()
+        time.sleep(0.2)
+
+        assert model.batch_sizes == [1]
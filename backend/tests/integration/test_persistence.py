@@ -0,0 +1,96 @@
+"""
+Testy integracyjne zapisu rekordu emocji razem z utworami.
+
+Sprawdza ścieżkę z INSERT ... RETURNING oraz zapasową ścieżkę z lastrowid.
+"""
+import pytest
+from unittest.mock import patch
+
+
+TRACKS = [
+    {
+        'name': f'Track {i}',
+        'artist': 'Artist',
+        'spotify_id': f'track_{i}',
+        'preview_url': None,
+        'external_url': f'https://open.spotify.com/track/{i}',
+        'album_image': f'https://example.com/album{i}.jpg'
+    }
+    for i in range(5)
+]
+
+
+class TestInsertEmotionRecord:
+    """Testy dla funkcji insert_emotion_record."""
+
+    @pytest.mark.parametrize('insert_returning', [True, False])
+    def test_record_and_tracks_are_saved(self, app, test_user, insert_returning):
+        """Sprawdza zapis rekordu i utworów niezależnie od obsługi RETURNING."""
+        from models.database import db
+        from models.emotion import EmotionRecord
+        from services.persistence import insert_emotion_record
+
+        with app.app_context():
+            with patch.object(db.engine.dialect, 'insert_returning', insert_returning):
+                record_id, timestamp = insert_emotion_record(test_user['id'], 1, 0.8, 'image', 'ready', TRACKS)
+                db.session.commit()
+
+            record = db.session.get(EmotionRecord, record_id)
+            assert record.timestamp == timestamp
+            assert record.to_dict()['emotion'] == 'happy'
+            assert [track['spotify_id'] for track in record.to_dict()['tracks']] == [f'track_{i}' for i in range(5)]
+
+    def test_analyze_response_matches_stored_record(self, client, auth_headers, mock_spotify_service):
+        """Sprawdza czy odpowiedź /emotion/analyze odpowiada zapisanemu rekordowi."""
+        response = client.post('/api/emotion/analyze', json={'emotion': 'sad', 'confidence': 0.7}, headers=auth_headers)
+        created = response.get_json()
+
+        stored = client.get(f"/api/emotion/{created['id']}", headers=auth_headers).get_json()
+
+        assert stored['timestamp'] == created['timestamp']
+        assert stored['tracks'] == created['tracks']
+        assert stored['tracks_status'] == 'ready'
+
+
+class TestRawEmotions:
+    """Testy dla zapisu wektora wyników emocji jako float16."""
+
+    SCORES = {'angry': 1.5, 'disgust': 0.25, 'fear': 3.0, 'happy': 80.5, 'sad': 5.0, 'surprise': 2.0, 'neutral': 7.75}
+
+    def test_vector_takes_14_bytes(self):
+        """Sprawdza rozmiar zakodowanego wektora i kodowanie braku wyników."""
+        from models.emotion import EmotionRecord
+
+        assert len(EmotionRecord.encode_raw_emotions(self.SCORES)) == 14
+        assert EmotionRecord.encode_raw_emotions(None) is None
+
+    def test_decode_builds_matrix_with_nan_rows(self):
+        """Sprawdza dekodowanie wielu wektorów do macierzy (brak wektora to wiersz NaN)."""
+        import numpy as np
+        from models.emotion import EmotionRecord
+        from models.emotion_type import EMOTION_VECTOR_ORDER
+
+        encoded = EmotionRecord.encode_raw_emotions(self.SCORES)
+        matrix = EmotionRecord.decode_raw_emotions([encoded, None, EmotionRecord.encode_raw_emotions({'sad': 100.0})])
+
+        assert matrix.shape == (3, 7)
+        assert matrix[0].tolist() == [self.SCORES[name] for name in EMOTION_VECTOR_ORDER]
+        assert np.isnan(matrix[1]).all()
+        assert matrix[2, EMOTION_VECTOR_ORDER.index('sad')] == 100.0
+
+    def test_matrix_of_user_records(self, app, test_user):
+        """Sprawdza zapis wektora i wczytanie macierzy tylko dla rekordów z wektorem."""
+        from models.database import db
+        from models.emotion import EmotionRecord
+        from services.persistence import insert_emotion_record
+
+        with app.app_context():
+            first_id, _ = insert_emotion_record(test_user['id'], 1, 0.8, 'image', 'ready', raw_emotions=self.SCORES)
+            insert_emotion_record(test_user['id'], 1, 1.0, 'manual', 'ready')
+            second_id, _ = insert_emotion_record(test_user['id'], 2, 0.9, 'image', 'ready', raw_emotions={'sad': 90.0})
+            db.session.commit()
+
+            ids, matrix = EmotionRecord.get_raw_emotion_matrix(EmotionRecord.user_id == test_user['id'])
+            assert ids.tolist() == [first_id, second_id]
+            assert matrix.shape == (2, 7)
+            assert db.session.get(EmotionRecord, first_id).to_dict()['raw_emotions'] == self.SCORES
@@ -0,0 +1,34 @@
+"""
+Testy integracyjne dla historii polecanych utworów.
+
+Testuje odbudowę historii użytkownika z tabeli emotion_tracks
+oraz pomijanie powtórek przy kolejnych analizach.
+"""
+import pytest
+import json
+from unittest.mock import patch
+
+
+class TestRecentlyPlayed:
+    """Testy dla filtra ostatnio polecanych utworów."""
+
+    def test_history_is_rebuilt_from_emotion_tracks(self, app, client, auth_headers, test_user, mock_spotify_service):
+        """Sprawdza odbudowę historii z bazy danych po utracie pamięci procesu."""
+        from services.recently_played import RecentlyPlayedFilter
+
+        client.post('/api/emotion/analyze', data=json.dumps({'emotion': 'happy'}), content_type='application/json', headers=auth_headers)
+
+        with app.app_context():
+            history = RecentlyPlayedFilter(window=5).for_user(test_user['id'])
+
+        assert 'spotify:track:test1' in history
+        assert 'spotify:track:other' not in history
+
+    def test_recent_tracks_are_passed_as_exclusions(self, client, auth_headers, mock_spotify_service):
+        """Sprawdza czy kolejna analiza wyklucza utwory polecone wcześniej."""
+        client.post('/api/emotion/analyze', data=json.dumps({'emotion': 'happy'}), content_type='application/json', headers=auth_headers)
+        client.post('/api/emotion/analyze', data=json.dumps({'emotion': 'happy'}), content_type='application/json', headers=auth_headers)
+
+        exclude = mock_spotify_service.get_random_tracks_for_emotion.call_args.kwargs['exclude']
+
+        assert 'spotify:track:test1' in exclude
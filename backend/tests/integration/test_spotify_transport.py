@@ -0,0 +1,161 @@
+"""
+Testy integracyjne warstwy HTTP serwisu Spotify.
+
+Uruchamia lokalny, fałszywy serwer Spotify i sprawdza ponawianie zapytań
+z nagłówkiem Retry-After, circuit breaker, timeouty oraz współdzielony token.
+"""
+import json
+import threading
+import time
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from config.settings import Config
+
+
+PLAYLIST_PAYLOAD = {
+    'tracks': {'items': [{'track': {
+        'id': f'track_{i}',
+        'name': f'Track {i}',
+        'artists': [{'name': 'Artist'}],
+        'external_urls': {'spotify': f'https://open.spotify.com/track/{i}'},
+        'album': {'images': []}
+    }} for i in range(10)]}
+}
+
+
+class FakeSpotifyHandler(BaseHTTPRequestHandler):
+    """Odpowiada na zapytania o token i playlisty według skryptu serwera."""
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.token_requests += 1
+        self._send(200, {'access_token': 'fake-token', 'token_type': 'Bearer', 'expires_in': 3600})
+
+    def do_GET(self):
+        self.server.api_requests += 1
+        status, headers, delay = self.server.script.pop(0) if self.server.script else (200, {}, 0)
+        if delay:
+            time.sleep(delay)
+        body = PLAYLIST_PAYLOAD if status == 200 else {'error': {'status': status, 'message': 'fake error'}}
+        self._send(status, body, headers)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_spotify():
+    """Uruchamia fałszywy serwer Spotify na losowym porcie."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeSpotifyHandler)
+    server.daemon_threads = True
+    server.script = []
+    server.token_requests = 0
+    server.api_requests = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_service(fake_spotify, tmp_path):
+    """Tworzy SpotifyService skierowany na fałszywy serwer."""
+    base_url = f'http://127.0.0.1:{fake_spotify.server_address[1]}'
+    settings = {
+        'SPOTIFY_CLIENT_ID': 'fake-id',
+        'SPOTIFY_CLIENT_SECRET': 'fake-secret',
+        'SPOTIFY_API_URL': f'{base_url}/v1/',
+        'SPOTIFY_TOKEN_URL': f'{base_url}/api/token',
+        'SPOTIFY_TOKEN_CACHE_PATH': str(tmp_path / 'token.json'),
+        'SPOTIFY_READ_TIMEOUT': 0.5,
+        'SPOTIFY_MAX_RETRIES': 2,
+        'SPOTIFY_MAX_RETRY_AFTER': 1,
+        'SPOTIFY_BREAKER_FAILURES': 2,
+        'SPOTIFY_BREAKER_RESET_TIMEOUT': 60,
+    }
+
+    with patch.multiple(Config, **settings), \
+            patch('services.spotify_service.EmotionPlaylist') as mock_playlist_model, \
+            patch('services.spotify_service.PlaylistTrack') as mock_catalog:
+        mock_playlist_model.get_spotify_playlist_id.return_value = 'playlist1'
+        mock_catalog.sample_for_emotion.return_value = []
+        from services.spotify_service import SpotifyService
+        yield SpotifyService
+
+
+class TestSpotifyTransport:
+    """Testy dla połączenia z (fałszywym) API Spotify."""
+
+    def test_retries_after_429_with_retry_after(self, fake_spotify, make_service):
+        """Sprawdza ponowienie zapytania po 429 z krótkim Retry-After."""
+        fake_spotify.script = [(429, {'Retry-After': '0'}, 0)]
+
+        tracks = make_service().get_random_tracks_for_emotion('happy', count=3)
+
+        assert len(tracks) == 3
+        assert fake_spotify.api_requests == 2
+
+    def test_long_retry_after_fails_fast(self, fake_spotify, make_service):
+        """Sprawdza czy zbyt długi Retry-After nie blokuje żądania."""
+        fake_spotify.script = [(429, {'Retry-After': '120'}, 0)]
+
+        start = time.monotonic()
+        tracks = make_service().get_random_tracks_for_emotion('happy', count=3)
+
+        assert tracks == []
+        assert fake_spotify.api_requests == 1
+        assert time.monotonic() - start < 5
+
+    def test_circuit_opens_after_repeated_failures(self, fake_spotify, make_service):
+        """Sprawdza czy po serii błędów kolejne wywołania nie trafiają do API."""
+        fake_spotify.script = [(503, {}, 0)] * 20
+        service = make_service()
+
+        service.get_random_tracks_for_emotion('happy')
+        service.get_random_tracks_for_emotion('sad')
+        requests_before = fake_spotify.api_requests
+        tracks = service.get_random_tracks_for_emotion('angry')
+
+        assert tracks == []
+        assert service.get_stats()['circuit_breaker']['state'] == 'open'
+        assert fake_spotify.api_requests == requests_before
+
+    def test_stale_tracks_served_while_spotify_is_down(self, fake_spotify, make_service):
+        """Sprawdza zwracanie przeterminowanej listy utworów przy awarii Spotify."""
+        service = make_service()
+        service.tracks_cache.ttl = 0
+        service.get_random_tracks_for_emotion('happy', count=3)
+        fake_spotify.script = [(500, {}, 0)] * 20
+
+        tracks = service.get_random_tracks_for_emotion('happy', count=3)
+
+        assert len(tracks) == 3
+
+    def test_read_timeout_is_enforced(self, fake_spotify, make_service):
+        """Sprawdza czy wolna odpowiedź jest przerywana po czasie read timeout."""
+        fake_spotify.script = [(200, {}, 2)]
+
+        start = time.monotonic()
+        tracks = make_service().get_random_tracks_for_emotion('happy', count=3)
+
+        assert tracks == []
+        assert time.monotonic() - start < 1.5
+
+    def test_token_is_shared_between_services(self, fake_spotify, make_service):
+        """Sprawdza czy token jest pobierany raz i współdzielony przez instancje."""
+        make_service().get_random_tracks_for_emotion('happy')
+        make_service().get_random_tracks_for_emotion('happy')
+
+        assert fake_spotify.token_requests == 1
@@ -0,0 +1,174 @@
+"""
+Testy integracyjne odświeżania metadanych zapisanych utworów.
+
+Uruchamia lokalny, fałszywy endpoint Spotify /v1/tracks i sprawdza
+aktualizację wierszy emotion_tracks partiami oraz wznawianie z checkpointu.
+"""
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+from config.settings import Config
+
+
+class FakeTracksHandler(BaseHTTPRequestHandler):
+    """Zwraca nowe metadane dla utworów; utwory kończące się na 00 nie istnieją."""
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._send(200, {'access_token': 'fake-token', 'token_type': 'Bearer', 'expires_in': 3600})
+
+    def do_GET(self):
+        ids = parse_qs(urlparse(self.path).query)['ids'][0].split(',')
+        self.server.batches.append(ids)
+        if self.server.fail_after is not None and len(self.server.batches) > self.server.fail_after:
+            self._send(404, {'error': {'status': 404, 'message': 'fake error'}})
+            return
+        self._send(200, {'tracks': [
+            None if track_id.endswith('00') else {
+                'id': track_id,
+                'preview_url': f'https://new.example.com/{track_id}.mp3',
+                'album': {'images': [{'url': f'https://new.example.com/{track_id}.jpg'}]}
+            }
+            for track_id in ids
+        ]})
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_spotify():
+    """Uruchamia fałszywy endpoint Spotify na losowym porcie."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTracksHandler)
+    server.daemon_threads = True
+    server.batches = []
+    server.fail_after = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def refresher(fake_spotify, tmp_path):
+    """Tworzy TrackMetadataRefresher korzystający z fałszywego Spotify."""
+    base_url = f'http://127.0.0.1:{fake_spotify.server_address[1]}'
+    settings = {
+        'SPOTIFY_CLIENT_ID': 'fake-id',
+        'SPOTIFY_CLIENT_SECRET': 'fake-secret',
+        'SPOTIFY_API_URL': f'{base_url}/v1/',
+        'SPOTIFY_TOKEN_URL': f'{base_url}/api/token',
+        'SPOTIFY_TOKEN_CACHE_PATH': str(tmp_path / 'token.json'),
+    }
+    with patch.multiple(Config, **settings):
+        from services.spotify_service import SpotifyService
+        from services.track_metadata import TrackMetadataRefresher
+        yield TrackMetadataRefresher(SpotifyService(), str(tmp_path / 'checkpoint.json'), stream_batch=7)
+
+
+@pytest.fixture
+def stored_tracks(app, test_user):
+    """Zapisuje 120 różnych utworów (każdy w dwóch rekordach) ze starymi metadanymi."""
+    from models.database import db
+    from models.emotion import EmotionRecord
+    from models.emotion_track import EmotionTrack
+
+    with app.app_context():
+        records = [EmotionRecord(user_id=test_user['id'], emotion_type_id=1, confidence=0.9) for _ in range(2)]
+        db.session.add_all(records)
+        db.session.flush()
+        for record in records:
+            for i in range(120):
+                track_id = f'{i:020d}' + ('00' if i % 40 == 0 else '11')
+                db.session.add(EmotionTrack(
+                    emotion_record_id=record.id,
+                    track_name=f'Track {i}',
+                    artist='Artist',
+                    spotify_track_id=track_id,
+                    preview_url='https://old.example.com/preview.mp3',
+                    external_url=f'https://open.spotify.com/track/{track_id}',
+                    album_image=None
+                ))
+        db.session.commit()
+
+
+def _stale_rows():
+    from models.emotion_track import EmotionTrack
+    return EmotionTrack.query.filter(EmotionTrack.album_image.is_(None)).count()
+
+
+class TestTrackMetadataRefresh:
+    """Testy dla zadania odświeżania metadanych utworów."""
+
+    def test_refreshes_all_rows_in_batches_of_50(self, app, stored_tracks, fake_spotify, refresher):
+        """Sprawdza czy wszystkie wiersze są aktualizowane partiami po 50 id."""
+        with app.app_context():
+            summary = refresher.run()
+
+            assert [len(batch) for batch in fake_spotify.batches] == [50, 50, 20]
+            assert summary['tracks'] == 120
+            assert summary['missing'] == 3
+            assert summary['updated'] == 2 * 117
+            # Utwory usunięte ze Spotify zachowują stare dane
+            assert _stale_rows() == 2 * 3
+            assert refresher.load_checkpoint() == {}
+
+    def test_unchanged_rows_are_not_rewritten(self, app, stored_tracks, refresher):
+        """Sprawdza czy ponowne uruchomienie nie nadpisuje aktualnych wierszy."""
+        with app.app_context():
+            refresher.run()
+            summary = refresher.run()
+
+            assert summary['updated'] == 0
+
+    def test_resumes_from_checkpoint(self, app, stored_tracks, fake_spotify, refresher):
+        """Sprawdza wznawianie przerwanego zadania od ostatniej zakończonej partii."""
+        from spotipy.exceptions import SpotifyException
+        fake_spotify.fail_after = 1
+
+        with app.app_context():
+            with pytest.raises(SpotifyException):
+                refresher.run()
+            checkpoint = refresher.load_checkpoint()
+            assert checkpoint['tracks'] == 50
+            assert checkpoint['last_track_id'] == fake_spotify.batches[0][-1]
+
+            fake_spotify.fail_after = None
+            summary = refresher.run()
+
+            assert summary['resumed_from'] == checkpoint['last_track_id']
+            assert summary['tracks'] == 120
+            assert [len(batch) for batch in fake_spotify.batches[2:]] == [50, 20]
+            assert _stale_rows() == 2 * 3
+
+    def test_each_chunk_is_one_update_statement(self, app, stored_tracks, refresher):
+        """Sprawdza czy każda partia jest zapisywana jednym zbiorczym UPDATE."""
+        from sqlalchemy import event
+        from models.database import db
+
+        with app.app_context():
+            updates = []
+
+            def before_execute(conn, cursor, statement, parameters, context, executemany):
+                if 'UPDATE' in statement:
+                    updates.append(executemany)
+
+            event.listen(db.engine, 'before_cursor_execute', before_execute)
+            try:
+                refresher.run()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', before_execute)
+
+            assert updates == [False, False, False]
@@ -0,0 +1,80 @@
+"""
+Testy jednostkowe dla TTLCache.
+
+Sprawdza wygasanie wpisów, usuwanie LRU oraz liczniki trafień.
+"""
+import pytest
+from services.cache import TTLCache
+
+
+class FakeTimer:
+    """Sterowany zegar do testów wygasania."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    """Testy dla klasy TTLCache."""
+
+    def test_get_returns_cached_value_and_counts_hit(self):
+        """Sprawdza trafienie w cache i liczniki."""
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set('happy', [1, 2, 3])
+
+        assert cache.get('happy') == [1, 2, 3]
+        assert cache.get('sad') is None
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    def test_entry_expires_after_ttl(self):
+        """Sprawdza wygasanie wpisu po upływie TTL."""
+        timer = FakeTimer()
+        cache = TTLCache(maxsize=2, ttl=10, timer=timer)
+        cache.set('happy', 'tracks')
+
+        timer.now = 11
+
+        assert cache.get('happy') is None
+
+    def test_least_recently_used_is_evicted(self):
+        """Sprawdza usuwanie najdawniej używanego wpisu."""
+        cache = TTLCache(maxsize=2, ttl=None)
+        cache.set('happy', 1)
+        cache.set('sad', 2)
+        cache.get('happy')
+        cache.set('angry', 3)
+
+        assert cache.get('sad') is None
+        assert cache.get('happy') == 1
+        assert cache.stats()['evictions'] == 1
+
+    def test_get_or_load_calls_loader_once(self):
+        """Sprawdza czy loader jest wywoływany tylko przy braku wpisu."""
+        cache = TTLCache(maxsize=2, ttl=10)
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return ['track']
+
+        cache.get_or_load('happy', loader)
+        result = cache.get_or_load('happy', loader)
+
+        assert result == ['track']
+        assert len(calls) == 1
+
+    def test_get_or_load_does_not_cache_errors(self):
+        """Sprawdza czy wyjątek loadera nie jest zapisywany w cache."""
+        cache = TTLCache(maxsize=2, ttl=10)
+
+        def failing_loader():
+            raise RuntimeError('API Error')
+
+        with pytest.raises(RuntimeError):
+            cache.get_or_load('happy', failing_loader)
+
+        assert len(cache) == 0
@@ -0,0 +1,72 @@
+"""
+Testy jednostkowe dla CircuitBreaker.
+
+Sprawdza przejścia między stanami closed, open i half-open.
+"""
+import pytest
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class FakeTimer:
+    """Sterowany zegar do testów czasu resetu."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _fail():
+    raise ConnectionError('Spotify down')
+
+
+class TestCircuitBreaker:
+    """Testy dla klasy CircuitBreaker."""
+
+    def test_opens_after_threshold_failures(self):
+        """Sprawdza otwarcie obwodu po osiągnięciu progu błędów."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                breaker.call(_fail)
+
+        assert breaker.state == 'open'
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: 'ok')
+
+    def test_half_open_success_closes_circuit(self):
+        """Sprawdza zamknięcie obwodu po udanym wywołaniu próbnym."""
+        timer = FakeTimer()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, timer=timer)
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+
+        timer.now = 31
+
+        assert breaker.state == 'half_open'
+        assert breaker.call(lambda: 'ok') == 'ok'
+        assert breaker.state == 'closed'
+
+    def test_half_open_failure_reopens_circuit(self):
+        """Sprawdza ponowne otwarcie obwodu po nieudanym wywołaniu próbnym."""
+        timer = FakeTimer()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, timer=timer)
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+        timer.now = 31
+
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+
+        assert breaker.state == 'open'
+
+    def test_non_failure_errors_do_not_open_circuit(self):
+        """Sprawdza czy błędy niezwiązane z awarią (np. 404) nie otwierają obwodu."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail, is_failure=lambda e: False)
+
+        assert breaker.state == 'closed'
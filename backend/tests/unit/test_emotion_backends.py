@@ -0,0 +1,99 @@
+"""
+Testy jednostkowe dla backendów detekcji emocji.
+
+Sprawdza backend OpenCV DNN (sieci zastąpione atrapami) oraz wybór
+backendu z konfiguracji.
+"""
+import numpy as np
+import pytest
+from unittest.mock import Mock
+from services.emotion_backends import DeepFaceBackend, OpenCVDnnBackend, create_backend
+
+
+@pytest.fixture
+def dnn_backend():
+    backend = OpenCVDnnBackend('face.caffemodel', 'deploy.prototxt', 'emotion.onnx', confidence=0.5)
+    face_net, emotion_net = Mock(), Mock()
+    backend._nets = lambda: (face_net, emotion_net)
+    return backend, face_net, emotion_net
+
+
+class TestOpenCVDnnBackend:
+    """Testy dla backendu OpenCV DNN."""
+
+    def test_faces_above_confidence_are_returned_in_pixels(self, dnn_backend):
+        """Sprawdza przeliczanie względnych ramek na piksele i próg pewności."""
+        backend, face_net, _ = dnn_backend
+        face_net.forward.return_value = np.array([[[
+            [0, 1, 0.9, 0.25, 0.5, 0.75, 1.0],
+            [0, 1, 0.3, 0.0, 0.0, 0.5, 0.5]
+        ]]])
+
+        faces = backend.detect_faces(np.zeros((100, 200), dtype=np.uint8))
+
+        assert faces == [(50, 50, 100, 50)]
+        assert face_net.setInput.call_args[0][0].shape == (1, 3, 300, 300)
+
+    def test_min_size_filters_small_faces(self, dnn_backend):
+        """Sprawdza pomijanie twarzy mniejszych niż min_size."""
+        backend, face_net, _ = dnn_backend
+        face_net.forward.return_value = np.array([[[[0, 1, 0.9, 0.0, 0.0, 0.1, 0.1]]]])
+
+        assert backend.detect_faces(np.zeros((100, 100), dtype=np.uint8), (20, 20)) == []
+
+    def test_ferplus_classes_are_mapped_to_emotion_order(self, dnn_backend):
+        """Sprawdza mapowanie klas FER+ (pogarda liczona jako wstręt)."""
+        backend, _, emotion_net = dnn_backend
+        # neutral, happiness, surprise, sadness, anger, disgust, fear, contempt
+        logits = np.log(np.array([0.1, 0.5, 0.0001, 0.0001, 0.0001, 0.1, 0.0001, 0.3]))
+        emotion_net.forward.return_value = logits.reshape(1, 8)
+
+        scores = backend.classify_faces([np.zeros((30, 30), dtype=np.uint8)] * 2)
+
+        assert scores.shape == (2, 7)
+        assert emotion_net.forward.call_count == 2
+        # Kolejność: angry, disgust, fear, happy, sad, surprise, neutral
+        assert scores[0][3] == pytest.approx(50, abs=0.1)
+        assert scores[0][1] == pytest.approx(40, abs=0.1)
+        assert scores[0].sum() == pytest.approx(100)
+
+
+class TestDeepFaceBackend:
+    """Testy dla backendu DeepFace (model zastąpiony atrapą)."""
+
+    def test_emotion_model_is_built_once_across_threads(self):
+        """Sprawdza jednokrotne zbudowanie modelu przy równoczesnych wywołaniach z wielu wątków."""
+        import threading
+        import time
+        from unittest.mock import patch
+
+        def slow_build(**kwargs):
+            time.sleep(0.05)
+            return Mock()
+
+        backend = DeepFaceBackend()
+        with patch('services.emotion_backends.DeepFace') as mock_deepface:
+            mock_deepface.build_model.side_effect = slow_build
+            models = []
+            threads = [threading.Thread(target=lambda: models.append(backend._get_emotion_model())) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert mock_deepface.build_model.call_count == 1
+        assert len({id(model) for model in models}) == 1
+
+
+class TestCreateBackend:
+    """Testy dla wyboru backendu."""
+
+    def test_known_backends(self):
+        """Sprawdza tworzenie backendów po nazwie."""
+        assert isinstance(create_backend('deepface'), DeepFaceBackend)
+        assert isinstance(create_backend('opencv_dnn'), OpenCVDnnBackend)
+
+    def test_unknown_backend_raises(self):
+        """Sprawdza błąd dla nieznanej nazwy backendu."""
+        with pytest.raises(ValueError):
+            create_backend('tflite')
@@ -5,7 +5,7 @@ Sprawdza działanie metod walidacji emocji i przetwarzania obrazu.
 """
 import pytest
 import numpy as np
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 from io import BytesIO
 from PIL import Image
 
@@ -17,7 +17,7 @@ class TestValidateEmotion:
         """Sprawdza czy prawidłowa emocja jest zwracana bez zmian."""
         from services.emotion_detector import EmotionDetector
         detector = EmotionDetector()
-        detector._valid_emotions = {'happy', 'sad', 'angry', 'neutral'}
+        detector._get_valid_emotions = lambda: {'happy', 'sad', 'angry', 'neutral'}
 
         assert detector._validate_emotion('happy') == 'happy'
 
@@ -25,7 +25,7 @@ class TestValidateEmotion:
         """Sprawdza czy nieprawidłowa emocja zwraca 'neutral'."""
         from services.emotion_detector import EmotionDetector
         detector = EmotionDetector()
-        detector._valid_emotions = {'happy', 'sad', 'angry', 'neutral'}
+        detector._get_valid_emotions = lambda: {'happy', 'sad', 'angry', 'neutral'}
 
         assert detector._validate_emotion('unknown') == 'neutral'
 
@@ -65,30 +65,55 @@ class TestDetectEmotion:
         img_bytes.seek(0)
         return img_bytes
 
-    @patch('services.emotion_detector.DeepFace')
-    @patch('services.emotion_detector.cv2')
+    @patch('services.emotion_backends.DeepFace')
+    @patch('services.emotion_backends.cv2')
     def test_detect_emotion_success(self, mock_cv2, mock_deepface):
         """Sprawdza poprawne wykrywanie emocji z obrazu."""
         from services.emotion_detector import EmotionDetector
 
         # Mock dla cv2
         mock_cv2.CascadeClassifier.return_value.detectMultiScale.return_value = [(10, 10, 50, 50)]
-        mock_cv2.cvtColor.return_value = np.zeros((100, 100, 3), dtype=np.uint8)
+        mock_cv2.resize.return_value = np.zeros((48, 48), dtype=np.uint8)
         mock_cv2.data.haarcascades = ''
 
-        # Mock dla DeepFace
-        mock_deepface.analyze.return_value = [{'dominant_emotion': 'happy', 'emotion': {'happy': 85.5}}]
+        # Mock dla modelu emocji (kolejność: angry, disgust, fear, happy, sad, surprise, neutral)
+        model = mock_deepface.build_model.return_value.model
+        model.predict_on_batch.return_value = np.array([[0.0, 0.0, 0.0, 0.855, 0.145, 0.0, 0.0]])
 
         detector = EmotionDetector()
-        detector._valid_emotions = {'happy', 'sad', 'angry', 'neutral'}
+        detector._get_valid_emotions = lambda: {'happy', 'sad', 'angry', 'neutral'}
 
         result = detector.detect_emotion(self._create_test_image())
 
         assert result['emotion'] == 'happy'
         assert result['confidence'] == 0.855
+        assert result['face'] == [10, 10, 50, 50]
+        assert model.predict_on_batch.call_args[0][0].shape == (1, 48, 48, 1)
+        mock_deepface.analyze.assert_not_called()
+
+    @patch('services.emotion_backends.DeepFace')
+    @patch('services.emotion_backends.cv2')
+    def test_same_image_is_served_from_cache(self, mock_cv2, mock_deepface):
+        """Sprawdza czy ponownie wysłany obraz nie jest analizowany drugi raz."""
+        from services.emotion_detector import EmotionDetector
 
-    @patch('services.emotion_detector.DeepFace')
-    @patch('services.emotion_detector.cv2')
+        mock_cv2.CascadeClassifier.return_value.detectMultiScale.return_value = [(10, 10, 50, 50)]
+        mock_cv2.resize.return_value = np.zeros((48, 48), dtype=np.uint8)
+        model = mock_deepface.build_model.return_value.model
+        model.predict_on_batch.return_value = np.array([[0.0, 0.0, 0.0, 0.855, 0.145, 0.0, 0.0]])
+
+        detector = EmotionDetector()
+        detector._get_valid_emotions = lambda: {'happy', 'sad', 'angry', 'neutral'}
+
+        first = detector.detect_emotion(self._create_test_image())
+        second = detector.detect_emotion(self._create_test_image())
+
+        assert first == second
+        assert model.predict_on_batch.call_count == 1
+        assert detector.cache.stats()['memory_hits'] == 1
+
+    @patch('services.emotion_backends.DeepFace')
+    @patch('services.emotion_backends.cv2')
     def test_no_face_returns_none(self, mock_cv2, mock_deepface):
         """Sprawdza czy brak twarzy zwraca None."""
         from services.emotion_detector import EmotionDetector
@@ -102,3 +127,233 @@ class TestDetectEmotion:
         result = detector.detect_emotion(self._create_test_image())
 
         assert result is None
+
+
+class TestModelLoading:
+    """Testy dla jednorazowego ładowania modeli i rozgrzewania."""
+
+    @patch('services.emotion_backends.DeepFace')
+    @patch('services.emotion_backends.cv2')
+    def test_face_cascade_is_loaded_once(self, mock_cv2, mock_deepface):
+        """Sprawdza czy klasyfikator Haara jest tworzony tylko raz."""
+        from services.emotion_detector import EmotionDetector
+
+        mock_cv2.CascadeClassifier.return_value.detectMultiScale.return_value = []
+        mock_cv2.cvtColor.return_value = np.zeros((100, 100, 3), dtype=np.uint8)
+
+        detector = EmotionDetector()
+        detector.detect_emotion(TestDetectEmotion()._create_test_image())
+        detector.detect_emotion(TestDetectEmotion()._create_test_image())
+
+        assert mock_cv2.CascadeClassifier.call_count == 1
+
+    @patch('services.emotion_backends.DeepFace')
+    @patch('services.emotion_backends.cv2')
+    def test_warmup_marks_detector_ready(self, mock_cv2, mock_deepface):
+        """Sprawdza czy warmup ładuje model emocji i ustawia gotowość."""
+        from services.emotion_detector import EmotionDetector
+
+        mock_cv2.resize.return_value = np.zeros((48, 48), dtype=np.uint8)
+        mock_deepface.build_model.return_value.model.predict_on_batch.return_value = np.full((1, 7), 1 / 7)
+
+        detector = EmotionDetector()
+        assert detector.is_ready is False
+
+        assert detector.warmup() is True
+        assert detector.is_ready is True
+        mock_deepface.build_model.assert_called_once_with(model_name='Emotion', task='facial_attribute')
+        mock_deepface.analyze.assert_not_called()
+
+    @patch('services.emotion_backends.DeepFace')
+    @patch('services.emotion_backends.cv2')
+    def test_failed_warmup_keeps_detector_not_ready(self, mock_cv2, mock_deepface):
+        """Sprawdza czy błąd ładowania modelu nie oznacza gotowości."""
+        from services.emotion_detector import EmotionDetector
+
+        mock_deepface.build_model.side_effect = ImportError('tensorflow missing')
+        detector = EmotionDetector()
+
+        assert detector.warmup() is False
+        assert detector.is_ready is False
+
+
+class TestPreload:
+    """Testy dla ładowania modeli przed fork() serwera."""
+
+    def test_preload_loads_models_without_inference(self):
+        """Sprawdza czy preload tylko ładuje modele, a rozgrzewanie zostaje dla workerów."""
+        from services.emotion_detector import EmotionDetector
+
+        backend = Mock(preload_before_fork=True)
+        detector = EmotionDetector(backend=backend)
+
+        assert detector.preload() is True
+        backend.load.assert_called_once()
+        backend.classify_faces.assert_not_called()
+        assert detector.is_ready is False
+
+    @patch('services.emotion_backends.DeepFace')
+    def test_deepface_is_not_loaded_before_fork(self, mock_deepface):
+        """Sprawdza czy TensorFlow (backend deepface) nie jest ładowany w procesie przed fork()."""
+        from services.emotion_backends import DeepFaceBackend
+        from services.emotion_detector import EmotionDetector
+
+        detector = EmotionDetector(backend=DeepFaceBackend())
+
+        assert detector.preload() is False
+        mock_deepface.build_model.assert_not_called()
+
+    def test_after_fork_resets_readiness(self):
+        """Sprawdza czy worker po fork() musi się rozgrzać sam."""
+        from services.emotion_detector import EmotionDetector
+
+        detector = EmotionDetector(backend=Mock())
+        detector.warmup()
+
+        detector.after_fork()
+
+        assert detector.is_ready is False
+        assert detector.warmup() is True
+
+
+class TestDetectEmotionsBatch:
+    """Testy dla wsadowej detekcji emocji na wielu zdjęciach."""
+
+    def _image_bytes(self, color):
+        img_bytes = BytesIO()
+        Image.new('RGB', (120, 120), color=color).save(img_bytes, format='PNG')
+        return img_bytes.getvalue()
+
+    @patch('services.emotion_backends.DeepFace')
+    def test_faces_are_classified_in_one_batch(self, mock_deepface):
+        """Sprawdza czy twarze ze wszystkich zdjęć trafiają do modelu jednym wywołaniem."""
+        from services.emotion_detector import EmotionDetector
+
+        model = mock_deepface.build_model.return_value.model
+        # Kolejność: angry, disgust, fear, happy, sad, surprise, neutral
+        model.predict_on_batch.return_value = np.array([
+            [0.0, 0.0, 0.0, 0.9, 0.1, 0.0, 0.0],
+            [0.1, 0.0, 0.0, 0.0, 0.7, 0.0, 0.2]
+        ])
+        detector = EmotionDetector()
+        detector._get_valid_emotions = lambda: {'happy', 'sad', 'angry', 'neutral'}
+        cascade = Mock()
+        cascade.detectMultiScale.side_effect = [[(10, 10, 50, 50), (0, 0, 80, 80)], [], [(20, 20, 40, 40)]]
+        detector.backend._get_face_cascade = lambda: cascade
+
+        results = detector.detect_emotions_batch([self._image_bytes('red'), self._image_bytes('green'), self._image_bytes('blue')])
+
+        assert model.predict_on_batch.call_count == 1
+        batch = model.predict_on_batch.call_args[0][0]
+        assert batch.shape == (2, 48, 48, 1)
+        assert results[0]['emotion'] == 'happy'
+        assert results[0]['confidence'] == 0.9
+        assert results[1] is None
+        assert results[2]['emotion'] == 'sad'
+
+
+    def _gradient_bytes(self, shift=0):
+        image = np.tile(np.linspace(0, 200, 160, dtype=np.uint8), (120, 1))
+        image[30:90, 40 + shift:100 + shift] = 255
+        img_bytes = BytesIO()
+        Image.fromarray(image).convert('RGB').save(img_bytes, format='PNG')
+        return img_bytes.getvalue()
+
+    def _perceptual_detector(self, mock_deepface):
+        from services.emotion_detector import EmotionDetector
+        from services.inference_cache import InferenceCache
+
+        detector = EmotionDetector()
+        detector._get_valid_emotions = lambda: {'happy', 'sad', 'neutral'}
+        detector.cache = InferenceCache(maxsize=16, perceptual=True, max_distance=4)
+        cascade = Mock()
+        cascade.detectMultiScale.return_value = [(10, 10, 50, 50)]
+        detector.backend._get_face_cascade = lambda: cascade
+        return detector, cascade
+
+    @patch('services.emotion_backends.DeepFace')
+    def test_near_duplicate_of_cached_image_skips_detection(self, mock_deepface):
+        """Sprawdza użycie wyniku prawie identycznego zdjęcia z cache w detekcji wsadowej."""
+        model = mock_deepface.build_model.return_value.model
+        model.predict_on_batch.return_value = np.array([[0.0, 0.0, 0.0, 0.9, 0.1, 0.0, 0.0]])
+        detector, cascade = self._perceptual_detector(mock_deepface)
+        detector.detect_emotions_batch([self._gradient_bytes()])
+
+        results = detector.detect_emotions_batch([self._gradient_bytes(shift=1)])
+
+        assert cascade.detectMultiScale.call_count == 1
+        assert model.predict_on_batch.call_count == 1
+        assert results[0]['emotion'] == 'happy'
+        assert detector.cache.stats()['perceptual_hits'] == 1
+
+    @patch('services.emotion_backends.DeepFace')
+    def test_near_duplicate_in_same_batch_is_classified_once(self, mock_deepface):
+        """Sprawdza, że prawie identyczne zdjęcia z jednej paczki trafiają do modelu tylko raz."""
+        model = mock_deepface.build_model.return_value.model
+        model.predict_on_batch.return_value = np.array([[0.0, 0.0, 0.0, 0.9, 0.1, 0.0, 0.0]])
+        detector, cascade = self._perceptual_detector(mock_deepface)
+
+        first, second = self._gradient_bytes(), self._gradient_bytes(shift=1)
+        results = detector.detect_emotions_batch([first, second])
+
+        assert cascade.detectMultiScale.call_count == 1
+        assert model.predict_on_batch.call_args[0][0].shape == (1, 48, 48, 1)
+        assert [result['emotion'] for result in results] == ['happy', 'happy']
+        assert results[0]['image_hash'] != results[1]['image_hash']
+        assert detector.detect_emotions_batch([second])[0]['emotion'] == 'happy'
+        assert model.predict_on_batch.call_count == 1
+
+
+class TestFaceSelectionPolicy:
+    """Testy dla wyboru twarzy na zdjęciach z kilkoma osobami."""
+
+    FACES = [(0, 0, 30, 30), (40, 40, 60, 60)]
+    # Mniejsza twarz jest pewnie zła, większa niepewnie szczęśliwa
+    PREDICTIONS = np.array([
+        [0.0, 0.0, 0.0, 0.6, 0.4, 0.0, 0.0],
+        [0.95, 0.0, 0.0, 0.0, 0.05, 0.0, 0.0]
+    ])
+
+    def _detect(self, mock_deepface, policy, predictions):
+        from services.emotion_detector import EmotionDetector
+
+        model = mock_deepface.build_model.return_value.model
+        model.predict_on_batch.return_value = predictions
+        detector = EmotionDetector()
+        detector._get_valid_emotions = lambda: {'happy', 'sad', 'angry', 'neutral'}
+        cascade = Mock()
+        cascade.detectMultiScale.return_value = self.FACES
+        detector.backend._get_face_cascade = lambda: cascade
+
+        with patch('services.emotion_detector.Config.FACE_SELECTION_POLICY', policy):
+            result = detector.detect_emotion(TestDetectEmotion()._create_test_image())
+        return result, model.predict_on_batch.call_args[0][0]
+
+    @patch('services.emotion_backends.DeepFace')
+    def test_largest_face_only_is_classified(self, mock_deepface):
+        """Sprawdza czy domyślnie klasyfikowana jest tylko największa twarz."""
+        result, batch = self._detect(mock_deepface, 'largest', self.PREDICTIONS[:1])
+
+        assert batch.shape == (1, 48, 48, 1)
+        assert result['emotion'] == 'happy'
+        assert result['face'] == [40, 40, 60, 60]
+        assert 'faces' not in result
+
+    @patch('services.emotion_backends.DeepFace')
+    def test_all_faces_are_listed(self, mock_deepface):
+        """Sprawdza czy polityka 'all' zwraca wszystkie twarze, a wynik główny z największej."""
+        result, batch = self._detect(mock_deepface, 'all', self.PREDICTIONS)
+
+        assert batch.shape == (2, 48, 48, 1)
+        assert result['emotion'] == 'happy'
+        assert [face['emotion'] for face in result['faces']] == ['happy', 'angry']
+        assert result['faces'][1]['box'] == [0, 0, 30, 30]
+
+    @patch('services.emotion_backends.DeepFace')
+    def test_most_confident_face_wins(self, mock_deepface):
+        """Sprawdza czy polityka 'most_confident' wybiera twarz z najpewniejszą emocją."""
+        result, _ = self._detect(mock_deepface, 'most_confident', self.PREDICTIONS)
+
+        assert result['emotion'] == 'angry'
+        assert result['confidence'] == 0.95
+        assert result['face'] == [0, 0, 30, 30]
@@ -0,0 +1,137 @@
+"""
+Testy jednostkowe dla analizy sekwencji klatek.
+
+Sprawdza pomijanie podobnych klatek, śledzenie twarzy, wygładzanie
+wyników oraz czytanie klatek z pliku wideo.
+"""
+import numpy as np
+import cv2
+import pytest
+from unittest.mock import Mock, patch
+from services.image_pipeline import ImageTooLarge
+from services.frame_sequence import read_video_frames, select_changed_frames, smooth_scores, track_faces
+
+
+def _frame(value, size=(120, 160)):
+    return np.full(size, value, dtype=np.uint8)
+
+
+def _clip(tmp_path, frame_count=30, size=(320, 240)):
+    path = str(tmp_path / 'clip.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, size)
+    for value in range(frame_count):
+        writer.write(np.full((size[1], size[0], 3), value * 8, dtype=np.uint8))
+    writer.release()
+    with open(path, 'rb') as video_file:
+        return video_file.read()
+
+
+class TestSelectChangedFrames:
+    """Testy dla wyboru klatek do analizy."""
+
+    def test_identical_frames_are_skipped(self):
+        """Sprawdza pomijanie klatek prawie identycznych z poprzednio wybraną."""
+        frames = [_frame(100), _frame(101), _frame(102), _frame(150), _frame(151)]
+
+        assert select_changed_frames(frames, threshold=4.0, max_frames=8) == [0, 3]
+
+    def test_selection_is_capped_evenly(self):
+        """Sprawdza ograniczenie liczby klatek z równym rozłożeniem w czasie."""
+        frames = [_frame(value) for value in range(0, 250, 25)]
+
+        selected = select_changed_frames(frames, threshold=4.0, max_frames=3)
+
+        assert selected == [0, 4, 9] or selected == [0, 5, 9]
+
+
+class TestTrackFaces:
+    """Testy dla śledzenia twarzy między klatkami."""
+
+    def test_face_is_searched_near_previous_box(self):
+        """Sprawdza, że po znalezieniu twarzy przeszukiwany jest tylko jej otoczenie."""
+        detect_faces = Mock(side_effect=[[(40, 30, 40, 40)], [(22, 20, 40, 40)], [(20, 20, 40, 40)]])
+
+        boxes, full_detections = track_faces([_frame(0), _frame(0), _frame(0)], detect_faces)
+
+        assert full_detections == 1
+        assert boxes[1] == (42, 30, 40, 40)
+        roi, min_size = detect_faces.call_args_list[1][0]
+        assert roi.shape == (80, 80)
+        assert min_size == (20, 20)
+
+    def test_lost_face_falls_back_to_full_frame(self):
+        """Sprawdza ponowną detekcję na całej klatce, gdy twarz zniknie z otoczenia."""
+        detect_faces = Mock(side_effect=[[(40, 30, 40, 40)], [], [(100, 60, 30, 30)]])
+
+        boxes, full_detections = track_faces([_frame(0), _frame(0)], detect_faces)
+
+        assert full_detections == 2
+        assert boxes == [(40, 30, 40, 40), (100, 60, 30, 30)]
+
+
+class TestSmoothScores:
+    """Testy dla wygładzania wyników w czasie."""
+
+    def test_exponential_moving_average(self):
+        """Sprawdza wagę najnowszej klatki w średniej wykładniczej."""
+        scores = np.array([[100.0, 0.0], [0.0, 100.0]])
+
+        assert smooth_scores(scores, alpha=0.25).tolist() == [75.0, 25.0]
+
+
+class TestReadVideoFrames:
+    """Testy dla czytania klatek z klipu."""
+
+    def test_frames_are_scanned_at_reduced_rate(self, tmp_path):
+        """Sprawdza czytanie co którejś klatki i zmniejszanie rozdzielczości."""
+        frames = read_video_frames(_clip(tmp_path), max_side=160, max_frames=90, scan_fps=10)
+
+        assert len(frames) == 10
+        assert frames[0].shape == (120, 160)
+
+    def test_clip_with_too_large_frames_is_refused(self, tmp_path):
+        """Sprawdza odrzucenie klipu o zbyt dużych klatkach przed ich dekodowaniem."""
+        with patch('services.frame_sequence._downscale_gray') as downscale:
+            with pytest.raises(ImageTooLarge):
+                read_video_frames(_clip(tmp_path), max_side=160, max_pixels=320 * 240 - 1)
+
+        downscale.assert_not_called()
+
+    def test_detector_does_not_swallow_too_large_clip(self, tmp_path):
+        """Sprawdza, że EmotionDetector przekazuje ImageTooLarge dalej zamiast zwracać None."""
+        from services.emotion_detector import EmotionDetector
+
+        detector = EmotionDetector()
+        detector.cache = None
+        with patch('services.emotion_detector.Config.VIDEO_MAX_PIXELS', 1000):
+            with pytest.raises(ImageTooLarge):
+                detector.detect_emotion_video(_clip(tmp_path, frame_count=3))
+
+
+class TestDetectorSequence:
+    """Testy dla detekcji emocji z serii klatek w EmotionDetector."""
+
+    @patch('services.emotion_backends.DeepFace')
+    def test_sampled_faces_are_classified_in_one_batch(self, mock_deepface):
+        """Sprawdza jedno wywołanie modelu dla całej sekwencji i wygładzony wynik."""
+        from services.emotion_detector import EmotionDetector
+
+        model = mock_deepface.build_model.return_value.model
+        # Kolejność: angry, disgust, fear, happy, sad, surprise, neutral
+        model.predict_on_batch.return_value = np.array([
+            [0.0, 0.0, 0.0, 0.2, 0.8, 0.0, 0.0],
+            [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0]
+        ])
+        detector = EmotionDetector()
+        detector._get_valid_emotions = lambda: {'happy', 'sad', 'neutral'}
+        cascade = Mock()
+        cascade.detectMultiScale.return_value = [(10, 10, 50, 50)]
+        detector.backend._get_face_cascade = lambda: cascade
+
+        result = detector._analyze_sequence([_frame(100), _frame(100), _frame(180)])
+
+        assert model.predict_on_batch.call_count == 1
+        assert model.predict_on_batch.call_args[0][0].shape == (2, 48, 48, 1)
+        assert result['emotion'] == 'happy'
+        assert result['confidence'] == 0.6
+        assert result['frames'] == {'total': 3, 'analyzed': 2, 'with_face': 2, 'full_detections': 1}
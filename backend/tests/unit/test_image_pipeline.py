@@ -0,0 +1,147 @@
+"""
+Testy jednostkowe dla potoku dekodowania obrazów.
+
+Sprawdza zmniejszanie, orientację EXIF oraz obsługę przezroczystości i palet.
+"""
+import pytest
+import numpy as np
+from io import BytesIO
+from PIL import Image
+from services.image_pipeline import decode_image
+
+
+def _encode(image, format, **kwargs):
+    buffer = BytesIO()
+    image.save(buffer, format=format, **kwargs)
+    return buffer.getvalue()
+
+
+class TestDecodeImage:
+    """Testy dla funkcji decode_image."""
+
+    def test_large_jpeg_is_downscaled(self):
+        """Sprawdza czy dłuższy bok jest ograniczany do max_side."""
+        image_bytes = _encode(Image.new('RGB', (4000, 3000), color=(200, 30, 30)), 'JPEG')
+
+        bgr, gray = decode_image(image_bytes, max_side=800)
+
+        assert max(bgr.shape[:2]) <= 800
+        assert bgr.shape[:2] == gray.shape
+        assert bgr.shape[2] == 3
+        # Kolor czerwony w formacie BGR
+        assert bgr[0, 0, 2] > 150 and bgr[0, 0, 0] < 80
+
+    def test_small_image_keeps_size(self):
+        """Sprawdza czy mały obraz nie jest powiększany."""
+        bgr, gray = decode_image(_encode(Image.new('RGB', (320, 240)), 'PNG'), max_side=800)
+
+        assert bgr.shape == (240, 320, 3)
+
+    def test_exif_orientation_is_applied(self):
+        """Sprawdza obrót zdjęcia według orientacji EXIF."""
+        image = Image.new('RGB', (400, 200))
+        exif = image.getexif()
+        exif[0x0112] = 6
+        image_bytes = _encode(image, 'JPEG', exif=exif.tobytes())
+
+        bgr, gray = decode_image(image_bytes, max_side=800)
+
+        assert bgr.shape[:2] == (400, 200)
+
+    def test_transparent_pixels_become_white(self):
+        """Sprawdza czy przezroczyste obszary RGBA są zamieniane na białe."""
+        image = Image.new('RGBA', (50, 50), color=(0, 0, 0, 0))
+        image.paste((0, 0, 0, 255), (0, 0, 25, 50))
+
+        bgr, gray = decode_image(_encode(image, 'PNG'))
+
+        assert gray[10, 10] == 0
+        assert gray[10, 40] == 255
+
+    def test_large_png_is_reduced_before_orientation_and_flatten(self):
+        """Sprawdza czy duży PNG z przezroczystością i orientacją EXIF jest zmniejszany przed obrotem."""
+        from unittest.mock import patch
+        from services import image_pipeline
+
+        image = Image.new('RGBA', (1600, 800), color=(0, 0, 0, 255))
+        image.paste((0, 0, 0, 0), (800, 0, 1600, 800))
+        exif = image.getexif()
+        exif[0x0112] = 6
+        sizes = []
+        flatten = image_pipeline._flatten
+
+        def recording_flatten(pil_image):
+            sizes.append(pil_image.size)
+            return flatten(pil_image)
+
+        with patch.object(image_pipeline, '_flatten', recording_flatten):
+            bgr, gray = decode_image(_encode(image, 'PNG', exif=exif.tobytes()), max_side=400)
+
+        assert sizes == [(400, 200)]
+        assert bgr.shape[:2] == (400, 200)
+        assert gray[5, 100] == 0 and gray[395, 100] == 255
+
+    def test_palette_and_grayscale_images(self):
+        """Sprawdza dekodowanie obrazów z paletą i w skali szarości."""
+        palette_bytes = _encode(Image.new('RGB', (60, 40), color=(10, 200, 10)).convert('P'), 'PNG')
+        gray_bytes = _encode(Image.new('L', (60, 40), color=128), 'JPEG')
+
+        palette_bgr, _ = decode_image(palette_bytes)
+        gray_bgr, gray = decode_image(gray_bytes)
+
+        assert palette_bgr.shape == (40, 60, 3)
+        assert palette_bgr[0, 0, 1] > 150
+        assert gray_bgr.shape == (40, 60, 3)
+        assert abs(int(gray[0, 0]) - 128) <= 2
+
+
+class TestUploads:
+    """Testy dla odczytu przesłanych plików bez kopiowania i limitu rozmiaru."""
+
+    def test_spooled_upload_is_memory_mapped(self):
+        """Sprawdza mapowanie pliku tymczasowego zamiast czytania go do pamięci."""
+        import mmap
+        import tempfile
+        from services.image_pipeline import open_upload
+
+        image_bytes = _encode(Image.new('RGB', (64, 48), color=(0, 0, 255)), 'JPEG')
+        with tempfile.TemporaryFile() as upload:
+            upload.write(image_bytes)
+            with open_upload(upload) as buffer:
+                assert isinstance(buffer, mmap.mmap)
+                bgr, gray = decode_image(buffer)
+
+        assert bgr.shape == (48, 64, 3)
+        assert bgr[0, 0, 0] > 200
+
+    def test_in_memory_upload_is_not_copied(self):
+        """Sprawdza użycie bufora BytesIO bez kopiowania."""
+        from services.image_pipeline import open_upload
+
+        import tempfile
+
+        upload = BytesIO(b'image bytes')
+        with open_upload(upload) as buffer:
+            assert buffer is upload.getvalue()
+
+        spooled = tempfile.SpooledTemporaryFile(max_size=1024)
+        spooled.write(b'image bytes')
+        with open_upload(spooled) as buffer:
+            assert buffer[:] == b'image bytes'
+
+    def test_oversized_header_is_rejected_before_decoding(self):
+        """Sprawdza odrzucenie obrazu na podstawie nagłówka, bez dekodowania pikseli."""
+        from unittest.mock import patch
+        from services.image_pipeline import ImageTooLarge, check_image_size
+
+        upload = BytesIO(_encode(Image.new('RGB', (400, 300)), 'JPEG'))
+        upload.seek(5)
+
+        with patch('services.image_pipeline.cv2.imdecode') as imdecode:
+            with pytest.raises(ImageTooLarge):
+                check_image_size(upload, max_pixels=100000)
+            with pytest.raises(ImageTooLarge):
+                decode_image(upload.getvalue(), max_pixels=100000)
+            imdecode.assert_not_called()
+        assert upload.tell() == 5
+        check_image_size(upload, max_pixels=120000)
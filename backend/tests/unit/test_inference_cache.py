@@ -0,0 +1,64 @@
+"""
+Testy jednostkowe dla cache wyników detekcji emocji.
+
+Sprawdza poziom pamięciowy, dyskowy oraz dopasowanie po hashu percepcyjnym.
+"""
+import numpy as np
+from services.inference_cache import InferenceCache, MISS, difference_hash
+
+RESULT = {'emotion': 'happy', 'confidence': 0.9, 'raw_emotions': {'happy': 90.0, 'sad': 10.0}}
+
+
+def _gradient_image(shift=0):
+    """Obraz w skali szarości z poziomym gradientem i jasnym prostokątem."""
+    image = np.tile(np.linspace(0, 200, 160, dtype=np.uint8), (120, 1))
+    image[30:90, 40 + shift:100 + shift] = 255
+    return image
+
+
+class TestInferenceCache:
+    """Testy dla klasy InferenceCache."""
+
+    def test_memory_hit(self):
+        """Sprawdza zwracanie wyniku dla tego samego hasha treści."""
+        cache = InferenceCache(maxsize=4)
+        cache.set('abc', RESULT)
+
+        assert cache.get('abc') == RESULT
+        assert cache.get('other') is MISS
+        assert cache.stats()['hit_rate'] == 0.5
+
+    def test_no_face_result_is_cached(self):
+        """Sprawdza czy wynik 'brak twarzy' (None) też jest zapamiętywany."""
+        cache = InferenceCache(maxsize=4)
+        cache.set('abc', None)
+
+        assert cache.get('abc') is None
+
+    def test_disk_tier_is_shared(self, tmp_path):
+        """Sprawdza czy wynik zapisany przez jeden proces jest widoczny dla innego."""
+        path = str(tmp_path / 'inference.sqlite3')
+        InferenceCache(maxsize=4, disk_path=path).set('abc', RESULT)
+
+        other_worker = InferenceCache(maxsize=4, disk_path=path)
+
+        assert other_worker.get('abc') == RESULT
+        assert other_worker.stats()['disk_hits'] == 1
+
+    def test_after_fork_opens_new_disk_connection(self, tmp_path):
+        """Sprawdza czy po fork() połączenie SQLite rodzica nie jest używane."""
+        cache = InferenceCache(maxsize=4, disk_path=str(tmp_path / 'inference.sqlite3'))
+        parent_connection = cache._disk._connect()
+
+        cache.after_fork()
+
+        assert cache._disk._connect() is not parent_connection
+
+    def test_perceptual_match_for_near_identical_image(self):
+        """Sprawdza czy prawie identyczny obraz korzysta z poprzedniego wyniku."""
+        cache = InferenceCache(maxsize=4, perceptual=True, max_distance=4)
+        cache.set('abc', RESULT, difference_hash(_gradient_image()))
+
+        assert cache.get_similar(difference_hash(_gradient_image(shift=1))) == RESULT
+        assert cache.get_similar(difference_hash(255 - _gradient_image())) is MISS
+        assert cache.stats()['perceptual_hits'] == 1
@@ -0,0 +1,80 @@
+"""
+Testy jednostkowe dla puli procesów inferencji.
+
+Sprawdza wykonanie w procesach roboczych, odrzucanie przy pełnej kolejce
+oraz przekroczenie terminu odpowiedzi.
+"""
+import threading
+import time
+import pytest
+from services.inference_pool import InferencePool, InferenceQueueFull, InferenceTimeout
+
+
+class SlowDetector:
+    """Udaje detektor: 'wykrywa' emocję po zadanym czasie zapisanym w obrazie."""
+
+    is_ready = True
+
+    def detect_emotion(self, image_file):
+        time.sleep(float(image_file.read().decode()))
+        return {'emotion': 'happy', 'confidence': 0.9}
+
+
+def create_slow_detector():
+    return SlowDetector()
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def factory(**kwargs):
+        pool = InferencePool(detector_factory=create_slow_detector, **kwargs)
+        pools.append(pool)
+        return pool
+
+    yield factory
+    for pool in pools:
+        pool._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class TestInferencePool:
+    """Testy dla klasy InferencePool."""
+
+    def test_detection_runs_in_worker(self, make_pool):
+        """Sprawdza wynik z procesu roboczego i metryki czasu oczekiwania."""
+        pool = make_pool(workers=1, max_queue=2, deadline=30)
+        assert pool.warmup() is True
+
+        result = pool.detect_emotion(b'0')
+
+        assert result['emotion'] == 'happy'
+        stats = pool.stats()
+        assert stats['ready'] is True
+        assert stats['wait_time']['count'] == 1
+        assert stats['depth'] == 0
+
+    def test_full_queue_is_rejected_with_retry_after(self, make_pool):
+        """Sprawdza odrzucenie zapytania, gdy kolejka jest pełna."""
+        pool = make_pool(workers=1, max_queue=1, deadline=30)
+        pool.warmup()
+        worker = threading.Thread(target=pool.detect_emotion, args=(b'1',))
+        worker.start()
+        time.sleep(0.2)
+
+        with pytest.raises(InferenceQueueFull) as error:
+            pool.detect_emotion(b'0')
+        worker.join()
+
+        assert error.value.retry_after >= 1
+        assert pool.stats()['rejected'] == 1
+
+    def test_deadline_exceeded(self, make_pool):
+        """Sprawdza przekroczenie terminu odpowiedzi."""
+        pool = make_pool(workers=1, max_queue=2, deadline=0.2)
+        pool.warmup()
+
+        with pytest.raises(InferenceTimeout):
+            pool.detect_emotion(b'1')
+
+        assert pool.stats()['timeouts'] == 1
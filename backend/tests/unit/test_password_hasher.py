@@ -0,0 +1,94 @@
+"""
+Testy jednostkowe dla hashowania haseł w osobnej puli wątków.
+
+Sprawdza hashowanie i weryfikację, wykrywanie hashy do aktualizacji,
+odrzucanie przy pełnej kolejce oraz pomiar czasu.
+"""
+import threading
+import pytest
+from werkzeug.security import generate_password_hash
+from services.password_hasher import PasswordHasher, PasswordHashingUnavailable
+
+FAST_METHOD = 'pbkdf2:sha256:1000'
+
+
+class TestPasswordHasher:
+    """Testy dla klasy PasswordHasher."""
+
+    def test_hash_and_verify(self):
+        """Sprawdza weryfikację poprawnego i błędnego hasła oraz liczniki czasu."""
+        hasher = PasswordHasher(method=FAST_METHOD)
+        password_hash = hasher.hash('secret')
+
+        assert password_hash.startswith(FAST_METHOD + '$')
+        assert hasher.verify(password_hash, 'secret') is True
+        assert hasher.verify(password_hash, 'wrong') is False
+        assert hasher.stats()['hash_latency']['count'] == 1
+        assert hasher.stats()['verify_latency']['count'] == 2
+
+    def test_needs_rehash_when_parameters_change(self):
+        """Sprawdza wykrywanie hashy utworzonych innymi parametrami."""
+        hasher = PasswordHasher(method='pbkdf2:sha256:2000')
+
+        assert hasher.needs_rehash(generate_password_hash('secret', FAST_METHOD)) is True
+        assert hasher.needs_rehash(generate_password_hash('secret', 'pbkdf2:sha256:2000', 8)) is True
+        assert hasher.needs_rehash(hasher.hash('secret')) is False
+
+    def test_default_method_is_compared_in_full_form(self):
+        """Sprawdza czy skrócona nazwa metody nie wymusza ponownego hashowania."""
+        hasher = PasswordHasher(method='scrypt')
+
+        assert hasher.needs_rehash(generate_password_hash('secret', 'scrypt:32768:8:1')) is False
+
+    def test_needs_rehash_does_not_hash(self):
+        """Sprawdza, że sprawdzenie parametrów hasha nie liczy żadnego hasha."""
+        from unittest.mock import patch
+
+        hasher = PasswordHasher(method=FAST_METHOD)
+
+        with patch('services.password_hasher.generate_password_hash') as generate:
+            assert hasher.needs_rehash(generate_password_hash('secret', FAST_METHOD, 16)) is False
+        generate.assert_not_called()
+
+    def test_full_queue_is_rejected(self):
+        """Sprawdza odrzucenie hashowania, gdy kolejka jest pełna."""
+        hasher = PasswordHasher(method=FAST_METHOD, workers=1, max_queue=1)
+        release = threading.Event()
+        blocker = threading.Thread(target=hasher._call, args=(hasher.hash_latency, release.wait))
+        blocker.start()
+        while hasher.depth == 0:
+            pass
+
+        with pytest.raises(PasswordHashingUnavailable) as error:
+            hasher.hash('secret')
+        release.set()
+        blocker.join()
+
+        assert error.value.retry_after >= 1
+        assert hasher.stats()['rejected'] == 1
+
+    def test_hash_in_background_passes_hash_to_callback(self):
+        """Sprawdza hashowanie w tle i przekazanie wyniku do callbacku w puli."""
+        hasher = PasswordHasher(method=FAST_METHOD)
+        done = threading.Event()
+        hashes = []
+
+        assert hasher.hash_in_background('secret', lambda password_hash: hashes.append(password_hash) or done.set()) is True
+        assert done.wait(5)
+        assert hasher.verify(hashes[0], 'secret') is True
+
+    def test_hash_in_background_is_dropped_when_full(self):
+        """Sprawdza porzucenie zadania w tle, gdy kolejka hashowania jest pełna."""
+        hasher = PasswordHasher(method=FAST_METHOD, workers=1, max_queue=1)
+        release = threading.Event()
+        blocker = threading.Thread(target=hasher._call, args=(hasher.hash_latency, release.wait))
+        blocker.start()
+        while hasher.depth == 0:
+            pass
+
+        accepted = hasher.hash_in_background('secret', lambda password_hash: None)
+        release.set()
+        blocker.join()
+
+        assert accepted is False
+        assert hasher.stats()['dropped'] == 1
@@ -0,0 +1,53 @@
+"""
+Testy jednostkowe dla filtra ostatnio polecanych utworów.
+
+Sprawdza działanie filtra Bloom oraz rotację generacji historii użytkownika.
+"""
+import pytest
+from services.recently_played import BloomFilter, UserTrackHistory
+
+
+class TestBloomFilter:
+    """Testy dla klasy BloomFilter."""
+
+    def test_added_items_are_found(self):
+        """Sprawdza brak fałszywie negatywnych wyników."""
+        bloom = BloomFilter(capacity=100)
+        track_ids = [f'track_{i}' for i in range(100)]
+        for track_id in track_ids:
+            bloom.add(track_id)
+
+        assert all(track_id in bloom for track_id in track_ids)
+
+    def test_false_positive_rate_is_low(self):
+        """Sprawdza czy odsetek fałszywie pozytywnych wyników jest niski."""
+        bloom = BloomFilter(capacity=100, error_rate=0.01)
+        for i in range(100):
+            bloom.add(f'track_{i}')
+
+        false_positives = sum(f'other_{i}' in bloom for i in range(10000))
+
+        assert false_positives < 300
+
+
+class TestUserTrackHistory:
+    """Testy dla klasy UserTrackHistory."""
+
+    def test_tracks_from_last_window_records_are_remembered(self):
+        """Sprawdza czy utwory z ostatnich N rekordów są wykluczane."""
+        history = UserTrackHistory(window=2)
+        history.add_record(['a'])
+        history.add_record(['b'])
+        history.add_record(['c'])
+
+        assert 'b' in history
+        assert 'c' in history
+
+    def test_old_generations_are_dropped(self):
+        """Sprawdza czy utwory starsze niż dwie generacje są zapominane."""
+        history = UserTrackHistory(window=1)
+        history.add_record(['a'])
+        history.add_record(['b'])
+        history.add_record(['c'])
+
+        assert 'a' not in history
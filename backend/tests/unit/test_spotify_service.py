@@ -7,6 +7,14 @@ import pytest
 from unittest.mock import Mock, patch
 
 
+@pytest.fixture(autouse=True)
+def empty_catalog():
+    """Mockuje pusty lokalny katalog, aby testy korzystały z API Spotify."""
+    with patch('services.spotify_service.PlaylistTrack') as mock_catalog:
+        mock_catalog.sample_for_emotion.return_value = []
+        yield mock_catalog
+
+
 class TestGetRandomTracksForEmotion:
     """Testy dla metody get_random_tracks_for_emotion."""
 
@@ -18,9 +26,7 @@ class TestGetRandomTracksForEmotion:
         from services.spotify_service import SpotifyService
 
         # Mock playlisty
-        mock_playlist = Mock()
-        mock_playlist.spotify_playlist_id = 'test_playlist_id'
-        mock_playlist_model.get_by_emotion.return_value = mock_playlist
+        mock_playlist_model.get_spotify_playlist_id.return_value = 'test_playlist_id'
 
         # Mock Spotify API
         mock_spotify_instance = Mock()
@@ -49,7 +55,7 @@ class TestGetRandomTracksForEmotion:
         """Sprawdza czy brak playlisty zwraca pustą listę."""
         from services.spotify_service import SpotifyService
 
-        mock_playlist_model.get_by_emotion.return_value = None
+        mock_playlist_model.get_spotify_playlist_id.return_value = None
         mock_spotify_class.return_value = Mock()
 
         service = SpotifyService()
@@ -64,9 +70,7 @@ class TestGetRandomTracksForEmotion:
         """Sprawdza czy błąd API zwraca pustą listę."""
         from services.spotify_service import SpotifyService
 
-        mock_playlist = Mock()
-        mock_playlist.spotify_playlist_id = 'test_id'
-        mock_playlist_model.get_by_emotion.return_value = mock_playlist
+        mock_playlist_model.get_spotify_playlist_id.return_value = 'test_id'
 
         mock_spotify_instance = Mock()
         mock_spotify_instance.playlist.side_effect = Exception("API Error")
@@ -76,3 +80,171 @@ class TestGetRandomTracksForEmotion:
         result = service.get_random_tracks_for_emotion('happy')
 
         assert result == []
+
+    @patch('services.spotify_service.EmotionPlaylist')
+    @patch('services.spotify_service.SpotifyClientCredentials')
+    @patch('services.spotify_service.spotipy.Spotify')
+    def test_playlist_is_cached_between_calls(self, mock_spotify_class, mock_credentials, mock_playlist_model):
+        """Sprawdza czy playlista jest pobierana z API tylko raz w oknie TTL."""
+        from services.spotify_service import SpotifyService
+
+        mock_playlist_model.get_spotify_playlist_id.return_value = 'test_id'
+
+        mock_spotify_instance = Mock()
+        mock_spotify_instance.playlist.return_value = {
+            'tracks': {'items': [{'track': {
+                'name': f'Track {i}',
+                'artists': [{'name': 'Artist'}],
+                'id': f'track_{i}',
+                'external_urls': {'spotify': f'https://open.spotify.com/track/{i}'},
+                'album': {'images': []}
+            }} for i in range(10)]}
+        }
+        mock_spotify_class.return_value = mock_spotify_instance
+
+        service = SpotifyService()
+        first = service.get_random_tracks_for_emotion('happy', count=3)
+        second = service.get_random_tracks_for_emotion('happy', count=3)
+
+        assert len(first) == 3 and len(second) == 3
+        assert mock_spotify_instance.playlist.call_count == 1
+        assert service.get_cache_stats()['hits'] == 1
+
+    @patch('services.spotify_service.SpotifyClientCredentials')
+    @patch('services.spotify_service.spotipy.Spotify')
+    def test_catalog_tracks_skip_spotify(self, mock_spotify_class, mock_credentials, empty_catalog):
+        """Sprawdza czy utwory z lokalnego katalogu nie wymagają wywołania API."""
+        from services.spotify_service import SpotifyService
+
+        catalog_track = Mock()
+        catalog_track.to_dict.return_value = {'name': 'Catalog Track'}
+        empty_catalog.sample_for_emotion.return_value = [catalog_track]
+        mock_spotify_instance = Mock()
+        mock_spotify_class.return_value = mock_spotify_instance
+
+        service = SpotifyService()
+        result = service.get_random_tracks_for_emotion('happy', count=1)
+
+        assert result == [{'name': 'Catalog Track'}]
+        mock_spotify_instance.playlist.assert_not_called()
+
+
+class TestPickTracks:
+    """Testy dla wyboru utworów z pominięciem historii użytkownika."""
+
+    def test_excluded_tracks_are_skipped(self):
+        """Sprawdza czy ostatnio polecane utwory są pomijane."""
+        from services.spotify_service import SpotifyService
+        tracks = [{'spotify_id': f'track_{i}'} for i in range(6)]
+
+        result = SpotifyService._pick_tracks(tracks, 3, exclude={'track_0', 'track_1'})
+
+        assert [t['spotify_id'] for t in result] == ['track_2', 'track_3', 'track_4']
+
+    def test_exhausted_pool_is_filled_with_excluded(self):
+        """Sprawdza czy przy wyczerpanej puli zwracana jest pełna lista."""
+        from services.spotify_service import SpotifyService
+        tracks = [{'spotify_id': f'track_{i}'} for i in range(3)]
+
+        result = SpotifyService._pick_tracks(tracks, 3, exclude={'track_0', 'track_1'})
+
+        assert [t['spotify_id'] for t in result] == ['track_2', 'track_0', 'track_1']
+
+
+class TestTrackPools:
+    """Testy dla wspólnych pul kandydatów dla wielu rekomendacji."""
+
+    @patch('services.spotify_service.SpotifyClientCredentials')
+    @patch('services.spotify_service.spotipy.Spotify')
+    def test_pools_come_from_one_catalog_query_per_emotion(self, mock_spotify_class, mock_credentials, empty_catalog):
+        """Sprawdza jedno zapytanie do katalogu na emocję z rozmiarem puli."""
+        from services.spotify_service import SpotifyService
+
+        catalog_track = Mock()
+        catalog_track.to_dict.return_value = {'spotify_id': 'catalog'}
+        empty_catalog.sample_for_emotion.return_value = [catalog_track]
+
+        pools = SpotifyService().get_track_pools({'happy': 40, 'sad': 20})
+
+        assert pools == {'happy': [{'spotify_id': 'catalog'}], 'sad': [{'spotify_id': 'catalog'}]}
+        assert [call[0] for call in empty_catalog.sample_for_emotion.call_args_list] == [('happy', 40), ('sad', 20)]
+
+    def test_pick_from_pools_blends_emotions(self):
+        """Sprawdza mieszanie utworów z kilku pul według wag bez zapytań."""
+        from services.spotify_service import SpotifyService
+        pools = {
+            'happy': [{'spotify_id': f'happy_{i}'} for i in range(10)],
+            'sad': [{'spotify_id': f'sad_{i}'} for i in range(10)]
+        }
+
+        single = SpotifyService.pick_from_pools(pools, {'happy': 1.0}, count=3)
+        blended = SpotifyService.pick_from_pools(pools, {'happy': 60.0, 'sad': 40.0}, count=5)
+
+        assert len(single) == 3 and all(t['spotify_id'].startswith('happy') for t in single)
+        assert sum(t['spotify_id'].startswith('happy') for t in blended) == 3
+        assert sum(t['spotify_id'].startswith('sad') for t in blended) == 2
+
+
+class TestBlendedTracks:
+    """Testy dla mieszania utworów z playlist kilku bliskich emocji."""
+
+    def test_close_emotion_weights(self):
+        """Sprawdza czy wybierane są tylko emocje bliskie najwyższej."""
+        from services.spotify_service import close_emotion_weights
+        scores = {'happy': 48.0, 'surprise': 41.0, 'neutral': 9.0, 'sad': 2.0}
+
+        assert close_emotion_weights(scores, margin=10, top_k=3) == {'happy': 48.0, 'surprise': 41.0}
+        assert close_emotion_weights(scores, margin=50, top_k=2) == {'happy': 48.0, 'surprise': 41.0}
+
+    def test_split_count_is_proportional(self):
+        """Sprawdza podział liczby utworów metodą największych reszt."""
+        from services.spotify_service import split_count
+
+        assert split_count({'happy': 48.0, 'surprise': 41.0}, 5) == {'happy': 3, 'surprise': 2}
+        assert sum(split_count({'a': 1, 'b': 1, 'c': 1}, 5).values()) == 5
+
+    def test_merge_fills_shortfall_without_duplicates(self):
+        """Sprawdza czy braki są uzupełniane z innych emocji bez duplikatów."""
+        from services.spotify_service import SpotifyService
+        candidates = {
+            'happy': [{'spotify_id': 'shared'}, {'spotify_id': 'h1'}, {'spotify_id': 'h2'}],
+            'surprise': [{'spotify_id': 'shared'}]
+        }
+
+        result = SpotifyService._merge_candidates({'happy': 2, 'surprise': 2}, candidates, 4, exclude=None)
+
+        assert [t['spotify_id'] for t in result] == ['shared', 'h1', 'h2']
+
+    @patch('services.spotify_service.EmotionPlaylist')
+    @patch('services.spotify_service.SpotifyClientCredentials')
+    @patch('services.spotify_service.spotipy.Spotify')
+    def test_live_playlists_are_fetched_concurrently(self, mock_spotify_class, mock_credentials, mock_playlist_model):
+        """Sprawdza czy playlisty kilku emocji pobierane są równolegle."""
+        import time
+        from services.spotify_service import SpotifyService
+
+        mock_playlist_model.get_spotify_playlist_id.side_effect = lambda emotion_name: f'{emotion_name}_playlist'
+
+        def slow_playlist(playlist_id, **kwargs):
+            time.sleep(0.3)
+            return {'tracks': {'items': [{'track': {
+                'name': f'{playlist_id} {i}',
+                'artists': [{'name': 'Artist'}],
+                'id': f'{playlist_id}_{i}',
+                'external_urls': {'spotify': f'https://open.spotify.com/track/{playlist_id}_{i}'},
+                'album': {'images': []}
+            }} for i in range(5)]}}
+        mock_spotify_instance = Mock()
+        mock_spotify_instance.playlist.side_effect = slow_playlist
+        mock_spotify_class.return_value = mock_spotify_instance
+
+        service = SpotifyService()
+        started = time.monotonic()
+        result = service.get_blended_tracks({'happy': 48.0, 'surprise': 41.0}, count=5)
+        elapsed = time.monotonic() - started
+
+        assert elapsed < 0.55
+        ids = [t['spotify_id'] for t in result]
+        assert len(set(ids)) == 5
+        assert sum(i.startswith('happy') for i in ids) == 3
+        assert sum(i.startswith('surprise') for i in ids) == 2
@@ -0,0 +1,67 @@
+"""
+Testy jednostkowe dla indeksu utworów TrackIndex.
+
+Sprawdza wyszukiwanie najbliższych profili emocji, losowe rozstrzyganie
+remisów oraz pomijanie ostatnio polecanych utworów.
+"""
+import pytest
+import numpy as np
+from services.track_index import TrackIndex, emotion_vector
+
+
+def _index(profiles_by_track, seed=0):
+    tracks = [{'spotify_id': track_id} for track_id in profiles_by_track]
+    profiles = [emotion_vector(profile) for profile in profiles_by_track.values()]
+    return TrackIndex(tracks, np.array(profiles), seed=seed)
+
+
+class TestEmotionVector:
+    """Testy dla funkcji emotion_vector."""
+
+    def test_vector_is_normalized(self):
+        """Sprawdza czy wektor ma długość 1."""
+        vector = emotion_vector({'happy': 30.0, 'sad': 40.0})
+
+        assert np.isclose(np.linalg.norm(vector), 1.0)
+
+    def test_unknown_emotions_are_ignored(self):
+        """Sprawdza czy nieznane emocje są pomijane."""
+        assert not emotion_vector({'bored': 10.0}).any()
+
+
+class TestTrackIndexQuery:
+    """Testy dla metody query."""
+
+    def test_returns_closest_profile_first(self):
+        """Sprawdza czy zwracany jest utwór o najbliższym profilu."""
+        index = _index({
+            'happy_track': {'happy': 1},
+            'sad_track': {'sad': 1},
+            'mixed_track': {'happy': 1, 'surprise': 1},
+        })
+
+        result = index.query({'happy': 60.0, 'surprise': 55.0}, k=1)
+
+        assert result[0]['spotify_id'] == 'mixed_track'
+
+    def test_ties_are_broken_randomly(self):
+        """Sprawdza czy przy remisie wybierane są różne utwory."""
+        index = _index({f'happy_{i}': {'happy': 1} for i in range(50)})
+
+        seen = {index.query({'happy': 90.0}, k=1)[0]['spotify_id'] for _ in range(30)}
+
+        assert len(seen) > 1
+
+    def test_excluded_tracks_are_skipped(self):
+        """Sprawdza pomijanie utworów z historii użytkownika."""
+        index = _index({'a': {'happy': 1}, 'b': {'happy': 1}, 'c': {'sad': 1}})
+
+        result = index.query({'happy': 90.0}, k=2, exclude={'a'})
+
+        assert [track['spotify_id'] for track in result] == ['b', 'c']
+
+    def test_empty_index_returns_empty_list(self):
+        """Sprawdza czy pusty indeks zwraca pustą listę."""
+        index = TrackIndex([], np.zeros((0, 7)))
+
+        assert index.query({'happy': 90.0}) == []